@@ -1,14 +1,18 @@
 from langchain.retrievers.multi_vector import MultiVectorRetriever
-from langchain.storage import InMemoryByteStore
 from langchain_chroma import Chroma
 from langchain_openai import ChatOpenAI
-from langchain_openai import OpenAIEmbeddings
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.docstore import get_docstore
+from rag_common.embedding_cache import get_embeddings
+from rag_common.enrichment import enrich_chunks
+from rag_common.ingestion import chunk_ids
 from langchain_community.document_loaders import AsyncHtmlLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-import uuid
 from langchain_community.document_transformers import Html2TextTransformer
 from typing import List
 from langchain_core.pydantic_v1 import BaseModel, Field
@@ -19,19 +23,21 @@ load_dotenv()  # Load environment variables from .env file
 # step1: create parent coarse chunks and child granular chunks
 #A Splitter to generate parent coarse chunks from original documents (parsed from web pages)
 #B Vector store collection to host child granular chunks
-#C Make sure the collection is empty
-#D Document store to host parent coarse chunks
+#C Make sure the collection and the document store are empty
+#D Persistent document store to host parent coarse chunks (SQLite file shared by every process)
 #E Retriever to link parent coarse chunks to child granular chunks
 parent_splitter = RecursiveCharacterTextSplitter(chunk_size=3000) #A
 
 hypotetical_questions_collection = Chroma( #B
     collection_name="uk_hypotetical_questions",
-    embedding_function=OpenAIEmbeddings(),
+    persist_directory="./chroma_db",
+    embedding_function=get_embeddings(),
 )
 
 hypotetical_questions_collection.reset_collection() #C
 
-doc_byte_store = InMemoryByteStore() #D
+doc_byte_store = get_docstore("uk_hypotetical_questions") #D
+doc_byte_store.clear() #C
 doc_key = "doc_id"
 
 multi_vector_retriever = MultiVectorRetriever( #E
@@ -67,8 +73,8 @@ hypotetical_questions_chain = (
 #B Documents of one destination 
 #C transform HTML docs into clean text docs
 #D Split the destination content into coarse chunks
-#E Iterate over the coarse chunks
-#F Generate a list of hypothetical questions for the coarse chunk through the question generation chain
+#E Generate the hypothetical questions of all coarse chunks in concurrent batches (cached by chunk hash, so a re-run resumes)
+#F Iterate over the coarse chunks and their questions
 #G Link each hypothetical question to its related coarse chunk
 #H Ingest the hypothetical questions into the vector store
 #I Ingest the coarse chunks into the document store
@@ -84,13 +90,13 @@ for destination_url in uk_destination_urls:
 
     coarse_chunks = parent_splitter.split_documents(text_docs) #D
 
-    coarse_chunks_ids = [str(uuid.uuid4()) for _ in coarse_chunks]
+    coarse_chunks_ids = chunk_ids((destination_url, c.page_content) for c in coarse_chunks)
     all_hypotetical_questions = []
-    for i, coarse_chunk in enumerate(coarse_chunks): #E
-        
+    all_chunk_questions = enrich_chunks(hypotetical_questions_chain, coarse_chunks, "hypothetical_questions_v1") #E
+    for i, hypotetical_questions in enumerate(all_chunk_questions): #F
+
         coarse_chunk_id = coarse_chunks_ids[i]
-            
-        hypotetical_questions = hypotetical_questions_chain.invoke(coarse_chunk) #F
+
         hypotetical_questions_docs = [
             Document(page_content=question, metadata={doc_key: coarse_chunk_id})
                                               for question in hypotetical_questions
@@ -99,7 +105,8 @@ for destination_url in uk_destination_urls:
         all_hypotetical_questions.extend(hypotetical_questions_docs)
 
 print(f'Ingesting {destination_url}')
-multi_vector_retriever.vectorstore.add_documents(all_hypotetical_questions) #H
+question_ids = chunk_ids((d.metadata[doc_key], d.page_content) for d in all_hypotetical_questions)
+multi_vector_retriever.vectorstore.add_documents(all_hypotetical_questions, ids=question_ids) #H
 multi_vector_retriever.docstore.mset(list(zip(coarse_chunks_ids, coarse_chunks))) #I
 
 hypothetical_question_docs_only = hypotetical_questions_collection.similarity_search("what operation is Israel conducting in Gaza?")
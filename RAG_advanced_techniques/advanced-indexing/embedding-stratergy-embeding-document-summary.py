@@ -1,14 +1,18 @@
 from langchain.retrievers.multi_vector import MultiVectorRetriever
-from langchain.storage import InMemoryByteStore
 from langchain_chroma import Chroma
 from langchain_openai import ChatOpenAI
-from langchain_openai import OpenAIEmbeddings
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.docstore import get_docstore
+from rag_common.embedding_cache import get_embeddings
+from rag_common.enrichment import enrich_chunks
+from rag_common.ingestion import chunk_ids
 from langchain_community.document_loaders import AsyncHtmlLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-import uuid
 from langchain_community.document_transformers import Html2TextTransformer
 from dotenv import load_dotenv
 
@@ -17,20 +21,22 @@ load_dotenv()  # Load environment variables from .env file
 #step1: create parent coarse chunks and child granular chunks
 #A Splitter to generate parent coarse chunks from original documents (parsed from web pages)
 #B Vector store collection to host child granular chunks
-#C Make sure the collection is empty
-#D Document store to host parent coarse chunks
+#C Make sure the collection and the document store are empty
+#D Persistent document store to host parent coarse chunks (SQLite file shared by every process)
 #E Retriever to link parent coarse chunks to child granular chunks
 
 parent_splitter = RecursiveCharacterTextSplitter(chunk_size=3000) #A
 
 summaries_collection = Chroma( #B
     collection_name="uk_summaries",
-    embedding_function=OpenAIEmbeddings(),
+    persist_directory="./chroma_db",
+    embedding_function=get_embeddings(),
 )
 
 summaries_collection.reset_collection() #C
 
-doc_byte_store = InMemoryByteStore() #D
+doc_byte_store = get_docstore("uk_summaries") #D
+doc_byte_store.clear() #C
 doc_key = "doc_id"
 
 multi_vector_retriever = MultiVectorRetriever( #E
@@ -57,8 +63,8 @@ summarization_chain = (
 #B Documents of one destination 
 #C transform HTML docs into clean text docs
 #D Split the destination content into coarse chunks
-#E Iterate over the coarse chunks
-#F Generate a summary for the coarse chunk thorugh the summarization chain
+#E Generate the summaries of all coarse chunks in concurrent batches (cached by chunk hash, so a re-run resumes)
+#F Iterate over the coarse chunks and their summaries
 #G Link each summary to its related coarse chunk
 #H Ingest the summaries into the vector store
 #I Ingest the coarse chunks into the document store
@@ -75,19 +81,18 @@ for destination_url in uk_destination_urls:
 
     coarse_chunks = parent_splitter.split_documents(text_docs) #D
 
-coarse_chunks_ids = []
-for _ in coarse_chunks:
-    coarse_chunks_ids.append(str(uuid.uuid4))
+coarse_chunks_ids = chunk_ids((destination_url, c.page_content) for c in coarse_chunks)
 
 all_summaries = []
-for i, coarse_chunk in enumerate(coarse_chunks): #E
+summary_texts = enrich_chunks(summarization_chain, coarse_chunks, "summary_v1") #E
+for i, summary_text in enumerate(summary_texts): #F
         coarse_chunk_id = coarse_chunks_ids[i]
-        summary_text =  summarization_chain.invoke(coarse_chunk) #F
         summary_doc = Document(page_content=summary_text, metadata={doc_key: coarse_chunk_id})
         all_summaries.append(summary_doc) #G
 
 print(f'Ingesting {destination_url}')
-multi_vector_retriever.vectorstore.add_documents(all_summaries) #H
+summary_ids = chunk_ids((d.metadata[doc_key], d.page_content) for d in all_summaries)
+multi_vector_retriever.vectorstore.add_documents(all_summaries, ids=summary_ids) #H
 multi_vector_retriever.docstore.mset(list(zip(coarse_chunks_ids, coarse_chunks))) #I
 
 retrieved_docs_parents = multi_vector_retriever.invoke("forceful operation")
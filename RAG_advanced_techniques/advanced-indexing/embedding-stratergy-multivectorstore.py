@@ -1,11 +1,14 @@
 from langchain.retrievers.multi_vector import MultiVectorRetriever
-from langchain.storage import InMemoryByteStore
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.docstore import get_docstore
+from rag_common.embedding_cache import get_embeddings
+from rag_common.ingestion import chunk_ids
 from langchain_community.document_loaders import AsyncHtmlLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_transformers import Html2TextTransformer
-import uuid
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
@@ -14,8 +17,8 @@ load_dotenv()  # Load environment variables from .env file
 #A Splitter to generate parent coarse chunks from original documents (parsed from web pages)
 #B Splitter to generate child granular chunks from parent coarse chunks
 #C Vector store collection to host child granular chunks
-#D Make sure the collection is empty
-#E Document store to host parent coarse chunks
+#D Make sure the collection and the document store are empty
+#E Persistent document store to host parent coarse chunks (SQLite file shared by every process)
 #F Retriever to link parent coarse chunks to child granular chunks
 
 parent_splitter = RecursiveCharacterTextSplitter(chunk_size=3000) #A
@@ -23,12 +26,14 @@ child_splitter = RecursiveCharacterTextSplitter(chunk_size=500) #B
 
 child_chunks_collection = Chroma( #C
     collection_name="uk_child_chunks",
-    embedding_function=OpenAIEmbeddings(),
+    persist_directory="./chroma_db",
+    embedding_function=get_embeddings(),
 )
 
 child_chunks_collection.reset_collection() #D
 
-doc_byte_store = InMemoryByteStore() #E
+doc_byte_store = get_docstore("uk_child_chunks") #E
+doc_byte_store.clear() #D
 doc_key = "doc_id"
 
 multi_vector_retriever = MultiVectorRetriever( #F
@@ -61,9 +66,7 @@ for destination_url in uk_destination_urls:
 
 coarse_chunks = parent_splitter.split_documents(text_docs) #D
 
-coarse_chunks_ids = []
-for _ in coarse_chunks:
-    coarse_chunks_ids.append(str(uuid.uuid4))
+coarse_chunks_ids = chunk_ids((destination_url, c.page_content) for c in coarse_chunks)
     
 all_granular_chunks = []
 for i, coarse_chunk in enumerate(coarse_chunks): #E
@@ -74,7 +77,8 @@ for i, coarse_chunk in enumerate(coarse_chunks): #E
     all_granular_chunks.extend(granular_chunks)
 
 print(f'Ingesting {destination_url}')
-multi_vector_retriever.vectorstore.add_documents(all_granular_chunks) #H
+granular_chunk_ids = chunk_ids((d.metadata[doc_key], d.page_content) for d in all_granular_chunks)
+multi_vector_retriever.vectorstore.add_documents(all_granular_chunks, ids=granular_chunk_ids) #H
 multi_vector_retriever.docstore.mset(list(zip(coarse_chunks_ids, coarse_chunks))) #I
 
 retrieved_docs_parents = multi_vector_retriever.invoke("forceful operation")
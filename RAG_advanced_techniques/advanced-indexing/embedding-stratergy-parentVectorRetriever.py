@@ -11,9 +11,12 @@ which is designed to retrieve parent documents based on child embeddings***
 
 """
 from langchain.retrievers import ParentDocumentRetriever
-from langchain.storage import InMemoryStore
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.docstore import get_docstore
+from rag_common.embedding_cache import get_embeddings
 from langchain_community.document_loaders import AsyncHtmlLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_transformers import Html2TextTransformer
@@ -27,25 +30,27 @@ load_dotenv()  # Load environment variables from .env file
 #A Splitter to generate parent coarse chunks from original documents (parsed from web pages)
 #B Splitter to generate child granular chunks from parent coarse chunks
 #C Vector store collection to host child granular chunks
-#D Make sure the collection is empty
-#E Document store to host parent coarse chunks
+#D Make sure the collection and the document store are empty
+#E Persistent document store to host parent coarse chunks (SQLite file shared by every process)
 #F Retriever to link parent coarse chunks to child granular chunks
 
 parent_splitter = RecursiveCharacterTextSplitter(chunk_size=3000) #A
 child_splitter = RecursiveCharacterTextSplitter(chunk_size=500) #B
 
 child_chunks_collection = Chroma( #C
-    collection_name="uk_child_chunks",
-    embedding_function=OpenAIEmbeddings(),
+    collection_name="uk_parent_child_chunks",
+    persist_directory="./chroma_db",
+    embedding_function=get_embeddings(),
 )
 
 child_chunks_collection.reset_collection() #D
 
-doc_store = InMemoryStore() #E
+doc_byte_store = get_docstore("uk_parent_child_chunks") #E
+doc_byte_store.clear() #D
 
 parent_doc_retriever = ParentDocumentRetriever( #F
     vectorstore=child_chunks_collection,
-    docstore=doc_store,
+    byte_store=doc_byte_store,
     child_splitter=child_splitter,
     parent_splitter=parent_splitter
 )
@@ -68,7 +73,7 @@ for destination_url in uk_destination_urls:
     print(f'Ingesting {destination_url}')
     parent_doc_retriever.add_documents(text_docs, ids=None) #D
 
-print(doc_store.yield_keys())
+print(list(doc_byte_store.yield_keys()))
 
 retrieved_docs_parents = parent_doc_retriever.invoke("forceful operation")
 print(retrieved_docs_parents[0].page_content)
@@ -1,7 +1,10 @@
 #refer this article https://medium.com/@roberto.g.infante/advanced-rag-techniques-with-langchain-f9c82290b0d1
 
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.embedding_cache import get_embeddings
 from dotenv import load_dotenv
 from langchain_text_splitters import HTMLSectionSplitter
 from langchain_community.document_transformers import Html2TextTransformer
@@ -33,13 +36,13 @@ def split_docs_into_coarse_chunks(docs):
 
 uk_granular_collection = Chroma( #A
     collection_name="uk_granular",
-    embedding_function=OpenAIEmbeddings(),
+    embedding_function=get_embeddings(),
 )
 uk_granular_collection.reset_collection() #B
 
 uk_coarse_collection = Chroma( #A
     collection_name="uk_coarse",
-    embedding_function=OpenAIEmbeddings(),
+    embedding_function=get_embeddings(),
 )
 uk_coarse_collection.reset_collection() #B
 
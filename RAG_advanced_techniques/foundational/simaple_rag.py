@@ -1,8 +1,12 @@
 from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.embedding_cache import get_embeddings
+from rag_common.mmap_vectorstore import MmapVectorStore
+from rag_common.vector_index import faiss_vectorstore
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
 
 load_dotenv()  # Load environment variables from .env file
@@ -14,9 +18,22 @@ file_path = 'data/customers-100.csv'
 loader = CSVLoader(file_path=file_path)
 data = loader.load_and_split()
 
-#  embeddings in FAISS vector store using from_texts
-embedding_model = OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY"))
-vector_db = FAISS.from_documents(data, embedding_model)
+# FAISS index backend: "flat" (exact), or an ANN spec such as "hnsw:M=32,ef_search=64",
+# "ivf:nlist=1024,nprobe=16" or "ivfpq:nlist=1024,m=16,nbits=8,nprobe=16"
+# (pick one with benchmarks/ann_benchmark.py)
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "flat")
+
+# "faiss" keeps the index in process memory; "mmap" keeps int8 vectors and the documents in
+# memory-mapped files under ./mmap_store, shared through the page cache by every process using them
+VECTOR_STORE = os.getenv("VECTOR_STORE", "faiss")
+
+embedding_model = get_embeddings()
+if VECTOR_STORE == "mmap":
+    # Re-running only embeds rows that are not in the store yet
+    vector_db = MmapVectorStore.from_documents(data, embedding_model, directory="./mmap_store")
+else:
+    #  embeddings in FAISS vector store
+    vector_db = faiss_vectorstore(data, embedding_model, VECTOR_INDEX)
 
 retriever = vector_db.as_retriever(search_kwargs={"k": 3})
 
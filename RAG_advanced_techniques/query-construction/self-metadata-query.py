@@ -7,7 +7,10 @@ A vector store typically indexes document chunks by embedding for dense search,
 """
 
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.embedding_cache import get_embeddings
 from dotenv import load_dotenv
 from langchain_community.document_loaders import AsyncHtmlLoader
 from langchain_community.document_transformers import Html2TextTransformer
@@ -18,7 +21,7 @@ load_dotenv()
 
 uk_with_metadata_collection = Chroma(
     collection_name="uk_with_metadata_collection",
-    embedding_function=OpenAIEmbeddings())
+    embedding_function=get_embeddings())
 
 #A in case it already exists
 uk_with_metadata_collection.reset_collection() #A
@@ -6,7 +6,10 @@ HyDE takes this a step further by preserving the original chunk embeddings while
 """
 
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.embedding_cache import get_embeddings
 from langchain_text_splitters import HTMLSectionSplitter
 from langchain_community.document_loaders import AsyncHtmlLoader
 from dotenv import load_dotenv
@@ -29,7 +32,7 @@ load_dotenv()
 
 uk_granular_collection = Chroma(
     collection_name="uk_granular",
-    embedding_function=OpenAIEmbeddings(),
+    embedding_function=get_embeddings(),
 )
 
 uk_granular_collection.reset_collection() #A
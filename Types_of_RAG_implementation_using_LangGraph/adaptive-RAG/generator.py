@@ -1,21 +1,23 @@
-from langchain import hub
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-
-prompt = hub.pull("rlm/rag-prompt")
-
-llm = ChatOpenAI()
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.components import lazy, shared_chat_model
+from rag_common.microbatch import with_micro_batching
+from rag_common.providers import get_rag_prompt
 
 def format_docs(docs):
     return "\n\n".join([doc.page_content for doc in docs])
 
-rag_chain = prompt | llm | StrOutputParser()
+def build_rag_chain():
+    prompt = get_rag_prompt()
+    llm = shared_chat_model()
+    return prompt | llm | StrOutputParser()
 
-######## Question Re-writer ##########
+rag_chain = lazy("rag_chain", build_rag_chain)
 
-# LLM 
-llm = ChatOpenAI()
+######## Question Re-writer ##########
 
 # Prompt 
 system = """You a question re-writer that converts an input question to a better version that is optimized \n 
@@ -27,4 +29,8 @@ re_write_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-question_rewriter_chain = re_write_prompt | llm | StrOutputParser()
+# LLM, built on first use from the shared chat model
+def build_question_rewriter_chain():
+    return with_micro_batching(re_write_prompt | shared_chat_model() | StrOutputParser(), "question_rewriter")
+
+question_rewriter_chain = lazy("question_rewriter_chain", build_question_rewriter_chain)
\ No newline at end of file
@@ -1,8 +1,16 @@
 ### Retrieval Grader 
 
+import os
+import sys
+
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.batch_grading import build_batch_grader_chain
+from rag_common.components import lazy, shared_chat_model
+from rag_common.microbatch import with_micro_batching
+from rag_common.verdict_cache import with_verdict_cache
 
 
 # Data model
@@ -11,10 +19,6 @@ class GradeDocuments(BaseModel):
 
     binary_score: str = Field(description="Documents are relevant to the question, 'yes' or 'no'")
 
-# LLM with function call 
-llm = ChatOpenAI()
-structured_llm_grader = llm.with_structured_output(GradeDocuments)
-
 # Prompt 
 system = """You are a grader assessing relevance of a retrieved document to a user question. \n 
     It does not need to be a stringent test. The goal is to filter out erroneous retrievals. \n
@@ -27,7 +31,20 @@ grade_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-retrieval_grader_chain = grade_prompt | structured_llm_grader   
+# LLM with function call, built on first use from the shared chat model
+def build_retrieval_grader_chain():
+    structured_llm_grader = shared_chat_model().with_structured_output(GradeDocuments)
+    return with_verdict_cache(with_micro_batching(grade_prompt | structured_llm_grader, "retrieval_grader"), "retrieval_grader", GradeDocuments)
+
+retrieval_grader_chain = lazy("retrieval_grader_chain", build_retrieval_grader_chain)
+
+### Batched Retrieval Grader
+
+# All documents in one call; prompt, cache reuse and fallback live in rag_common.batch_grading
+batch_retrieval_grader_chain = lazy(
+    "batch_retrieval_grader_chain", lambda: build_batch_grader_chain(shared_chat_model())
+)
+
 
 
 ################# Hallucination Grader #############
@@ -38,10 +55,6 @@ class GradeHallucinations(BaseModel):
 
     binary_score: str = Field(description="Answer is grounded in the facts, 'yes' or 'no'")
 
-# LLM with function call 
-llm = ChatOpenAI()
-structured_llm_grader = llm.with_structured_output(GradeHallucinations)
-
 # Prompt 
 system = """You are a grader assessing whether an LLM generation is grounded in / supported by a set of retrieved facts. \n 
      Give a binary score 'yes' or 'no'. 'Yes' means that the answer is grounded in / supported by the set of facts."""
@@ -52,7 +65,12 @@ hallucination_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-hallucination_grader_chain = hallucination_prompt | structured_llm_grader
+# LLM with function call, built on first use from the shared chat model
+def build_hallucination_grader_chain():
+    structured_llm_grader = shared_chat_model().with_structured_output(GradeHallucinations)
+    return with_verdict_cache(with_micro_batching(hallucination_prompt | structured_llm_grader, "hallucination_grader"), "hallucination_grader", GradeHallucinations)
+
+hallucination_grader_chain = lazy("hallucination_grader_chain", build_hallucination_grader_chain)
 
 
 ### Answer Grader 
@@ -62,10 +80,6 @@ class GradeAnswer(BaseModel):
 
     binary_score: str = Field(description="Answer addresses the question, 'yes' or 'no'")
 
-# LLM with function call 
-llm = ChatOpenAI()
-structured_llm_grader = llm.with_structured_output(GradeAnswer)
-
 # Prompt 
 system = """You are a grader assessing whether an answer addresses / resolves a question \n 
      Give a binary score 'yes' or 'no'. Yes' means that the answer resolves the question."""
@@ -76,4 +90,9 @@ answer_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-answer_grader_chain = answer_prompt | structured_llm_grader
\ No newline at end of file
+# LLM with function call, built on first use from the shared chat model
+def build_answer_grader_chain():
+    structured_llm_grader = shared_chat_model().with_structured_output(GradeAnswer)
+    return with_verdict_cache(with_micro_batching(answer_prompt | structured_llm_grader, "answer_grader"), "answer_grader", GradeAnswer)
+
+answer_grader_chain = lazy("answer_grader_chain", build_answer_grader_chain)
\ No newline at end of file
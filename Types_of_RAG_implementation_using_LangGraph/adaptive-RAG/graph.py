@@ -1,37 +1,75 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.answer_cache import with_answer_cache
+from rag_common.instrumentation import instrument
+from retriever import vectorstore
 from state import GraphState
 
 
 from nodes import (
     web_search,
+    aweb_search,
     retrieve,
+    aretrieve,
     grade_documents,
+    agrade_documents,
     generate,
+    agenerate,
     transform_query,
+    atransform_query,
+    finalize,
+    finalize_grounded,
+    speculative_route,
+    aspeculative_route,
     )
 from edges import (
     route_question,
+    aroute_question,
+    route_speculated,
     decide_to_generate,
     grade_generation_v_documents_and_question,
+    agrade_generation_v_documents_and_question,
     )
 
+# Start retrieval and web search while the router LLM call is still running
+SPECULATIVE = os.getenv("RAG_SPECULATIVE", "false").lower() == "true"
+
 workflow = StateGraph(GraphState)
 
 # Define the nodes
-workflow.add_node("web_search", web_search) # web search
-workflow.add_node("retrieve", retrieve) # retrieve
-workflow.add_node("grade_documents", grade_documents) # grade documents
-workflow.add_node("generate", generate) # generatae
-workflow.add_node("transform_query", transform_query) # transform_query
+# RunnableLambda(sync, afunc=async): app.invoke / app.stream run the sync version,
+# app.ainvoke / app.astream the async one (see rag_common.serving)
+workflow.add_node("web_search", RunnableLambda(web_search, afunc=aweb_search)) # web search
+workflow.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve)) # retrieve
+workflow.add_node("grade_documents", RunnableLambda(grade_documents, afunc=agrade_documents)) # grade documents
+workflow.add_node("generate", RunnableLambda(generate, afunc=agenerate)) # generatae
+workflow.add_node("transform_query", RunnableLambda(transform_query, afunc=atransform_query)) # transform_query
+workflow.add_node("finalize", finalize) # best answer so far when the loop budget runs out
+workflow.add_node("finalize_grounded", finalize_grounded) # the current, grounded answer when no rewrites are left
 
 # Build graph
-workflow.set_conditional_entry_point(
-    route_question,
-    {
-        "web_search": "web_search",
-        "vectorstore": "retrieve",
-    },
-)
+if SPECULATIVE:
+    workflow.add_node("speculative_route", RunnableLambda(speculative_route, afunc=aspeculative_route)) # route + retrieve + web search
+    workflow.set_entry_point("speculative_route")
+    workflow.add_conditional_edges(
+        "speculative_route",
+        route_speculated,
+        {
+            "web_search": "generate",
+            "vectorstore": "grade_documents",
+        },
+    )
+else:
+    workflow.set_conditional_entry_point(
+        RunnableLambda(route_question, afunc=aroute_question),
+        {
+            "web_search": "web_search",
+            "vectorstore": "retrieve",
+        },
+    )
 workflow.add_edge("web_search", "generate")
 workflow.add_edge("retrieve", "grade_documents")
 workflow.add_conditional_edges(
@@ -40,19 +78,27 @@ workflow.add_conditional_edges(
     {
         "transform_query": "transform_query",
         "generate": "generate",
+        "budget_exhausted": "finalize",
     },
 )
 workflow.add_edge("transform_query", "retrieve")
+workflow.add_edge("finalize", END)
+workflow.add_edge("finalize_grounded", END)
 workflow.add_conditional_edges(
     "generate",
-    grade_generation_v_documents_and_question,
+    RunnableLambda(grade_generation_v_documents_and_question, afunc=agrade_generation_v_documents_and_question),
     {
         "not supported": "generate",
         "useful": END,
         "not useful": "transform_query",
+        "budget_exhausted": "finalize",
+        "budget_exhausted_grounded": "finalize_grounded",
     },
 )
 
 # Compile
-app = workflow.compile()
+# Per-node/edge timing, model calls, tokens and state size (see rag_common.instrumentation)
+app = instrument(workflow.compile(), graph_name="adaptive-RAG")
+# Repeated and paraphrased questions are answered from the answer cache, until their documents change
+app = with_answer_cache(app, "adaptive-RAG", vectorstore=vectorstore)
 
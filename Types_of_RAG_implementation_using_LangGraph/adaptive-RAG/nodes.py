@@ -1,9 +1,31 @@
 from retriever import retriever
 from generator import rag_chain
-from grader import retrieval_grader_chain
+from grader import retrieval_grader_chain, batch_retrieval_grader_chain
 from generator import question_rewriter_chain, rag_chain
 from web_search_tool import web_search_tool
+from router import question_router
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from langchain.schema import Document
+import asyncio
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.budget import NO_ANSWER, charge, default_budget
+from rag_common.batch_grading import agrade_relevance, grade_relevance, keep_relevant
+from rag_common.streaming import astream_generation, stream_generation
+
+# Grade all retrieved documents in one LLM call instead of one call per document
+BATCH_GRADING = os.getenv("BATCH_GRADING", "true").lower() == "true"
+
+# Max number of concurrent grader calls in agrade_documents (provider rate limits)
+GRADER_MAX_CONCURRENCY = int(os.getenv("GRADER_MAX_CONCURRENCY", "4"))
+
+# Threads running retrieval and web search while the router decides (RAG_SPECULATIVE mode)
+speculation_executor = ContextThreadPoolExecutor(max_workers=int(os.getenv("SPECULATIVE_MAX_WORKERS", "8")))
+
+def web_results_document(docs):
+    """Join web search results into a single Document."""
+    return Document(page_content="\n".join([d["content"] for d in docs]))
 
 ############defining nondes for the graph############
 
@@ -20,7 +42,22 @@ def retrieve(state):
 
     # Retrieval
     documents = retriever.invoke(question)
-    return {"documents": documents, "question": question}
+    return {"documents": documents, "question": question, **charge(state)}
+
+async def aretrieve(state):
+    """
+    Async twin of retrieve.
+    Args:
+        state (dict): The current graph state
+    Returns:
+        state (dict): New key added to state, documents, that contains retrieved documents
+    """
+    print("---RETRIEVE---")
+    question = state["question"]
+
+    # Retrieval
+    documents = await retriever.ainvoke(question)
+    return {"documents": documents, "question": question, **charge(state)}
 
 def generate(state):
     """
@@ -36,9 +73,41 @@ def generate(state):
     question = state["question"]
     documents = state["documents"]
     
-    # RAG generation
-    generation = rag_chain.invoke({"context": documents, "question": question})
-    return {"documents": documents, "question": question, "generation": generation}
+    # RAG generation, streamed token by token to the graph's custom stream
+    generation = stream_generation(rag_chain, {"context": documents, "question": question})
+    return {
+        "documents": documents,
+        "question": question,
+        "generation": generation,
+        "generation_count": state.get("generation_count", 0) + 1,
+        # The generation call, plus the hallucination check the next edge runs on it
+        **charge(state, documents, question, generation, documents, generation),
+    }
+
+async def agenerate(state):
+    """
+    Async twin of generate.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): New key added to state, generation, that contains LLM generation
+    """
+    print("---GENERATE---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # RAG generation, streamed token by token to the graph's custom stream
+    generation = await astream_generation(rag_chain, {"context": documents, "question": question})
+    return {
+        "documents": documents,
+        "question": question,
+        "generation": generation,
+        "generation_count": state.get("generation_count", 0) + 1,
+        # The generation call, plus the hallucination check the next edge runs on it
+        **charge(state, documents, question, generation, documents, generation),
+    }
 
 def grade_documents(state):
     """
@@ -55,18 +124,43 @@ def grade_documents(state):
     question = state["question"]
     documents = state["documents"]
     
-    # Score each doc
-    filtered_docs = []
-    for d in documents:
-        score = retrieval_grader_chain.invoke({"question": question, "document": d.page_content})
-        grade = score.binary_score
-        if grade == "yes":
-            print("---GRADE: DOCUMENT RELEVANT---")
-            filtered_docs.append(d)
-        else:
-            print("---GRADE: DOCUMENT NOT RELEVANT---")
-            continue
-    return {"documents": filtered_docs, "question": question}
+    # Decide the obvious docs locally, score the rest with the LLM grader (in one call with BATCH_GRADING)
+    batch_grader = batch_retrieval_grader_chain if BATCH_GRADING else None
+    grades = grade_relevance(question, documents, retrieval_grader_chain, batch_grader)
+    filtered_docs = keep_relevant(documents, grades)
+    return {
+        "documents": filtered_docs,
+        "question": question,
+        **charge(state, question, *[d.page_content for d in documents]),
+    }
+
+async def agrade_documents(state):
+    """
+    Async twin of grade_documents: grades the retrieved documents in one batched call
+    (BATCH_GRADING), or all of them concurrently.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updates documents key with only filtered relevant documents
+    """
+
+    print("---CHECK DOCUMENT RELEVANCE TO QUESTION (ASYNC)---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # Same grading, with at most GRADER_MAX_CONCURRENCY grader calls in flight
+    batch_grader = batch_retrieval_grader_chain if BATCH_GRADING else None
+    grades = await agrade_relevance(
+        question, documents, retrieval_grader_chain, batch_grader, max_concurrency=GRADER_MAX_CONCURRENCY
+    )
+    filtered_docs = keep_relevant(documents, grades)
+    return {
+        "documents": filtered_docs,
+        "question": question,
+        **charge(state, question, *[d.page_content for d in documents]),
+    }
 
 def transform_query(state):
     """
@@ -85,7 +179,39 @@ def transform_query(state):
 
     # Re-write question
     better_question = question_rewriter_chain.invoke({"question": question})
-    return {"documents": documents, "question": better_question}
+    return {
+        "documents": documents,
+        "question": better_question,
+        "rewrite_count": state.get("rewrite_count", 0) + 1,
+        # Only grounded answers reach a rewrite (the "not useful" edge), so keep the latest one
+        "best_generation": state.get("generation") or state.get("best_generation"),
+        **charge(state, question, better_question),
+    }
+
+async def atransform_query(state):
+    """
+    Async twin of transform_query.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updates question key with a re-phrased question
+    """
+
+    print("---TRANSFORM QUERY---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # Re-write question
+    better_question = await question_rewriter_chain.ainvoke({"question": question})
+    return {
+        "documents": documents,
+        "question": better_question,
+        "rewrite_count": state.get("rewrite_count", 0) + 1,
+        "best_generation": state.get("generation") or state.get("best_generation"),
+        **charge(state, question, better_question),
+    }
 
 def web_search(state):
     """
@@ -103,7 +229,136 @@ def web_search(state):
 
     # Web search
     docs = web_search_tool.invoke({"query": question})
-    web_results = "\n".join([d["content"] for d in docs])
-    web_results = Document(page_content=web_results)
+    web_results = web_results_document(docs)
+
+    return {"documents": web_results, "question": question, **charge(state)}
+
+async def aweb_search(state):
+    """
+    Async twin of web_search.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updates documents key with appended web results
+    """
+
+    print("---WEB SEARCH---")
+    question = state["question"]
+
+    # Web search
+    docs = await web_search_tool.ainvoke({"query": question})
+    web_results = web_results_document(docs)
+
+    return {"documents": web_results, "question": question, **charge(state)}
+
+def finalize(state, grounded=False):
+    """
+    Ends the run when the loop budget is exhausted, returning the best answer so far.
+
+    Args:
+        state (dict): The current graph state
+        grounded (bool): The current generation passed the hallucination check right before the exit
+
+    Returns:
+        state (dict): generation set to the best answer, budget_exhausted flag and reason
+    """
+
+    budget = default_budget.for_state(state)
+    reason = budget.reason(state)
+    print(f"---LOOP BUDGET EXHAUSTED ({reason}): RETURN BEST ANSWER---")
+    if grounded and state.get("generation"):
+        # Newer than best_generation, which transform_query saved before the last rewrite
+        generation = state["generation"]
+    else:
+        # Ungrounded, or the budget ran out before grading: the last grounded answer, if any
+        generation = state.get("best_generation") or state.get("generation") or NO_ANSWER
+    return {"generation": generation, "budget_exhausted": True, "budget_reason": reason}
+
+def finalize_grounded(state):
+    """
+    finalize for the exit after a grounded answer that did not address the question,
+    when no rewrites are left: returns that answer rather than an older one.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): generation, budget_exhausted flag and reason
+    """
+    return finalize(state, grounded=True)
+
+async def drop_speculative(task):
+    """Cancel a speculative task and wait until it stops, discarding its result or error."""
+    task.cancel()
+    await asyncio.wait([task])
+    if not task.cancelled():
+        # It finished before the cancel; mark a failure as retrieved
+        task.exception()
+
+def speculative_route(state):
+    """
+    Route the question while vector retrieval and web search already run (RAG_SPECULATIVE mode).
+
+    Takes retrieval / web search off the critical path: only the branch the
+    router picks is waited for. The other one is only cancelled if its thread
+    has not started yet; otherwise it runs to completion and its result is
+    dropped, so a question usually pays for both the retrieval and the web search.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): documents from the routed datasource, and the datasource chosen
+    """
+
+    print("---ROUTE QUESTION, RETRIEVE AND WEB SEARCH IN PARALLEL---")
+    question = state["question"]
+    retrieval = speculation_executor.submit(retriever.invoke, question)
+    search = speculation_executor.submit(web_search_tool.invoke, {"query": question})
+
+    source = question_router.invoke({"question": question})
+    if source.datasource == "web_search":
+        print("---ROUTE QUESTION TO WEB SEARCH (DROP RETRIEVED DOCUMENTS)---")
+        # No-op once the thread runs; the result is then ignored
+        retrieval.cancel()
+        documents = web_results_document(search.result())
+    else:
+        print("---ROUTE QUESTION TO RAG (DROP WEB RESULTS)---")
+        search.cancel()
+        documents = retrieval.result()
+    return {"documents": documents, "question": question, "datasource": source.datasource, **charge(state, question)}
+
+async def aspeculative_route(state):
+    """
+    Async twin of speculative_route. The branch the router did not pick is
+    cancelled, and awaited until it has stopped.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): documents from the routed datasource, and the datasource chosen
+    """
+
+    print("---ROUTE QUESTION, RETRIEVE AND WEB SEARCH IN PARALLEL (ASYNC)---")
+    question = state["question"]
+    retrieval = asyncio.ensure_future(retriever.ainvoke(question))
+    search = asyncio.ensure_future(web_search_tool.ainvoke({"query": question}))
 
-    return {"documents": web_results, "question": question}
+    try:
+        source = await question_router.ainvoke({"question": question})
+    except BaseException:
+        await drop_speculative(retrieval)
+        await drop_speculative(search)
+        raise
+    if source.datasource == "web_search":
+        print("---ROUTE QUESTION TO WEB SEARCH (DROP RETRIEVED DOCUMENTS)---")
+        await drop_speculative(retrieval)
+        documents = web_results_document(await search)
+    else:
+        print("---ROUTE QUESTION TO RAG (DROP WEB RESULTS)---")
+        await drop_speculative(search)
+        documents = await retrieval
+    return {"documents": documents, "question": question, "datasource": source.datasource, **charge(state, question)}
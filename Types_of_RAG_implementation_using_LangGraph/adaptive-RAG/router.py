@@ -2,9 +2,16 @@ from typing import Literal
 
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 load_dotenv()
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.components import lazy, shared_chat_model
+from rag_common.embedding_cache import get_embeddings
+from rag_common.embedding_router import NearestCentroidRouter
+from rag_common.metrics import get_registry
+from langchain_core.runnables import RunnableLambda
 
 # Data model
 class RouteQuery(BaseModel):
@@ -15,10 +22,6 @@ class RouteQuery(BaseModel):
         description="Given a user question choose to route it to web search or a vectorstore.",
     )
 
-# LLM with function call 
-llm = ChatOpenAI()
-structured_llm_router = llm.with_structured_output(RouteQuery)
-
 # Prompt 
 system = """You are an expert at routing a user question to a vectorstore or web search.
 The vectorstore contains documents related to agents, prompt engineering, and adversarial attacks.
@@ -30,4 +33,79 @@ route_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-question_router_chain= route_prompt | structured_llm_router
\ No newline at end of file
+# LLM with function call, built on first use from the shared chat model
+def build_question_router_chain():
+    structured_llm_router = shared_chat_model().with_structured_output(RouteQuery)
+    return route_prompt | structured_llm_router
+
+question_router_chain = lazy("question_router_chain", build_question_router_chain)
+
+############ Local embedding router ############
+
+# Use the nearest-centroid router first and the LLM router only for low-confidence questions.
+# Off by default: the examples below are hand-written and the confidence margin depends on the
+# embedding model, so enable it after checking it against the LLM router on your own questions.
+EMBEDDING_ROUTER = os.getenv("EMBEDDING_ROUTER", "false").lower() == "true"
+# Minimum margin between the two route similarities to trust the embedding router. 0.05 is a
+# starting point, not a calibrated value: run the LLM router on a sample of real questions, and
+# raise the margin until the embedding router's decisions above it agree with the LLM's.
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.05"))
+
+# Labelled examples and topic descriptions of what is (not) in the vectorstore.
+# Keep them apart from the questions in run.py and the benchmark fixtures, which evaluate the router
+ROUTE_EXAMPLES = {
+    "vectorstore": [
+        "LLM powered autonomous agents: planning, task decomposition, memory and tool use",
+        "Prompt engineering: zero-shot, few-shot, instruction and chain of thought prompting",
+        "Adversarial attacks on large language models, jailbreak prompts and defences",
+        "How does an agent decide what to write to its memory stream?",
+        "How does an agent use tools and external APIs?",
+        "What does self-consistency sampling add to a prompt?",
+        "How do I choose few-shot examples for a prompt?",
+        "Which red-teaming methods find unsafe model behaviour?",
+        "How do gradient based attacks on language models work?",
+        "What is self-reflection in LLM agents?",
+    ],
+    "web_search": [
+        "Current events, news, sports, weather, products and releases",
+        "Who won the game last night?",
+        "Who did the Lakers sign in free agency?",
+        "What is the weather forecast for this weekend?",
+        "Which features shipped in this month's browser update?",
+        "What is the stock price of Apple today?",
+        "When is the next election?",
+        "Which movies are showing in cinemas this week?",
+        "What are the opening hours of the museum?",
+        "How much does the new phone cost?",
+    ],
+}
+
+# Embeds the examples on first use
+embedding_router = lazy(
+    "embedding_router",
+    lambda: NearestCentroidRouter(get_embeddings(), ROUTE_EXAMPLES, min_confidence=ROUTER_MIN_CONFIDENCE),
+)
+
+def route(inputs):
+    """Route with the embedding router, falling back to the LLM router when it is not confident."""
+    datasource, confidence = embedding_router.classify(inputs["question"])
+    if datasource is None:
+        print(f"---EMBEDDING ROUTER NOT CONFIDENT ({confidence:.3f}), ASK LLM ROUTER---")
+        get_registry().inc("router_decisions", method="llm")
+        return question_router_chain.invoke(inputs)
+    print(f"---EMBEDDING ROUTER: {datasource} ({confidence:.3f})---")
+    get_registry().inc("router_decisions", method="embedding")
+    return RouteQuery(datasource=datasource)
+
+async def aroute(inputs):
+    datasource, confidence = await embedding_router.aclassify(inputs["question"])
+    if datasource is None:
+        print(f"---EMBEDDING ROUTER NOT CONFIDENT ({confidence:.3f}), ASK LLM ROUTER---")
+        get_registry().inc("router_decisions", method="llm")
+        return await question_router_chain.ainvoke(inputs)
+    print(f"---EMBEDDING ROUTER: {datasource} ({confidence:.3f})---")
+    get_registry().inc("router_decisions", method="embedding")
+    return RouteQuery(datasource=datasource)
+
+# Same interface as question_router_chain: {"question": ...} -> RouteQuery
+question_router = RunnableLambda(route, afunc=aroute) if EMBEDDING_ROUTER else question_router_chain
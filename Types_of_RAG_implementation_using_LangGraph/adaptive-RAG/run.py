@@ -3,7 +3,11 @@ from graph import app
 
 # Run 
 inputs = {"question": "What player at the Bears expected to draft first in the 2024 NFL draft?"}
-for output in app.stream(inputs):
+# "custom" carries the answer tokens as the generate node produces them
+for mode, output in app.stream(inputs, stream_mode=["updates", "custom"]):
+    if mode == "custom":
+        print(output["token"], end="", flush=True)
+        continue
     for key, value in output.items():
         # Node
         pprint(f"Node '{key}':")
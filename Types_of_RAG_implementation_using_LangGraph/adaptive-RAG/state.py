@@ -9,7 +9,29 @@ class GraphState(TypedDict):
         question: question
         generation: LLM generation
         documents: list of documents 
+        datasource: datasource chosen by the router in speculative mode
+        generation_count: number of generations so far
+        rewrite_count: number of question rewrites so far
+        tokens_used: estimated LLM tokens used so far
+        started_at: time the run started
+        best_generation: latest answer that was grounded in the documents
+        budget_exhausted: True when the answer was returned because the loop budget ran out
+        budget_reason: which limit ran out (tokens, time, regenerations, rewrites)
+        max_regenerations, max_rewrites, max_tokens, max_seconds: optional per-run
+            overrides of the loop budget (see rag_common.budget)
     """
     question : str
     generation : str
-    documents : List[str]
\ No newline at end of file
+    documents : List[str]
+    datasource : str
+    generation_count : int
+    rewrite_count : int
+    tokens_used : int
+    started_at : float
+    best_generation : str
+    budget_exhausted : bool
+    budget_reason : str
+    max_regenerations : int
+    max_rewrites : int
+    max_tokens : int
+    max_seconds : float
\ No newline at end of file
@@ -1,4 +1,9 @@
 ### Search
 
-from langchain_community.tools.tavily_search import TavilySearchResults
-web_search_tool = TavilySearchResults(k=3)
\ No newline at end of file
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.components import lazy
+from rag_common.providers import get_web_search_tool
+
+web_search_tool = lazy("web_search_tool", lambda: get_web_search_tool(k=3))
@@ -0,0 +1,78 @@
+"""
+Chains of the agentic graph, built once and shared by every run (see rag_common.components).
+
+Each builder runs on first use; the nodes and edges call it to get the shared
+instance instead of creating a chat model, converting the tool schemas and
+fetching the RAG prompt per call. All models share the pooled HTTP
+clients (rag_common.providers.get_http_clients) and are built from the
+one chat model of rag_common.components.
+"""
+from langchain.prompts import PromptTemplate
+from langchain_core.utils.function_calling import convert_to_openai_function, convert_to_openai_tool
+from langchain_core.output_parsers import StrOutputParser
+from langchain.output_parsers.openai_tools import PydanticToolsParser
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+load_dotenv()
+
+from tools import tools
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.components import component, resolve, shared_chat_model
+from rag_common.providers import get_rag_prompt
+
+@component()
+def agent_model():
+    """Chat model with the retriever tool bound, deciding whether to retrieve."""
+    model = shared_chat_model()
+    functions = [convert_to_openai_function(t) for t in resolve(tools)]
+    return model.bind_tools(functions)
+
+@component()
+def rag_chain():
+    """RAG prompt | chat model | string parser, answering from the retrieved context."""
+    return get_rag_prompt() | shared_chat_model() | StrOutputParser()
+
+@component()
+def rewrite_model():
+    """Chat model re-phrasing the question."""
+    return shared_chat_model()
+
+@component()
+def relevance_grader_chain():
+    """Chain grading the relevance of a retrieved context to a question ('yes' / 'no')."""
+
+    # Data model
+    class grade(BaseModel):
+        """Binary score for relevance check."""
+
+        binary_score: str = Field(description="Relevance score 'yes' or 'no'")
+
+    # LLM
+    model = shared_chat_model()
+
+    # Tool
+    grade_tool_oai = convert_to_openai_tool(grade)
+
+    # LLM with tool and enforce invocation
+    llm_with_tool = model.bind(
+        tools=[convert_to_openai_tool(grade_tool_oai)],
+        tool_choice={"type": "function", "function": {"name": "grade"}},
+    )
+
+    # Parser
+    parser_tool = PydanticToolsParser(tools=[grade])
+
+    # Prompt
+    prompt = PromptTemplate(
+        template="""You are a grader assessing relevance of a retrieved document to a user question. \n 
+        Here is the retrieved document: \n\n {context} \n\n
+        Here is the user question: {question} \n
+        If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n
+        Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question.""",
+        input_variables=["context", "question"],
+    )
+
+    # Chain
+    return prompt | llm_with_tool | parser_tool
@@ -1,10 +1,10 @@
-from langchain.prompts import PromptTemplate
-from langchain_core.utils.function_calling import convert_to_openai_tool
-from langchain.output_parsers.openai_tools import PydanticToolsParser
-from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 load_dotenv()
+from chains import relevance_grader_chain
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.relevance_prefilter import aprefiltered_grades, prefiltered_grades
 
 def should_retrieve(state):
     """
@@ -45,53 +45,52 @@ def grade_documents(state):
     """
 
     print("---CHECK RELEVANCE---")
+    chain = relevance_grader_chain()
 
-    # Data model
-    class grade(BaseModel):
-        """Binary score for relevance check."""
+    messages = state["messages"]
+    last_message = messages[-1]
 
-        binary_score: str = Field(description="Relevance score 'yes' or 'no'")
+    question = messages[0].content
+    docs = last_message.content
+    
+    def grade_with_llm(contexts):
+        return [chain.invoke({"question": question, "context": context})[0].binary_score for context in contexts]
 
-    # LLM
-    model = ChatOpenAI()
+    # Obviously relevant / irrelevant results are decided locally, without the grader call
+    grade = prefiltered_grades(question, [docs], grade_with_llm)[0]
 
-    # Tool
-    grade_tool_oai = convert_to_openai_tool(grade)
+    if grade == "yes":
+        print("---DECISION: DOCS RELEVANT---")
+        return "yes"
 
-    # LLM with tool and enforce invocation
-    llm_with_tool = model.bind(
-        tools=[convert_to_openai_tool(grade_tool_oai)],
-        tool_choice={"type": "function", "function": {"name": "grade"}},
-    )
+    else:
+        print("---DECISION: DOCS NOT RELEVANT---")
+        print(grade)
+        return "no"
 
-    # Parser
-    parser_tool = PydanticToolsParser(tools=[grade])
+async def agrade_documents(state):
+    """
+    Async twin of grade_documents.
 
-    # Prompt
-    prompt = PromptTemplate(
-        template="""You are a grader assessing relevance of a retrieved document to a user question. \n 
-        Here is the retrieved document: \n\n {context} \n\n
-        Here is the user question: {question} \n
-        If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n
-        Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question.""",
-        input_variables=["context", "question"],
-    )
+    Args:
+        state (messages): The current state
 
-    # Chain
-    chain = prompt | llm_with_tool | parser_tool
+    Returns:
+        str: A decision for whether the documents are relevant or not
+    """
 
-    messages = state["messages"]
-    last_message = messages[-1]
+    print("---CHECK RELEVANCE---")
+    chain = relevance_grader_chain()
 
+    messages = state["messages"]
     question = messages[0].content
-    docs = last_message.content
-    
-    score = chain.invoke(
-        {"question": question, 
-         "context": docs}
-    )
-    
-    grade = score[0].binary_score
+    docs = messages[-1].content
+
+    async def grade_with_llm(contexts):
+        return [(await chain.ainvoke({"question": question, "context": context}))[0].binary_score for context in contexts]
+
+    # Obviously relevant / irrelevant results are decided locally, without the grader call
+    grade = (await aprefiltered_grades(question, [docs], grade_with_llm))[0]
 
     if grade == "yes":
         print("---DECISION: DOCS RELEVANT---")
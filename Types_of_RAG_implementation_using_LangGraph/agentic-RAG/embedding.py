@@ -1,45 +1,52 @@
-##########ONE TIME RUN!!!! to create a Chroma DB from web pages##########
+##########Create / update the Chroma DB from web pages (safe to re-run: only new or changed pages are embedded)##########
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import WebBaseLoader
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.embedding_cache import get_embeddings
+from rag_common.bm25_index import BM25Index
+from rag_common.ingestion import IncrementalIngestor, iter_loaded_sources
 from dotenv import load_dotenv
 load_dotenv()
 
 
 PERSIST_DIR = "./chroma_db"
 
-# Check if DB already exists
-if os.path.exists(PERSIST_DIR) and len(os.listdir(PERSIST_DIR)) > 0:
-    print("Loading existing Chroma DB...")
-    vectorstore = Chroma(
-        collection_name="rag-chroma",
-        embedding_function=OpenAIEmbeddings(),
-        persist_directory=PERSIST_DIR,
-    )
-else:
-    print("Creating new Chroma DB...")
-    urls = [
+urls = [
     "https://lilianweng.github.io/posts/2023-06-23-agent/",
     "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
-    ]
-
-    docs_lists = []
-    for url in urls:
-        loader = WebBaseLoader(url)
-        docs_lists.extend(loader.load())
-
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=250, chunk_overlap=0)
-    doc_splits = text_splitter.split_documents(docs_lists)
-
-    print(f"Number of documents loaded: {len(doc_splits)}")
-
-    vectorstore = Chroma.from_documents(
-        documents=doc_splits,
-        embedding=OpenAIEmbeddings(),
-        collection_name="rag-chroma",
-        persist_directory=PERSIST_DIR,
-    )
-    vectorstore.persist()
\ No newline at end of file
+]
+
+vectorstore = Chroma(
+    collection_name="rag-chroma",
+    embedding_function=get_embeddings(),
+    persist_directory=PERSIST_DIR,
+)
+
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=250, chunk_overlap=0)
+
+# Records per-source content hashes and deterministic chunk IDs next to the collection
+ingestor = IncrementalIngestor(
+    vectorstore,
+    text_splitter,
+    manifest_path=os.path.join(PERSIST_DIR, "ingestion_manifest.sqlite"),
+    # BM25 keyword index over the same chunk IDs, for the hybrid retriever
+    keyword_index=BM25Index(os.path.join(PERSIST_DIR, "bm25")),
+)
+
+# Pass URLs or a local directory of HTML files on the command line to ingest those instead
+sources = sys.argv[1:] or urls
+
+# Fetch sources concurrently, split each as it arrives, embed and upsert in fixed-size batches.
+# The default source list is the full corpus, so sources dropped from it are removed from the
+# collection; sources given on the command line are added or updated, and nothing else is removed.
+stats = ingestor.ingest_stream(
+    iter_loaded_sources(sources, max_workers=int(os.getenv("INGEST_MAX_WORKERS", "8"))),
+    batch_size=int(os.getenv("INGEST_BATCH_SIZE", "64")),
+    remove_missing=not sys.argv[1:],
+)
+
+print(f"Chunks added: {stats['added']}, deleted: {stats['deleted']}")
+print(f"Sources updated: {stats['updated_sources']}, unchanged: {stats['unchanged_sources']}, removed: {stats['removed_sources']}, failed: {stats['failed_sources']}")
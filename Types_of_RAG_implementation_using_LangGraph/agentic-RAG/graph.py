@@ -1,18 +1,25 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.instrumentation import instrument
 import pprint
 from langchain_core.messages import HumanMessage
 from state import AgentState
-from nodes import agent, retrieve, rewrite, generate
-from edges import grade_documents, should_retrieve
+from nodes import agent, aagent, retrieve, aretrieve, rewrite, arewrite, generate, agenerate
+from edges import grade_documents, agrade_documents, should_retrieve
 
 # Define a new graph
 workflow = StateGraph(AgentState)
 
 # Define the nodes we will cycle between
-workflow.add_node("agent", agent)  # agent
-workflow.add_node("retrieve", retrieve)  # retrieval
-workflow.add_node("rewrite", rewrite)  # retrieval
-workflow.add_node("generate", generate)  # retrieval
+# RunnableLambda(sync, afunc=async): app.invoke / app.stream run the sync version,
+# app.ainvoke / app.astream the async one (see rag_common.serving)
+workflow.add_node("agent", RunnableLambda(agent, afunc=aagent))  # agent
+workflow.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve))  # retrieval
+workflow.add_node("rewrite", RunnableLambda(rewrite, afunc=arewrite))  # retrieval
+workflow.add_node("generate", RunnableLambda(generate, afunc=agenerate))  # retrieval
 
 
 # Call agent node to decide to retrieve or not
@@ -34,7 +41,7 @@ workflow.add_conditional_edges(
 workflow.add_conditional_edges(
     "retrieve",
     # Assess agent decision
-    grade_documents,
+    RunnableLambda(grade_documents, afunc=agrade_documents),
     {
         "yes": "generate",
         "no": "rewrite",  
@@ -44,18 +51,20 @@ workflow.add_edge("generate", END)
 workflow.add_edge("rewrite", "agent")
 
 # Compile
-app = workflow.compile()
-
-inputs = {
-    "messages": [
-        HumanMessage(
-            content="What does Lilian Weng say about the types of agent memory?"
-        )
-    ]
-}
-for output in app.stream(inputs, stream_mode="values"):
-    for key, value in output.items():
-        pprint.pprint(f"Output from node '{key}':")
-        pprint.pprint("---")
-        pprint.pprint(value, indent=2, width=80, depth=None)
-    pprint.pprint("\n---\n")
\ No newline at end of file
+# Per-node/edge timing, model calls, tokens and state size (see rag_common.instrumentation)
+app = instrument(workflow.compile(), graph_name="agentic-RAG")
+
+if __name__ == "__main__":
+    inputs = {
+        "messages": [
+            HumanMessage(
+                content="What does Lilian Weng say about the types of agent memory?"
+            )
+        ]
+    }
+    for output in app.stream(inputs, stream_mode="values"):
+        for key, value in output.items():
+            pprint.pprint(f"Output from node '{key}':")
+            pprint.pprint("---")
+            pprint.pprint(value, indent=2, width=80, depth=None)
+        pprint.pprint("\n---\n")
@@ -1,13 +1,14 @@
 from langchain_core.messages import HumanMessage
-from langchain import hub
-from langchain_core.utils.function_calling import convert_to_openai_function
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 load_dotenv()
 
 from state import AgentState
-from tools import tools, tool_executor
+from tools import tool_executor
+from chains import agent_model, rag_chain, rewrite_model
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.streaming import astream_generation, stream_generation
 
 def agent(state : AgentState):
     """
@@ -22,10 +23,25 @@ def agent(state : AgentState):
     """
     print("---CALL AGENT---")
     messages = state["messages"]
-    model = ChatOpenAI()
-    functions = [convert_to_openai_function(t) for t in tools]
-    model = model.bind_tools(functions)
-    response = model.invoke(messages)
+    response = agent_model().invoke(messages)
+    # We return a list, because this will get added to the existing list
+    return {
+        "messages": [response]
+    }
+
+async def aagent(state : AgentState):
+    """
+    Async twin of agent.
+
+    Args:
+        state (messages): The current state
+
+    Returns:
+        dict: The updated state with the agent response apended to messages
+    """
+    print("---CALL AGENT---")
+    messages = state["messages"]
+    response = await agent_model().ainvoke(messages)
     # We return a list, because this will get added to the existing list
     return {
         "messages": [response]
@@ -56,6 +72,27 @@ def retrieve(state):
     # We return a list, because this will get added to the existing list
     return {"messages": [tool_message]}
 
+async def aretrieve(state):
+    """
+    Async twin of retrieve.
+
+    Args:
+        state (messages): The current state
+
+    Returns:
+        dict: The updated state with retrieved docs
+    """
+    print("---EXECUTE RETRIEVAL---")
+    messages = state["messages"]
+    last_message = messages[-1]
+
+    # The retriever tool runs retriever.ainvoke
+    response = await tool_executor.ainvoke({"messages": [last_message]})
+    tool_message = response["messages"][0]
+
+    # We return a list, because this will get added to the existing list
+    return {"messages": [tool_message]}
+
 def generate(state):
     """
     Generate answer
@@ -73,19 +110,43 @@ def generate(state):
     last_message = messages[-1]
     docs = last_message.content
 
-    # Prompt
-    prompt = hub.pull("rlm/rag-prompt")
+    # Run the shared RAG chain, streaming the answer token by token to the graph's custom stream
+    response = stream_generation(rag_chain(), {"context": docs, "question": question})
+    return {"messages": [response]}
+
+async def agenerate(state):
+    """
+    Async twin of generate.
 
-    # LLM
-    llm = ChatOpenAI()
+    Args:
+        state (messages): The current state
+
+    Returns:
+         dict: The updated state with the generated answer
+    """
+    print("---GENERATE---")
+    messages = state["messages"]
+    question = messages[0].content
 
-    # Chain
-    rag_chain = prompt | llm | StrOutputParser()
+    last_message = messages[-1]
+    docs = last_message.content
 
-    # Run
-    response = rag_chain.invoke({"context": docs, "question": question})
+    # Run the shared RAG chain, streaming the answer token by token to the graph's custom stream
+    response = await astream_generation(rag_chain(), {"context": docs, "question": question})
     return {"messages": [response]}
 
+def rewrite_messages(question):
+    """Prompt asking the model for an improved version of question."""
+    return [HumanMessage(
+        content=f""" \n 
+    Look at the input and try to reason about the underlying semantic intent / meaning. \n 
+    Here is the initial question:
+    \n ------- \n
+    {question} 
+    \n ------- \n
+    Formulate an improved question: """,
+    )]
+
 def rewrite(state):
     """
     Transform the query to produce a better question.
@@ -101,17 +162,25 @@ def rewrite(state):
     messages = state["messages"]
     question = messages[0].content
 
-    msg = [HumanMessage(
-        content=f""" \n 
-    Look at the input and try to reason about the underlying semantic intent / meaning. \n 
-    Here is the initial question:
-    \n ------- \n
-    {question} 
-    \n ------- \n
-    Formulate an improved question: """,
-    )]
+    msg = rewrite_messages(question)
+
+    response = rewrite_model().invoke(msg)
+    return {"messages": [response]}
+
+async def arewrite(state):
+    """
+    Async twin of rewrite.
+
+    Args:
+        state (messages): The current state
 
-    # Grader
-    model = ChatOpenAI()
-    response = model.invoke(msg)
-    return {"messages": [response]}
\ No newline at end of file
+    Returns:
+        dict: The updated state with re-phrased question
+    """
+
+    print("---TRANSFORM QUERY---")
+    messages = state["messages"]
+    question = messages[0].content
+
+    response = await rewrite_model().ainvoke(rewrite_messages(question))
+    return {"messages": [response]}
@@ -1,12 +1,19 @@
 from langchain.tools.retriever import create_retriever_tool
 from retriever import retriever
 from langgraph.prebuilt import ToolNode
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.components import lazy, resolve
 
-tool = create_retriever_tool(
-    retriever,
-    "retrieve_blog_posts",
-    "Search and return information blog posts on LLM agents, prompt engineering, and adversarial attacks on LLMs.",
-)
+def build_tools():
+    tool = create_retriever_tool(
+        resolve(retriever),
+        "retrieve_blog_posts",
+        "Search and return information blog posts on LLM agents, prompt engineering, and adversarial attacks on LLMs.",
+    )
+    return [tool]
 
-tools = [tool]
-tool_executor = ToolNode(tools)
\ No newline at end of file
+# Built on first use (see rag_common.components); resolve(tools) gives the list
+tools = lazy("tools", build_tools)
+tool_executor = lazy("tool_executor", lambda: ToolNode(resolve(tools)))
\ No newline at end of file
@@ -1,20 +1,26 @@
 ### Generate
 
-from langchain import hub
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 load_dotenv()
-
-# Prompt
-prompt = hub.pull("rlm/rag-prompt")
-
-# LLM
-llm = ChatOpenAI()
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.components import lazy, shared_chat_model
+from rag_common.providers import get_rag_prompt
 
 # Post-processing
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
-# Chain
-generate_rag_chain = prompt | llm | StrOutputParser()
\ No newline at end of file
+# Chain, built on first use
+def build_generate_rag_chain():
+    # Prompt
+    prompt = get_rag_prompt()
+
+    # LLM
+    llm = shared_chat_model()
+
+    return prompt | llm | StrOutputParser()
+
+generate_rag_chain = lazy("generate_rag_chain", build_generate_rag_chain)
\ No newline at end of file
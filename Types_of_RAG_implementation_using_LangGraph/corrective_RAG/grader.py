@@ -1,19 +1,23 @@
-from langchain_openai import ChatOpenAI
+import os
+import sys
+
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.batch_grading import build_batch_grader_chain
+from rag_common.components import lazy, shared_chat_model
+from rag_common.microbatch import with_micro_batching
+from rag_common.verdict_cache import with_verdict_cache
+
 # Data model
 class GradeDocuments(BaseModel):
     """Binary score for relevance check on retrieved documents."""
 
     binary_score: str = Field(description="Documents are relevant to the question, 'yes' or 'no'")
 
-# LLM with function call 
-llm = ChatOpenAI()
-structured_llm_grader = llm.with_structured_output(GradeDocuments)
-
 # Prompt 
 system = """You are a grader assessing relevance of a retrieved document to a user question. \n 
     If the document contains keyword(s) or semantic meaning related to the question, grade it as relevant. \n
@@ -25,4 +29,16 @@ grade_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-retrieval_grader_chain = grade_prompt | structured_llm_grader
\ No newline at end of file
+# LLM with function call, built on first use from the shared chat model
+def build_retrieval_grader_chain():
+    structured_llm_grader = shared_chat_model().with_structured_output(GradeDocuments)
+    return with_verdict_cache(with_micro_batching(grade_prompt | structured_llm_grader, "retrieval_grader"), "retrieval_grader", GradeDocuments)
+
+retrieval_grader_chain = lazy("retrieval_grader_chain", build_retrieval_grader_chain)
+
+### Batched Retrieval Grader
+
+# All documents in one call; prompt, cache reuse and fallback live in rag_common.batch_grading
+batch_retrieval_grader_chain = lazy(
+    "batch_retrieval_grader_chain", lambda: build_batch_grader_chain(shared_chat_model())
+)
@@ -1,53 +1,85 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.answer_cache import with_answer_cache
+from rag_common.instrumentation import instrument
+from retriever import vectorstore
 from state import GraphState
 from nodes import (
     retrieve,
+    aretrieve,
     grade_documents,
+    agrade_documents,
     generate,
+    agenerate,
     transform_query,
-    web_search
+    atransform_query,
+    web_search,
+    aweb_search,
+    speculative_grade_documents,
+    aspeculative_grade_documents,
 )
 from edges import decide_to_generate
 
+# Re-write and web search while the documents are still being graded
+SPECULATIVE = os.getenv("RAG_SPECULATIVE", "false").lower() == "true"
+
 workflow = StateGraph(GraphState)
 
 # Define the nodes
-workflow.add_node("retrieve", retrieve)  # retrieve
-workflow.add_node("grade_documents", grade_documents)  # grade documents
-workflow.add_node("generate", generate)  # generatae
-workflow.add_node("transform_query", transform_query)  # transform_query
-workflow.add_node("web_search_node", web_search)  # web search
+# RunnableLambda(sync, afunc=async): app.invoke / app.stream run the sync version,
+# app.ainvoke / app.astream the async one (see rag_common.serving)
+workflow.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve))  # retrieve
+workflow.add_node("generate", RunnableLambda(generate, afunc=agenerate))  # generatae
 
 # Build graph
 workflow.set_entry_point("retrieve")
 workflow.add_edge("retrieve", "grade_documents")
-workflow.add_conditional_edges(
-    "grade_documents",
-    decide_to_generate,
-    {
-        "transform_query": "transform_query",
-        "generate": "generate",
-    },
-)
-workflow.add_edge("transform_query", "web_search_node")
-workflow.add_edge("web_search_node", "generate")
+if SPECULATIVE:
+    # grade documents + transform_query + web search in one parallel step
+    workflow.add_node("grade_documents", RunnableLambda(speculative_grade_documents, afunc=aspeculative_grade_documents))
+    workflow.add_edge("grade_documents", "generate")
+else:
+    workflow.add_node("grade_documents", RunnableLambda(grade_documents, afunc=agrade_documents))  # grade documents
+    workflow.add_node("transform_query", RunnableLambda(transform_query, afunc=atransform_query))  # transform_query
+    workflow.add_node("web_search_node", RunnableLambda(web_search, afunc=aweb_search))  # web search
+    workflow.add_conditional_edges(
+        "grade_documents",
+        decide_to_generate,
+        {
+            "transform_query": "transform_query",
+            "generate": "generate",
+        },
+    )
+    workflow.add_edge("transform_query", "web_search_node")
+    workflow.add_edge("web_search_node", "generate")
 workflow.add_edge("generate", END)
 
 # Compile
-app = workflow.compile()
+# Per-node/edge timing, model calls, tokens and state size (see rag_common.instrumentation)
+app = instrument(workflow.compile(), graph_name="corrective_RAG")
+# Repeated and paraphrased questions are answered from the answer cache, until their documents change
+app = with_answer_cache(app, "corrective_RAG", vectorstore=vectorstore)
 
 
-from pprint import pprint
+if __name__ == "__main__":
+    from pprint import pprint
 
-# Run
-inputs = {"question": "What are the types of agent memory?"}
-for output in app.stream(inputs):
-    for key, value in output.items():
-        # Node
-        pprint(f"Node '{key}':")
-        # Optional: print full state at each node
-        # pprint.pprint(value["keys"], indent=2, width=80, depth=None)
-    pprint("\n---\n")
+    # Run
+    inputs = {"question": "What are the types of agent memory?"}
+    # "custom" carries the answer tokens as the generate node produces them
+    for mode, output in app.stream(inputs, stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            print(output["token"], end="", flush=True)
+            continue
+        for key, value in output.items():
+            # Node
+            pprint(f"Node '{key}':")
+            # Optional: print full state at each node
+            # pprint.pprint(value["keys"], indent=2, width=80, depth=None)
+        pprint("\n---\n")
 
-# Final generation
-pprint(value["generation"])
\ No newline at end of file
+    # Final generation
+    pprint(value["generation"])
@@ -1,9 +1,29 @@
 from langchain.schema import Document
 from retriever import retriever
 from generator import generate_rag_chain
-from grader import retrieval_grader_chain
+from grader import retrieval_grader_chain, batch_retrieval_grader_chain
 from question_rewriter import question_rewriter_chain
 from web_search_tool import web_search_tool
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+import asyncio
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.batch_grading import agrade_relevance, grade_relevance, keep_relevant
+from rag_common.streaming import astream_generation, stream_generation
+
+# Grade all retrieved documents in one LLM call instead of one call per document
+BATCH_GRADING = os.getenv("BATCH_GRADING", "true").lower() == "true"
+
+# Max number of concurrent grader calls in agrade_documents (provider rate limits)
+GRADER_MAX_CONCURRENCY = int(os.getenv("GRADER_MAX_CONCURRENCY", "4"))
+
+# Threads re-writing and web searching while documents are graded (RAG_SPECULATIVE mode)
+speculation_executor = ContextThreadPoolExecutor(max_workers=int(os.getenv("SPECULATIVE_MAX_WORKERS", "8")))
+
+def web_results_document(docs):
+    """Join web search results into a single Document."""
+    return Document(page_content="\n".join([d["content"] for d in docs]))
 
 def retrieve(state):
     """
@@ -22,6 +42,23 @@ def retrieve(state):
     documents = retriever.invoke(question)
     return {"documents": documents, "question": question}
 
+async def aretrieve(state):
+    """
+    Async twin of retrieve.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): New key added to state, documents, that contains retrieved documents
+    """
+    print("---RETRIEVE---")
+    question = state["question"]
+
+    # Retrieval
+    documents = await retriever.ainvoke(question)
+    return {"documents": documents, "question": question}
+
 def generate(state):
     """
     Generate answer
@@ -36,8 +73,26 @@ def generate(state):
     question = state["question"]
     documents = state["documents"]
     
-    # RAG generation
-    generation = generate_rag_chain.invoke({"context": documents, "question": question})
+    # RAG generation, streamed token by token to the graph's custom stream
+    generation = stream_generation(generate_rag_chain, {"context": documents, "question": question})
+    return {"documents": documents, "question": question, "generation": generation}
+
+async def agenerate(state):
+    """
+    Async twin of generate.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): New key added to state, generation, that contains LLM generation
+    """
+    print("---GENERATE---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # RAG generation, streamed token by token to the graph's custom stream
+    generation = await astream_generation(generate_rag_chain, {"context": documents, "question": question})
     return {"documents": documents, "question": question, "generation": generation}
 
 def grade_documents(state):
@@ -55,19 +110,36 @@ def grade_documents(state):
     question = state["question"]
     documents = state["documents"]
     
-    # Score each doc
-    filtered_docs = []
-    web_search = "No"
-    for d in documents:
-        score = retrieval_grader_chain.invoke({"question": question, "document": d.page_content})
-        grade = score.binary_score
-        if grade == "yes":
-            print("---GRADE: DOCUMENT RELEVANT---")
-            filtered_docs.append(d)
-        else:
-            print("---GRADE: DOCUMENT NOT RELEVANT---")
-            web_search = "Yes"
-            continue
+    # Decide the obvious docs locally, score the rest with the LLM grader (in one call with BATCH_GRADING)
+    batch_grader = batch_retrieval_grader_chain if BATCH_GRADING else None
+    grades = grade_relevance(question, documents, retrieval_grader_chain, batch_grader)
+    filtered_docs = keep_relevant(documents, grades)
+    web_search = "Yes" if len(filtered_docs) < len(documents) else "No"
+    return {"documents": filtered_docs, "question": question, "web_search": web_search}
+
+async def agrade_documents(state):
+    """
+    Async twin of grade_documents: grades the retrieved documents in one batched call
+    (BATCH_GRADING), or all of them concurrently.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updates documents key with only filtered relevant documents
+    """
+
+    print("---CHECK DOCUMENT RELEVANCE TO QUESTION (ASYNC)---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # Same grading, with at most GRADER_MAX_CONCURRENCY grader calls in flight
+    batch_grader = batch_retrieval_grader_chain if BATCH_GRADING else None
+    grades = await agrade_relevance(
+        question, documents, retrieval_grader_chain, batch_grader, max_concurrency=GRADER_MAX_CONCURRENCY
+    )
+    filtered_docs = keep_relevant(documents, grades)
+    web_search = "Yes" if len(filtered_docs) < len(documents) else "No"
     return {"documents": filtered_docs, "question": question, "web_search": web_search}
 
 def transform_query(state):
@@ -88,6 +160,25 @@ def transform_query(state):
     # Re-write question
     better_question = question_rewriter_chain.invoke({"question": question})
     return {"documents": documents, "question": better_question}
+
+async def atransform_query(state):
+    """
+    Async twin of transform_query.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updates question key with a re-phrased question
+    """
+
+    print("---TRANSFORM QUERY---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # Re-write question
+    better_question = await question_rewriter_chain.ainvoke({"question": question})
+    return {"documents": documents, "question": better_question}
     
 def web_search(state):
     """
@@ -106,8 +197,112 @@ def web_search(state):
 
     # Web search
     docs = web_search_tool.invoke({"query": question})
-    web_results = "\n".join([d["content"] for d in docs])
-    web_results = Document(page_content=web_results)
+    web_results = web_results_document(docs)
+    documents.append(web_results)
+
+    return {"documents": documents, "question": question}
+
+async def aweb_search(state):
+    """
+    Async twin of web_search.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updates documents key with appended web results
+    """
+
+    print("---WEB SEARCH---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # Web search
+    docs = await web_search_tool.ainvoke({"query": question})
+    web_results = web_results_document(docs)
     documents.append(web_results)
 
-    return {"documents": documents, "question": question}
\ No newline at end of file
+    return {"documents": documents, "question": question}
+
+def rewrite_and_search(state):
+    """Re-write the question and web search it (speculative branch of grade_documents)."""
+    better_question = question_rewriter_chain.invoke({"question": state["question"]})
+    docs = web_search_tool.invoke({"query": better_question})
+    return {"question": better_question, "web_results": web_results_document(docs)}
+
+async def arewrite_and_search(state):
+    better_question = await question_rewriter_chain.ainvoke({"question": state["question"]})
+    docs = await web_search_tool.ainvoke({"query": better_question})
+    return {"question": better_question, "web_results": web_results_document(docs)}
+
+def keep_or_drop_search(graded, searched):
+    """Merge the speculative web search into the graded state (searched is None when dropped)."""
+    if searched is None:
+        return graded
+    return {
+        "documents": graded["documents"] + [searched["web_results"]],
+        "question": searched["question"],
+        "web_search": "Yes",
+    }
+
+async def drop_speculative(task):
+    """Cancel a speculative task and wait until it stops, discarding its result or error."""
+    task.cancel()
+    await asyncio.wait([task])
+    if not task.cancelled():
+        # It finished before the cancel; mark a failure as retrieved
+        task.exception()
+
+def speculative_grade_documents(state):
+    """
+    Grade documents while the question is re-written and web searched in parallel (RAG_SPECULATIVE mode).
+
+    Replaces grade_documents -> transform_query -> web_search with a single step.
+    The search is only waited for when grading found an irrelevant document.
+    Otherwise it is cancelled if its thread has not started yet; a search
+    already running completes and its result is dropped, so the re-write and
+    web search are usually paid for on every question.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Relevant documents, plus web results and the re-written question if needed
+    """
+
+    print("---CHECK DOCUMENT RELEVANCE, REWRITE AND WEB SEARCH IN PARALLEL---")
+    search = speculation_executor.submit(rewrite_and_search, state)
+    graded = grade_documents(state)
+    if graded["web_search"] == "Yes":
+        print("---KEEP SPECULATIVE WEB SEARCH---")
+        return keep_or_drop_search(graded, search.result())
+    print("---DROP SPECULATIVE WEB SEARCH---")
+    # No-op once the thread runs; the result is then ignored
+    search.cancel()
+    return keep_or_drop_search(graded, None)
+
+async def aspeculative_grade_documents(state):
+    """
+    Async twin of speculative_grade_documents. A search that is not needed is
+    cancelled, and awaited until it has stopped.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Relevant documents, plus web results and the re-written question if needed
+    """
+
+    print("---CHECK DOCUMENT RELEVANCE, REWRITE AND WEB SEARCH IN PARALLEL (ASYNC)---")
+    search = asyncio.ensure_future(arewrite_and_search(state))
+    try:
+        graded = await agrade_documents(state)
+    except BaseException:
+        await drop_speculative(search)
+        raise
+    if graded["web_search"] == "Yes":
+        print("---KEEP SPECULATIVE WEB SEARCH---")
+        return keep_or_drop_search(graded, await search)
+    print("---DROP SPECULATIVE WEB SEARCH---")
+    await drop_speculative(search)
+    return keep_or_drop_search(graded, None)
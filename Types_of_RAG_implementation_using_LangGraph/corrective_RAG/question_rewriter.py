@@ -1,11 +1,12 @@
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 load_dotenv()
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-
-# LLM 
-llm = ChatOpenAI()
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.components import lazy, shared_chat_model
+from rag_common.microbatch import with_micro_batching
 
 # Prompt 
 system = """You a question re-writer that converts an input question to a better version that is optimized \n 
@@ -17,4 +18,8 @@ re_write_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-question_rewriter_chain = re_write_prompt | llm | StrOutputParser()
+# LLM, built on first use from the shared chat model
+def build_question_rewriter_chain():
+    return with_micro_batching(re_write_prompt | shared_chat_model() | StrOutputParser(), "question_rewriter")
+
+question_rewriter_chain = lazy("question_rewriter_chain", build_question_rewriter_chain)
@@ -1,4 +1,8 @@
 from grader import hallucination_grader_chain, answer_grader_chain
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.budget import default_budget
 
 def decide_to_generate(state):
     """
@@ -13,9 +17,13 @@ def decide_to_generate(state):
 
     print("---ASSESS GRADED DOCUMENTS---")
     filtered_documents = state["documents"]
+    budget = default_budget.for_state(state)
 
     if not filtered_documents:
         # All documents have been filtered check_relevance
+        if budget.spent(state) or not budget.can_rewrite(state):
+            print("---DECISION: NO RELEVANT DOCUMENTS AND LOOP BUDGET EXHAUSTED---")
+            return "budget_exhausted"
         # We will re-generate a new query
         print("---DECISION: ALL DOCUMENTS ARE NOT RELEVANT TO QUESTION, TRANSFORM QUERY---")
         return "transform_query"
@@ -35,6 +43,12 @@ def grade_generation_v_documents_and_question(state):
         str: Decision for next node to call
     """
 
+    budget = default_budget.for_state(state)
+    if budget.spent(state):
+        # Out of tokens or time: skip the graders and return what we have
+        print("---DECISION: LOOP BUDGET EXHAUSTED, SKIP GRADING---")
+        return "budget_exhausted"
+
     print("---CHECK HALLUCINATIONS---")
     question = state["question"]
     documents = state["documents"]
@@ -55,7 +69,62 @@ def grade_generation_v_documents_and_question(state):
             return "useful"
         else:
             print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
+            if not budget.can_rewrite(state):
+                print("---DECISION: REWRITE BUDGET EXHAUSTED---")
+                # This answer is grounded and newer than best_generation, so finalize keeps it
+                return "budget_exhausted_grounded"
+            return "not useful"
+    else:
+        if not budget.can_regenerate(state):
+            print("---DECISION: GENERATION IS NOT GROUNDED, REGENERATION BUDGET EXHAUSTED---")
+            return "budget_exhausted"
+        print("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS, RE-TRY---")
+        return "not supported"
+
+async def agrade_generation_v_documents_and_question(state):
+    """
+    Async twin of grade_generation_v_documents_and_question.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        str: Decision for next node to call
+    """
+
+    budget = default_budget.for_state(state)
+    if budget.spent(state):
+        print("---DECISION: LOOP BUDGET EXHAUSTED, SKIP GRADING---")
+        return "budget_exhausted"
+
+    print("---CHECK HALLUCINATIONS---")
+    question = state["question"]
+    documents = state["documents"]
+    generation = state["generation"]
+
+    score = await hallucination_grader_chain.ainvoke({"documents": documents, "generation": generation})
+    grade = score.binary_score
+
+    # Check hallucination
+    if grade == "yes":
+        print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
+        # Check question-answering
+        print("---GRADE GENERATION vs QUESTION---")
+        score = await answer_grader_chain.ainvoke({"question": question,"generation": generation})
+        grade = score.binary_score
+        if grade == "yes":
+            print("---DECISION: GENERATION ADDRESSES QUESTION---")
+            return "useful"
+        else:
+            print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
+            if not budget.can_rewrite(state):
+                print("---DECISION: REWRITE BUDGET EXHAUSTED---")
+                # This answer is grounded and newer than best_generation, so finalize keeps it
+                return "budget_exhausted_grounded"
             return "not useful"
     else:
+        if not budget.can_regenerate(state):
+            print("---DECISION: GENERATION IS NOT GROUNDED, REGENERATION BUDGET EXHAUSTED---")
+            return "budget_exhausted"
         print("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS, RE-TRY---")
-        return "not supported"
\ No newline at end of file
+        return "not supported"
@@ -1,16 +1,27 @@
-from nodes import GraphState, retrieve, grade_documents, generate, transform_query
-from edges import decide_to_generate, grade_generation_v_documents_and_question
+from nodes import GraphState, retrieve, aretrieve, grade_documents, agrade_documents, generate, agenerate, transform_query, atransform_query, finalize, finalize_grounded
+from edges import decide_to_generate, grade_generation_v_documents_and_question, agrade_generation_v_documents_and_question
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.answer_cache import with_answer_cache
+from rag_common.instrumentation import instrument
+from retriever import vectorstore
 
 
 ############### Defining the graph ##############
 workflow = StateGraph(GraphState)
 
 # Define the nodes
-workflow.add_node("retrieve", retrieve) # retrieve
-workflow.add_node("grade_documents", grade_documents) # grade documents
-workflow.add_node("generate", generate) # generatae
-workflow.add_node("transform_query", transform_query) # transform_query
+# RunnableLambda(sync, afunc=async): app.invoke / app.stream run the sync version,
+# app.ainvoke / app.astream the async one (see rag_common.serving)
+workflow.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve)) # retrieve
+workflow.add_node("grade_documents", RunnableLambda(grade_documents, afunc=agrade_documents)) # grade documents
+workflow.add_node("generate", RunnableLambda(generate, afunc=agenerate)) # generatae
+workflow.add_node("transform_query", RunnableLambda(transform_query, afunc=atransform_query)) # transform_query
+workflow.add_node("finalize", finalize) # best answer so far when the loop budget runs out
+workflow.add_node("finalize_grounded", finalize_grounded) # the current, grounded answer when no rewrites are left
 
 # Build graph
 workflow.set_entry_point("retrieve")
@@ -21,33 +32,47 @@ workflow.add_conditional_edges(
     {
         "transform_query": "transform_query",
         "generate": "generate",
+        "budget_exhausted": "finalize",
     },
 )
 workflow.add_edge("transform_query", "retrieve")
+workflow.add_edge("finalize", END)
+workflow.add_edge("finalize_grounded", END)
 workflow.add_conditional_edges(
     "generate",
-    grade_generation_v_documents_and_question,
+    RunnableLambda(grade_generation_v_documents_and_question, afunc=agrade_generation_v_documents_and_question),
     {
         "not supported": "generate",
         "useful": END,
         "not useful": "transform_query",
+        "budget_exhausted": "finalize",
+        "budget_exhausted_grounded": "finalize_grounded",
     }
 )
 
 # Compile
-app = workflow.compile()
-
-from pprint import pprint
-
-# Run
-inputs = {"question": "Explain how the different types of agent memory work?"}
-for output in app.stream(inputs):
-    for key, value in output.items():
-        # Node
-        pprint(f"Node '{key}':")
-        # Optional: print full state at each node
-        # pprint.pprint(value["keys"], indent=2, width=80, depth=None)
-    pprint("\n---\n")
-
-# Final generation
-pprint(value["generation"]) 
\ No newline at end of file
+# Per-node/edge timing, model calls, tokens and state size (see rag_common.instrumentation)
+app = instrument(workflow.compile(), graph_name="self-reflection-RAG")
+# Repeated and paraphrased questions are answered from the answer cache, until their documents change
+app = with_answer_cache(app, "self-reflection-RAG", vectorstore=vectorstore)
+
+
+if __name__ == "__main__":
+    from pprint import pprint
+
+    # Run
+    inputs = {"question": "Explain how the different types of agent memory work?"}
+    # "custom" carries the answer tokens as the generate node produces them
+    for mode, output in app.stream(inputs, stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            print(output["token"], end="", flush=True)
+            continue
+        for key, value in output.items():
+            # Node
+            pprint(f"Node '{key}':")
+            # Optional: print full state at each node
+            # pprint.pprint(value["keys"], indent=2, width=80, depth=None)
+        pprint("\n---\n")
+
+    # Final generation
+    pprint(value["generation"])
@@ -2,8 +2,21 @@ from typing_extensions import TypedDict
 from typing import List
 from retriever import retriever
 from generator import rag_chain
-from grader import retrieval_grader_chain
+from grader import retrieval_grader_chain, batch_retrieval_grader_chain
 from generator import question_rewriter_chain, rag_chain
+import asyncio
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.budget import NO_ANSWER, charge, default_budget
+from rag_common.batch_grading import agrade_relevance, grade_relevance, keep_relevant
+from rag_common.streaming import astream_generation, stream_generation
+
+# Grade all retrieved documents in one LLM call instead of one call per document
+BATCH_GRADING = os.getenv("BATCH_GRADING", "true").lower() == "true"
+
+# Max number of concurrent grader calls in agrade_documents (provider rate limits)
+GRADER_MAX_CONCURRENCY = int(os.getenv("GRADER_MAX_CONCURRENCY", "4"))
 
 class GraphState(TypedDict):
     """
@@ -13,10 +26,30 @@ class GraphState(TypedDict):
         question: question
         generation: LLM generation
         documents: list of documents 
+        generation_count: number of generations so far
+        rewrite_count: number of question rewrites so far
+        tokens_used: estimated LLM tokens used so far
+        started_at: time the run started
+        best_generation: latest answer that was grounded in the documents
+        budget_exhausted: True when the answer was returned because the loop budget ran out
+        budget_reason: which limit ran out (tokens, time, regenerations, rewrites)
+        max_regenerations, max_rewrites, max_tokens, max_seconds: optional per-run
+            overrides of the loop budget (see rag_common.budget)
     """
     question : str
     generation : str
     documents : List[str]
+    generation_count : int
+    rewrite_count : int
+    tokens_used : int
+    started_at : float
+    best_generation : str
+    budget_exhausted : bool
+    budget_reason : str
+    max_regenerations : int
+    max_rewrites : int
+    max_tokens : int
+    max_seconds : float
 
 ############defining nondes for the graph############
 
@@ -33,7 +66,22 @@ def retrieve(state):
 
     # Retrieval
     documents = retriever.get_relevant_documents(question)
-    return {"documents": documents, "question": question}
+    return {"documents": documents, "question": question, **charge(state)}
+
+async def aretrieve(state):
+    """
+    Async twin of retrieve.
+    Args:
+        state (dict): The current graph state
+    Returns:
+        state (dict): New key added to state, documents, that contains retrieved documents
+    """
+    print("---RETRIEVE---")
+    question = state["question"]
+
+    # Retrieval
+    documents = await retriever.ainvoke(question)
+    return {"documents": documents, "question": question, **charge(state)}
 
 def generate(state):
     """
@@ -49,9 +97,41 @@ def generate(state):
     question = state["question"]
     documents = state["documents"]
     
-    # RAG generation
-    generation = rag_chain.invoke({"context": documents, "question": question})
-    return {"documents": documents, "question": question, "generation": generation}
+    # RAG generation, streamed token by token to the graph's custom stream
+    generation = stream_generation(rag_chain, {"context": documents, "question": question})
+    return {
+        "documents": documents,
+        "question": question,
+        "generation": generation,
+        "generation_count": state.get("generation_count", 0) + 1,
+        # The generation call, plus the hallucination check the next edge runs on it
+        **charge(state, documents, question, generation, documents, generation),
+    }
+
+async def agenerate(state):
+    """
+    Async twin of generate.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): New key added to state, generation, that contains LLM generation
+    """
+    print("---GENERATE---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # RAG generation, streamed token by token to the graph's custom stream
+    generation = await astream_generation(rag_chain, {"context": documents, "question": question})
+    return {
+        "documents": documents,
+        "question": question,
+        "generation": generation,
+        "generation_count": state.get("generation_count", 0) + 1,
+        # The generation call, plus the hallucination check the next edge runs on it
+        **charge(state, documents, question, generation, documents, generation),
+    }
 
 def grade_documents(state):
     """
@@ -68,18 +148,43 @@ def grade_documents(state):
     question = state["question"]
     documents = state["documents"]
     
-    # Score each doc
-    filtered_docs = []
-    for d in documents:
-        score = retrieval_grader_chain.invoke({"question": question, "document": d.page_content})
-        grade = score.binary_score
-        if grade == "yes":
-            print("---GRADE: DOCUMENT RELEVANT---")
-            filtered_docs.append(d)
-        else:
-            print("---GRADE: DOCUMENT NOT RELEVANT---")
-            continue
-    return {"documents": filtered_docs, "question": question}
+    # Decide the obvious docs locally, score the rest with the LLM grader (in one call with BATCH_GRADING)
+    batch_grader = batch_retrieval_grader_chain if BATCH_GRADING else None
+    grades = grade_relevance(question, documents, retrieval_grader_chain, batch_grader)
+    filtered_docs = keep_relevant(documents, grades)
+    return {
+        "documents": filtered_docs,
+        "question": question,
+        **charge(state, question, *[d.page_content for d in documents]),
+    }
+
+async def agrade_documents(state):
+    """
+    Async twin of grade_documents: grades the retrieved documents in one batched call
+    (BATCH_GRADING), or all of them concurrently.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updates documents key with only filtered relevant documents
+    """
+
+    print("---CHECK DOCUMENT RELEVANCE TO QUESTION (ASYNC)---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # Same grading, with at most GRADER_MAX_CONCURRENCY grader calls in flight
+    batch_grader = batch_retrieval_grader_chain if BATCH_GRADING else None
+    grades = await agrade_relevance(
+        question, documents, retrieval_grader_chain, batch_grader, max_concurrency=GRADER_MAX_CONCURRENCY
+    )
+    filtered_docs = keep_relevant(documents, grades)
+    return {
+        "documents": filtered_docs,
+        "question": question,
+        **charge(state, question, *[d.page_content for d in documents]),
+    }
 
 def transform_query(state):
     """
@@ -98,4 +203,72 @@ def transform_query(state):
 
     # Re-write question
     better_question = question_rewriter_chain.invoke({"question": question})
-    return {"documents": documents, "question": better_question}
\ No newline at end of file
+    return {
+        "documents": documents,
+        "question": better_question,
+        "rewrite_count": state.get("rewrite_count", 0) + 1,
+        # Only grounded answers reach a rewrite (the "not useful" edge), so keep the latest one
+        "best_generation": state.get("generation") or state.get("best_generation"),
+        **charge(state, question, better_question),
+    }
+
+async def atransform_query(state):
+    """
+    Async twin of transform_query.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updates question key with a re-phrased question
+    """
+
+    print("---TRANSFORM QUERY---")
+    question = state["question"]
+    documents = state["documents"]
+
+    # Re-write question
+    better_question = await question_rewriter_chain.ainvoke({"question": question})
+    return {
+        "documents": documents,
+        "question": better_question,
+        "rewrite_count": state.get("rewrite_count", 0) + 1,
+        "best_generation": state.get("generation") or state.get("best_generation"),
+        **charge(state, question, better_question),
+    }
+
+def finalize(state, grounded=False):
+    """
+    Ends the run when the loop budget is exhausted, returning the best answer so far.
+
+    Args:
+        state (dict): The current graph state
+        grounded (bool): The current generation passed the hallucination check right before the exit
+
+    Returns:
+        state (dict): generation set to the best answer, budget_exhausted flag and reason
+    """
+
+    budget = default_budget.for_state(state)
+    reason = budget.reason(state)
+    print(f"---LOOP BUDGET EXHAUSTED ({reason}): RETURN BEST ANSWER---")
+    if grounded and state.get("generation"):
+        # Newer than best_generation, which transform_query saved before the last rewrite
+        generation = state["generation"]
+    else:
+        # Ungrounded, or the budget ran out before grading: the last grounded answer, if any
+        generation = state.get("best_generation") or state.get("generation") or NO_ANSWER
+    return {"generation": generation, "budget_exhausted": True, "budget_reason": reason}
+
+def finalize_grounded(state):
+    """
+    finalize for the exit after a grounded answer that did not address the question,
+    when no rewrites are left: returns that answer rather than an older one.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): generation, budget_exhausted flag and reason
+    """
+    return finalize(state, grounded=True)
@@ -1,12 +1,34 @@
 from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.bm25_index import BM25Index, HybridRetriever
+from rag_common.components import lazy, resolve
+from rag_common.embedding_cache import get_embeddings
 from dotenv import load_dotenv
 load_dotenv()
 
-vectorstore = Chroma(
-    collection_name="rag-chroma",
-    embedding_function=OpenAIEmbeddings(),
-    persist_directory="./chroma_db",
-)
+# Dense + BM25 keyword search fused with reciprocal-rank fusion; "false" for dense only
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
 
-retriever = vectorstore.as_retriever(k = 2, search_type="similarity")
\ No newline at end of file
+def build_vectorstore():
+    return Chroma(
+        collection_name="rag-chroma",
+        embedding_function=get_embeddings(),
+        persist_directory="./chroma_db",
+    )
+
+def build_retriever():
+    store = resolve(vectorstore)
+    if HYBRID_RETRIEVAL:
+        return HybridRetriever(
+            vectorstore=store,
+            keyword_index=BM25Index(os.path.join("./chroma_db", "bm25")),
+            k=int(os.getenv("HYBRID_K", "4")),
+            fetch_k=int(os.getenv("HYBRID_FETCH_K", "20")),
+        )
+    return store.as_retriever(k = 2, search_type="similarity")
+
+# Opened on first use (see rag_common.components)
+vectorstore = lazy("vectorstore", build_vectorstore)
+retriever = lazy("retriever", build_retriever)
@@ -0,0 +1,14 @@
+"""
+Answer many questions concurrently with this graph, on one event loop (see rag_common.serving).
+
+    python serve.py questions.txt
+    cat questions.txt | python serve.py - --max-in-flight 200 --timeout 60
+"""
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_common.serving import serve_main
+from graph import app
+
+if __name__ == "__main__":
+    serve_main(app, graph_name="self-reflection-RAG")
@@ -0,0 +1,222 @@
+"""
+Recall / throughput / memory benchmark for the FAISS index backends.
+
+Synthetic corpora (a Gaussian mixture of unit-normalized vectors, generated
+batch by batch so 10M vectors never have to sit in memory next to the index)
+are indexed with every configuration, and each configuration is compared
+against exact search:
+
+    * recall@k        share of the exact top-k found by the index
+    * QPS             queries per second, batched search
+    * p50 / p99 ms    single-query latency
+    * memory          serialized index size
+    * build s         training + adding the vectors
+
+Configurations use the spec syntax of rag_common.vector_index. Query-time
+parameters (nprobe, ef_search) can list several values separated by "|"; the
+index is built once and searched with each. nlist=auto picks 4 * sqrt(n).
+
+For each corpus size the fastest configuration reaching --target-recall is
+reported as the recommendation.
+
+Usage:
+    python benchmarks/ann_benchmark.py
+    python benchmarks/ann_benchmark.py --sizes 10000 100000 1000000 --dim 768 --k 4
+    python benchmarks/ann_benchmark.py --configs flat "hnsw:M=16,ef_search=16|64" --output ann.json
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from rag_common.vector_index import (
+    SEARCH_PARAMS, build_index, fit_params, format_spec, index_bytes, parse_spec, set_search_params,
+)
+
+DEFAULT_CONFIGS = [
+    "flat",
+    "ivf:nlist=auto,nprobe=1|4|16|64",
+    "hnsw:M=32,ef_construction=200,ef_search=16|32|64|128",
+    "pq:m=48,nbits=8",
+    "ivfpq:nlist=auto,m=48,nbits=8,nprobe=4|16|64",
+]
+
+
+class SyntheticCorpus:
+    """
+    Deterministic clustered vectors, regenerated on demand batch by batch.
+
+    Args:
+        size (int): Number of vectors
+        dim (int): Dimension
+        clusters (int): Number of mixture components
+        spread (float): Standard deviation around each center
+        seed (int): Random seed
+    """
+
+    def __init__(self, size, dim, clusters=1000, spread=0.35, seed=0, batch_size=100_000):
+        self.size = size
+        self.dim = dim
+        self.spread = spread
+        self.seed = seed
+        self.batch_size = batch_size
+        rng = np.random.default_rng([seed, 0])
+        self.centers = rng.standard_normal((clusters, dim)).astype(np.float32) / math.sqrt(dim)
+
+    def _sample(self, rng, n):
+        labels = rng.integers(0, len(self.centers), n)
+        noise = rng.standard_normal((n, self.dim)).astype(np.float32) * (self.spread / math.sqrt(self.dim))
+        vectors = self.centers[labels] + noise
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+    def batches(self):
+        for number, start in enumerate(range(0, self.size, self.batch_size)):
+            rng = np.random.default_rng([self.seed, 1, number])
+            yield self._sample(rng, min(self.batch_size, self.size - start))
+
+    def queries(self, n):
+        return self._sample(np.random.default_rng([self.seed, 2]), n)
+
+
+def exact_neighbours(corpus, queries, k):
+    """Exact top-k IDs for every query, computed batch by batch."""
+    import faiss
+
+    best_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+    best_i = np.full((len(queries), k), -1, dtype=np.int64)
+    offset = 0
+    for batch in corpus.batches():
+        d, i = faiss.knn(queries, batch, min(k, len(batch)))
+        d = np.concatenate([best_d, d], axis=1)
+        i = np.concatenate([best_i, i + offset], axis=1)
+        order = np.argsort(d, axis=1)[:, :k]
+        best_d = np.take_along_axis(d, order, axis=1)
+        best_i = np.take_along_axis(i, order, axis=1)
+        offset += len(batch)
+    return best_i
+
+
+def recall_at_k(found, exact):
+    k = exact.shape[1]
+    return float(np.mean([len(set(f[f >= 0]) & set(e)) / k for f, e in zip(found, exact)]))
+
+
+def expand_config(config, size, dim, train_size):
+    """Split a config into (build spec, list of search-parameter dicts)."""
+    backend, _, rest = config.partition(":")
+    build_items, sweeps = [], {}
+    for item in filter(None, rest.split(",")):
+        key, _, value = item.partition("=")
+        if value == "auto" and key == "nlist":
+            value = str(int(4 * math.sqrt(size)))
+        if key in SEARCH_PARAMS:
+            sweeps[key] = [int(v) for v in value.split("|")]
+        else:
+            build_items.append(f"{key}={value}")
+    # Report the parameters actually built (fit_params scales them to the training sample)
+    backend, params = parse_spec(backend + (":" + ",".join(build_items) if build_items else ""))
+    params = fit_params(backend, params, min(size, train_size), dim)
+    spec = format_spec(backend, {k: v for k, v in params.items() if k not in SEARCH_PARAMS})
+    keys = list(sweeps)
+    combos = [{}]
+    for key in keys:
+        combos = [dict(c, **{key: v}) for c in combos for v in sweeps[key]]
+    return spec, combos
+
+
+def measure(index, queries, exact, k, latency_queries):
+    started = time.perf_counter()
+    _, found = index.search(queries, k)
+    elapsed = time.perf_counter() - started
+
+    latencies = []
+    for q in queries[:latency_queries]:
+        t = time.perf_counter()
+        index.search(q[None, :], k)
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+    return {
+        "recall": recall_at_k(found, exact),
+        "qps": len(queries) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def run_size(size, args):
+    corpus = SyntheticCorpus(size, args.dim, clusters=args.clusters, seed=args.seed)
+    queries = corpus.queries(args.queries)
+    print(f"\n== {size:,} vectors x {args.dim} dims: exact neighbours...", flush=True)
+    exact = exact_neighbours(corpus, queries, args.k)
+
+    rows = []
+    for config in args.configs:
+        spec, combos = expand_config(config, size, args.dim, args.train_size)
+        started = time.perf_counter()
+        index = build_index(spec, corpus.batches(), train_size=args.train_size)
+        build_s = time.perf_counter() - started
+        memory = index_bytes(index)
+        for params in combos:
+            set_search_params(index, **params)
+            label = spec
+            if params:
+                label += ("," if ":" in spec else ":") + ",".join(f"{k}={v}" for k, v in params.items())
+            row = {"size": size, "config": label, "build_s": build_s, "memory_bytes": memory,
+                   **measure(index, queries, exact, args.k, args.latency_queries)}
+            rows.append(row)
+            print(f"  {label:<55} recall@{args.k} {row['recall']:.3f}  {row['qps']:9.0f} QPS  "
+                  f"p50 {row['p50_ms']:6.2f} ms  p99 {row['p99_ms']:6.2f} ms  "
+                  f"{memory / 2**20:8.1f} MiB  build {build_s:6.1f} s", flush=True)
+        del index
+
+    eligible = [r for r in rows if r["recall"] >= args.target_recall]
+    best = max(eligible, key=lambda r: r["qps"]) if eligible else max(rows, key=lambda r: r["recall"])
+    note = "" if eligible else f" (no configuration reached recall {args.target_recall})"
+    print(f"  recommended: {best['config']}{note}")
+    return rows, best["config"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--latency-queries", type=int, default=200, help="Queries timed one at a time")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--train-size", type=int, default=100_000, help="Vectors used to train IVF / PQ")
+    parser.add_argument("--threads", type=int, default=0, help="FAISS threads (0: FAISS default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the full results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.threads:
+        import faiss
+
+        faiss.omp_set_num_threads(args.threads)
+
+    results, recommendations = [], {}
+    for size in args.sizes:
+        rows, best = run_size(size, args)
+        results.extend(rows)
+        recommendations[size] = best
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results, "recommended": recommendations}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+End-to-end latency benchmark for the LangGraph RAG variants.
+
+Every graph (adaptive, corrective, self-reflection, agentic) is run offline with
+the fake providers from rag_common.fakes over the question set in
+rag_common/fixtures/questions.json. Each variant runs in its own subprocess and
+scratch directory: the fixture corpus is ingested with the variant's own
+embedding.py, then every question is streamed through graph.app.
+
+Reported per variant:
+    * time to import the graph and to warm up its components (rag_common.components)
+    * p50 / p95 / mean latency per question
+    * p50 / p95 time to the first answer token streamed by a generation node
+    * time and LLM calls per node (conditional edges are reported as node->edge)
+    * node visits and loop count (visits beyond the first one of each node)
+
+Usage:
+    python benchmarks/graph_latency.py
+    python benchmarks/graph_latency.py --variants corrective_RAG --repeat 3 --llm-latency-ms 200
+    python benchmarks/graph_latency.py --output results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from rag_common.instrumentation import GraphInstrumentation, edge_function_names
+
+VARIANTS_DIR = os.path.join(REPO_ROOT, "Types_of_RAG_implementation_using_LangGraph")
+FIXTURES_DIR = os.path.join(REPO_ROOT, "rag_common", "fixtures")
+
+VARIANTS = ["adaptive-RAG", "corrective_RAG", "self-reflection-RAG", "agentic-RAG"]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (q in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def step_key(event):
+    """Report key of a step event: the node name, or "node->edge" for a conditional edge."""
+    if event["kind"] == "edge":
+        return f"{event['node']}->{event['name']}"
+    return event["name"]
+
+
+def make_inputs(variant, question):
+    if variant == "agentic-RAG":
+        from langchain_core.messages import HumanMessage
+
+        return {"messages": [HumanMessage(content=question)]}
+    return {"question": question}
+
+
+def run_variant(variant, questions, repeat, recursion_limit):
+    """Ingest the fixture corpus and run every question through one variant (in-process)."""
+    variant_dir = os.path.join(VARIANTS_DIR, variant)
+    sys.path.insert(0, variant_dir)
+
+    # Build the variant's vector store from the local fixture corpus
+    started = time.perf_counter()
+    sys.argv = [os.path.join(variant_dir, "embedding.py"), os.path.join(FIXTURES_DIR, "corpus")]
+    runpy.run_path(sys.argv[0], run_name="__main__")
+    ingest_seconds = time.perf_counter() - started
+
+    from langgraph.errors import GraphRecursionError
+
+    # Importing the graph builds nothing; warm_up() builds its components before the first question
+    started = time.perf_counter()
+    import graph
+    import_seconds = time.perf_counter() - started
+
+    from rag_common.components import get_components
+
+    started = time.perf_counter()
+    get_components().warm_up()
+    warm_up_seconds = time.perf_counter() - started
+
+    app = graph.app
+    edge_names = edge_function_names(app)
+
+    runs = []
+    for round_index in range(repeat):
+        for question in questions:
+            # A private handler per question; the app's own instrumentation keeps running too
+            handler = GraphInstrumentation(edge_names, keep_events=True, graph_name=variant)
+            visits = Counter()
+            error = None
+            first_token = None
+            started = time.perf_counter()
+            try:
+                for mode, chunk in app.stream(
+                    make_inputs(variant, question),
+                    config={"callbacks": [handler], "recursion_limit": recursion_limit},
+                    stream_mode=["updates", "custom"],
+                ):
+                    if mode == "updates":
+                        visits.update(chunk.keys())
+                    elif first_token is None and chunk.get("type") == "token":
+                        first_token = time.perf_counter() - started
+            except GraphRecursionError:
+                error = "recursion_limit"
+            elapsed = time.perf_counter() - started
+            steps = [event for event in handler.events if event["event"] == "step"]
+            llm_calls = Counter()
+            step_seconds = Counter()
+            for event in steps:
+                llm_calls[step_key(event)] += event["llm_calls"]
+                step_seconds[step_key(event)] += event["self_s"]
+            runs.append({
+                "round": round_index,
+                "question": question,
+                "latency_s": elapsed,
+                "first_token_s": first_token,
+                "llm_calls": {key: n for key, n in llm_calls.items() if n},
+                "step_seconds": dict(step_seconds),
+                "tokens": sum(event["input_tokens"] + event["output_tokens"] for event in steps),
+                "node_visits": dict(visits),
+                "loops": sum(count - 1 for count in visits.values()),
+                "error": error,
+            })
+    return {"variant": variant, "ingest_s": ingest_seconds, "import_s": import_seconds, "warm_up_s": warm_up_seconds, "runs": runs}
+
+
+def summarize(result):
+    runs = result["runs"]
+    latencies = [run["latency_s"] for run in runs]
+    first_tokens = [run["first_token_s"] for run in runs if run.get("first_token_s") is not None]
+    llm_calls = Counter()
+    step_seconds = Counter()
+    visits = Counter()
+    for run in runs:
+        llm_calls.update(run["llm_calls"])
+        step_seconds.update(run["step_seconds"])
+        visits.update(run["node_visits"])
+    count = len(runs) or 1
+    return {
+        "questions": len(runs),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "mean_s": sum(latencies) / count,
+        "first_token_p50_s": percentile(first_tokens, 50),
+        "first_token_p95_s": percentile(first_tokens, 95),
+        "llm_calls_per_question": sum(llm_calls.values()) / count,
+        "llm_calls_per_node": {k: v / count for k, v in sorted(llm_calls.items())},
+        "seconds_per_node": {k: v / count for k, v in sorted(step_seconds.items())},
+        "tokens_per_question": sum(run["tokens"] for run in runs) / count,
+        "node_visits_per_question": {k: v / count for k, v in sorted(visits.items())},
+        "loops_per_question": sum(run["loops"] for run in runs) / count,
+        "max_loops": max((run["loops"] for run in runs), default=0),
+        "errors": sum(1 for run in runs if run["error"]),
+    }
+
+
+def benchmark_env(args):
+    env = dict(os.environ)
+    env.update({
+        "RAG_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_LLM_TOKEN_LATENCY_MS": str(args.token_latency_ms),
+        "FAKE_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms),
+        "FAKE_SEARCH_LATENCY_MS": str(args.search_latency_ms),
+        "FAKE_LLM_NO_RATE": str(args.no_rate),
+        # A verdict cache shared across repeats would hide the grader cost being measured
+        "GRADER_CACHE": "true" if args.grader_cache else "false",
+        # Likewise for whole answers; --answer-cache measures repeated traffic served from the cache
+        "ANSWER_CACHE": "true" if args.answer_cache else "false",
+        # Offline run: keep tracing settings from a local .env from uploading every run
+        "LANGCHAIN_TRACING_V2": "false",
+        "LANGSMITH_TRACING": "false",
+        "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")])),
+    })
+    return env
+
+
+def run_in_subprocess(variant, args):
+    """Run one variant in a fresh interpreter and scratch directory; return its raw result."""
+    with tempfile.TemporaryDirectory(prefix=f"bench-{variant}-") as workdir:
+        result_path = os.path.join(workdir, "result.json")
+        command = [
+            sys.executable, os.path.abspath(__file__),
+            "--worker", variant,
+            "--worker-output", result_path,
+            "--questions", args.questions,
+            "--repeat", str(args.repeat),
+            "--recursion-limit", str(args.recursion_limit),
+        ]
+        completed = subprocess.run(command, cwd=workdir, env=benchmark_env(args), capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"variant": variant, "failed": completed.stderr.strip().splitlines()[-1:] or ["unknown error"]}
+        with open(result_path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def print_report(results):
+    for result in results:
+        variant = result["variant"]
+        if "failed" in result:
+            print(f"\n{variant}: FAILED ({result['failed'][0]})")
+            continue
+        summary = result["summary"]
+        print(f"\n{variant}  (ingest {result['ingest_s']:.2f}s, {summary['questions']} questions, {summary['errors']} errors)")
+        print(f"  startup: import graph {result['import_s'] * 1000:.0f} ms  warm-up {result['warm_up_s'] * 1000:.0f} ms")
+        print(f"  latency p50 {summary['p50_s'] * 1000:.0f} ms  p95 {summary['p95_s'] * 1000:.0f} ms  mean {summary['mean_s'] * 1000:.0f} ms")
+        if summary["first_token_p50_s"] is not None:
+            print(f"  first token p50 {summary['first_token_p50_s'] * 1000:.0f} ms  p95 {summary['first_token_p95_s'] * 1000:.0f} ms")
+        print(f"  LLM calls/question {summary['llm_calls_per_question']:.2f}  loops/question {summary['loops_per_question']:.2f} (max {summary['max_loops']})")
+        for node, seconds in summary["seconds_per_node"].items():
+            calls = summary["llm_calls_per_node"].get(node, 0)
+            print(f"    {node:<55} {seconds * 1000:8.1f} ms {calls:6.2f} LLM calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="+", default=VARIANTS, choices=VARIANTS)
+    parser.add_argument("--questions", default=os.path.join(FIXTURES_DIR, "questions.json"))
+    parser.add_argument("--repeat", type=int, default=1, help="Number of passes over the question set")
+    parser.add_argument("--recursion-limit", type=int, default=25)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--token-latency-ms", type=float, default=0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20)
+    parser.add_argument("--search-latency-ms", type=float, default=100)
+    parser.add_argument("--no-rate", type=float, default=0.2, help="Share of 'no' verdicts from the fake graders")
+    parser.add_argument("--grader-cache", action="store_true", help="Keep the grader verdict cache enabled")
+    parser.add_argument("--answer-cache", action="store_true", help="Enable the whole-graph answer cache")
+    parser.add_argument("--output", help="Write the full results as JSON to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = json.load(f)
+
+    if args.worker:
+        result = run_variant(args.worker, questions, args.repeat, args.recursion_limit)
+        with open(args.worker_output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    results = []
+    for variant in args.variants:
+        print(f"Running {variant}...")
+        result = run_in_subprocess(variant, args)
+        if "failed" not in result:
+            result["summary"] = summarize(result)
+        results.append(result)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
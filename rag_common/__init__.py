@@ -0,0 +1,7 @@
+"""
+Shared building blocks for the RAG variants in this repository.
+
+The graph variants under Types_of_RAG_implementation_using_LangGraph and the
+scripts under RAG_advanced_techniques are run from their own folders, so they
+add the repository root to sys.path before importing from this package.
+"""
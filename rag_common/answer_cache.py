@@ -0,0 +1,504 @@
+"""
+Whole-graph answer cache with semantic near-duplicate lookup.
+
+CachedGraph sits in front of a compiled graph app. A question is looked up:
+
+    1. exactly, by the hash of the normalized question
+    2. semantically, by cosine similarity of its embedding to the cached
+       questions (best match >= threshold)
+
+An entry stores the final generation together with the ID and content hash of
+every supporting document. Before a hit is served the documents that came from
+the vector store are re-read from the collection; when one was deleted or its
+text changed, the entry is dropped and the graph runs again.
+
+Web search results cannot be validated that way, and the questions routed to
+web search are the time-sensitive ones. Answers built on web results are
+therefore not stored, unless ANSWER_CACHE_WEB_TTL_SECONDS gives them a (short)
+lifetime of their own.
+
+Answers are only stored when the run produced a generation within its budget.
+Inputs with anything besides "question" (e.g. per-run budget overrides) bypass
+the cache.
+
+The cache is opt-in (ANSWER_CACHE=true): a near-match can serve the answer of a
+slightly different question.
+
+Configuration (environment variables):
+    ANSWER_CACHE                  "true" enables the cache (default "false")
+    ANSWER_CACHE_PATH             SQLite file (default ./.rag_cache/answers.sqlite)
+    ANSWER_CACHE_THRESHOLD        minimum cosine similarity of a near-match (default 0.95)
+    ANSWER_CACHE_TTL_SECONDS      answer lifetime (default 1 day)
+    ANSWER_CACHE_WEB_TTL_SECONDS  lifetime of answers using web results (default 0: not stored)
+    ANSWER_CACHE_MAX_ENTRIES      LRU capacity per graph (default 10000)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag_common.bm25_index import document_id
+from rag_common.metrics import get_registry
+from rag_common.sqlite_cache import content_hash, normalize_question
+from rag_common.streaming import token_event
+
+
+def _document_record(doc):
+    """ID, content hash and origin of a supporting document."""
+    if not isinstance(doc, Document):
+        return {"id": None, "hash": content_hash(str(doc)), "indexed": False}
+    metadata = doc.metadata or {}
+    # Chunks read from the collection carry their ID or their (source, ordinal) position; web results do not
+    indexed = bool(getattr(doc, "id", None)) or ("source" in metadata and "ordinal" in metadata)
+    return {"id": document_id(doc) if indexed else None, "hash": content_hash(doc.page_content), "indexed": indexed}
+
+
+def _as_list(documents):
+    """The documents of a state as a list (web search nodes may store a single Document)."""
+    if documents is None:
+        return []
+    if isinstance(documents, (Document, str)):
+        return [documents]
+    return list(documents)
+
+
+def collection_validator(vectorstore):
+    """
+    Validator reading the current text of documents from a Chroma collection.
+
+    Returns:
+        callable: ids -> {id: content hash} for the IDs still in the collection
+    """
+    def current_hashes(ids):
+        found = vectorstore.get(ids=list(ids), include=["documents"])
+        return {i: content_hash(text) for i, text in zip(found["ids"], found["documents"])}
+
+    return current_hashes
+
+
+class _QuestionMatrix:
+    """Keys and unit question vectors of one graph's entries, in a buffer grown by doubling."""
+
+    def __init__(self, keys, vectors):
+        self.keys = list(keys)
+        self.rows = {key: i for i, key in enumerate(self.keys)}
+        self.vectors = vectors
+
+    def put(self, key, vector):
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if self.vectors is None or self.vectors.shape[1] != len(vector):
+                self.vectors = np.empty((0, len(vector)), dtype=np.float32)
+            if row == len(self.vectors):
+                grown = np.empty((max(16, 2 * row), self.vectors.shape[1]), dtype=np.float32)
+                grown[:row] = self.vectors[:row]
+                self.vectors = grown
+            self.keys.append(key)
+            self.rows[key] = row
+        self.vectors[row] = vector
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        # Move the last entry into the freed row
+        last = len(self.keys) - 1
+        last_key = self.keys.pop()
+        if row != last:
+            self.keys[row] = last_key
+            self.rows[last_key] = row
+            self.vectors[row] = self.vectors[last]
+
+    def nearest(self, unit_vector):
+        """(key, similarity) of the closest entry, or None when empty."""
+        if not self.keys:
+            return None
+        similarities = self.vectors[: len(self.keys)] @ unit_vector
+        best = int(np.argmax(similarities))
+        return self.keys[best], float(similarities[best])
+
+
+class AnswerCache:
+    """
+    Persistent store of final answers, searchable by question embedding.
+
+    Args:
+        path (str): SQLite file (created if missing)
+        embeddings (Embeddings): Model embedding the questions for near-match lookup
+        threshold (float): Minimum cosine similarity of a near-match
+        ttl_seconds (float): Entries older than this are misses; None keeps them forever
+        web_ttl_seconds (float): Lifetime of answers using web results; 0 does not store them, None keeps them forever
+        max_entries (int): Least recently used entries per graph beyond this count are evicted
+    """
+
+    def __init__(self, path, embeddings, threshold=0.95, ttl_seconds=None, web_ttl_seconds=0, max_entries=None):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.web_ttl_seconds = web_ttl_seconds
+        self.max_entries = max_entries
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                graph TEXT NOT NULL,
+                key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                generation TEXT NOT NULL,
+                documents TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (graph, key)
+            )"""
+        )
+        self._conn.commit()
+        self._matrices = {}  # graph -> (data_version, _QuestionMatrix)
+
+    def _version(self):
+        # data_version changes when another connection commits; this connection's writes update the matrices in place
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _matrix(self, graph):
+        """Question matrix of a graph, reloaded from SQLite only after another process wrote (call with the lock held)."""
+        version = self._version()
+        cached = self._matrices.get(graph)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = self._conn.execute("SELECT key, vector FROM answers WHERE graph = ?", (graph,)).fetchall()
+        vectors = np.array([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+        matrix = _QuestionMatrix([row[0] for row in rows], vectors)
+        self._matrices[graph] = (version, matrix)
+        return matrix
+
+    def _forget(self, graph, keys):
+        """Drop keys from the loaded matrix of a graph (call with the lock held)."""
+        cached = self._matrices.get(graph)
+        if cached is not None:
+            for key in keys:
+                cached[1].remove(key)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _row(self, graph, key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT question, generation, documents, created_at FROM answers WHERE graph = ? AND key = ?",
+                (graph, key),
+            ).fetchone()
+
+    def _touch(self, graph, key):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE answers SET last_access = ? WHERE graph = ? AND key = ?", (time.time(), graph, key)
+            )
+            self._conn.commit()
+
+    def delete(self, graph, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE graph = ? AND key = ?", (graph, key))
+            self._conn.commit()
+            self._forget(graph, [key])
+
+    def _nearest(self, graph, vector):
+        """(key, similarity) of the cached question closest to vector, if above the threshold."""
+        with self._lock:
+            nearest = self._matrix(graph).nearest(self._unit(vector))
+        if nearest is None or nearest[1] < self.threshold:
+            return None
+        return nearest
+
+    def lookup(self, graph, question, validate=None, vector=None):
+        """
+        Cached answer for a question.
+
+        Args:
+            graph (str): Graph name the answer belongs to
+            question (str): The user question
+            validate (callable): ids -> {id: current content hash}; entries whose indexed documents changed are dropped
+            vector (list): Question embedding, computed with the cache's model when a near-match lookup needs it
+
+        Returns:
+            dict: question, generation, documents, match ("exact" / "semantic") and similarity; None on a miss
+        """
+        registry = get_registry()
+        key, match, similarity = content_hash(normalize_question(question)), "exact", 1.0
+        row = self._row(graph, key)
+        if row is None:
+            nearest = self._nearest(graph, vector if vector is not None else self.embeddings.embed_query(question))
+            if nearest is None:
+                registry.inc("answer_cache", outcome="miss", graph=graph)
+                return None
+            (key, similarity), match = nearest, "semantic"
+            row = self._row(graph, key)
+            if row is None:
+                # Deleted by another process since the matrix was loaded
+                registry.inc("answer_cache", outcome="miss", graph=graph)
+                return None
+        cached_question, generation, documents, created_at = row
+        documents = json.loads(documents)
+        ttl_seconds = self.web_ttl_seconds if any(not d["indexed"] for d in documents) else self.ttl_seconds
+        if ttl_seconds is not None and time.time() - created_at > ttl_seconds:
+            self.delete(graph, key)
+            registry.inc("answer_cache", outcome="expired", graph=graph)
+            return None
+        indexed = [d for d in documents if d["indexed"]]
+        if indexed and validate is not None:
+            current = validate([d["id"] for d in indexed])
+            if any(current.get(d["id"]) != d["hash"] for d in indexed):
+                self.delete(graph, key)
+                registry.inc("answer_cache", outcome="stale", graph=graph)
+                return None
+        self._touch(graph, key)
+        registry.inc("answer_cache", outcome=f"hit_{match}", graph=graph)
+        return {
+            "question": cached_question,
+            "generation": generation,
+            "documents": documents,
+            "match": match,
+            "similarity": similarity,
+        }
+
+    def store(self, graph, question, generation, documents, vector=None):
+        """
+        Store the final answer of a run with its supporting documents.
+
+        Returns:
+            bool: False when the answer is not cacheable (it used web results and web_ttl_seconds is 0)
+        """
+        records = [_document_record(doc) for doc in _as_list(documents)]
+        if self.web_ttl_seconds == 0 and any(not r["indexed"] for r in records):
+            get_registry().inc("answer_cache", outcome="skipped_web", graph=graph)
+            return False
+        if vector is None:
+            vector = self.embeddings.embed_query(question)
+        key, unit = content_hash(normalize_question(question)), self._unit(vector)
+        now = time.time()
+        with self._lock:
+            matrix = self._matrix(graph)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (graph, key, question, vector, generation, documents, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (graph, key, question, unit.tobytes(), generation, json.dumps(records), now, now),
+            )
+            evicted = []
+            if self.max_entries is not None:
+                evicted = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM answers WHERE graph = ? ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                    (graph, self.max_entries),
+                )]
+                self._conn.executemany("DELETE FROM answers WHERE graph = ? AND key = ?", [(graph, k) for k in evicted])
+            self._conn.commit()
+            # Keep the loaded matrix in step instead of re-reading every vector on the next lookup
+            matrix.put(key, unit)
+            self._forget(graph, evicted)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._matrices.clear()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+_answer_cache = None
+
+
+def get_answer_cache():
+    """Process-wide answer cache, or None unless ANSWER_CACHE=true."""
+    global _answer_cache
+    if os.getenv("ANSWER_CACHE", "false").lower() != "true":
+        return None
+    if _answer_cache is None:
+        from rag_common.embedding_cache import get_embeddings
+
+        _answer_cache = AnswerCache(
+            os.getenv("ANSWER_CACHE_PATH", "./.rag_cache/answers.sqlite"),
+            get_embeddings(),
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600))),
+            web_ttl_seconds=float(os.getenv("ANSWER_CACHE_WEB_TTL_SECONDS", "0")),
+            max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000")),
+        )
+    return _answer_cache
+
+
+def _cacheable_question(inputs):
+    if isinstance(inputs, dict) and set(inputs) == {"question"} and isinstance(inputs["question"], str):
+        return inputs["question"]
+    return None
+
+
+def _cacheable_answer(state):
+    if not state.get("generation") or state.get("budget_exhausted"):
+        return None
+    return state["generation"], _as_list(state.get("documents"))
+
+
+def _modes(stream_mode):
+    if stream_mode is None:
+        return ["updates"], False
+    if isinstance(stream_mode, str):
+        return [stream_mode], False
+    return list(stream_mode), True
+
+
+class CachedGraph:
+    """
+    Compiled graph app answering repeated and paraphrased questions from an AnswerCache.
+
+    invoke / ainvoke return {"question", "generation", "documents", "answer_cache"} on a hit. stream /
+    astream emit one "answer_cache" update (the final values in "values" mode, the whole answer as one
+    token in "custom" mode) instead of the node updates. Every other attribute is the wrapped app's.
+
+    Args:
+        app (Runnable): The compiled (possibly instrumented) graph app
+        graph_name (str): Namespace of the graph's answers in the cache
+        cache (AnswerCache): The answer cache
+        validate (callable): ids -> {id: current content hash}, e.g. collection_validator(vectorstore)
+    """
+
+    def __init__(self, app, graph_name, cache, validate=None):
+        self.app = app
+        self.graph_name = graph_name
+        self.cache = cache
+        self.validate = validate
+
+    def __getattr__(self, name):
+        return getattr(self.app, name)
+
+    def _lookup(self, question):
+        hit = self.cache.lookup(self.graph_name, question, validate=self.validate)
+        if hit is None:
+            return None
+        print(f"---ANSWER CACHE: {hit['match'].upper()} HIT ({hit['similarity']:.3f})---")
+        return {
+            "question": question,
+            "generation": hit["generation"],
+            # The supporting documents are recorded by ID and hash; the text is not kept
+            "documents": [],
+            "answer_cache": {"match": hit["match"], "similarity": hit["similarity"], "cached_question": hit["question"]},
+        }
+
+    def _store(self, question, state):
+        answer = _cacheable_answer(state)
+        if answer is not None:
+            self.cache.store(self.graph_name, question, *answer)
+
+    @staticmethod
+    def _hit_chunks(state, stream_mode):
+        modes, multiple = _modes(stream_mode)
+        for mode in modes:
+            if mode == "custom":
+                # Token streaming clients get the cached answer as a single token
+                chunk = token_event(state["generation"], node="answer_cache")
+            else:
+                chunk = {"answer_cache": state} if mode == "updates" else state if mode == "values" else None
+            if chunk is not None:
+                yield (mode, chunk) if multiple else chunk
+
+    @staticmethod
+    def _track(final, chunk, stream_mode):
+        """Fold a streamed chunk into the final state (for "updates" and "values" streams)."""
+        modes, multiple = _modes(stream_mode)
+        mode, data = chunk if multiple else (modes[0], chunk)
+        if mode == "values" and isinstance(data, dict):
+            final.clear()
+            final.update(data)
+        elif mode == "updates" and isinstance(data, dict):
+            for update in data.values():
+                if isinstance(update, dict):
+                    final.update(update)
+
+    def invoke(self, inputs, config=None, **kwargs):
+        question = _cacheable_question(inputs)
+        if question is None:
+            return self.app.invoke(inputs, config, **kwargs)
+        hit = self._lookup(question)
+        if hit is not None:
+            return hit
+        state = self.app.invoke(inputs, config, **kwargs)
+        self._store(question, state)
+        return state
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        question = _cacheable_question(inputs)
+        if question is None:
+            return await self.app.ainvoke(inputs, config, **kwargs)
+        # Embedding the question and the SQLite / collection reads block, so keep them off the event loop
+        hit = await asyncio.to_thread(self._lookup, question)
+        if hit is not None:
+            return hit
+        state = await self.app.ainvoke(inputs, config, **kwargs)
+        await asyncio.to_thread(self._store, question, state)
+        return state
+
+    def stream(self, inputs, config=None, *, stream_mode=None, **kwargs):
+        question = _cacheable_question(inputs)
+        if question is None:
+            yield from self.app.stream(inputs, config, stream_mode=stream_mode, **kwargs)
+            return
+        hit = self._lookup(question)
+        if hit is not None:
+            yield from self._hit_chunks(hit, stream_mode)
+            return
+        final = {}
+        for chunk in self.app.stream(inputs, config, stream_mode=stream_mode, **kwargs):
+            self._track(final, chunk, stream_mode)
+            yield chunk
+        self._store(question, final)
+
+    async def astream(self, inputs, config=None, *, stream_mode=None, **kwargs):
+        question = _cacheable_question(inputs)
+        if question is None:
+            async for chunk in self.app.astream(inputs, config, stream_mode=stream_mode, **kwargs):
+                yield chunk
+            return
+        hit = await asyncio.to_thread(self._lookup, question)
+        if hit is not None:
+            for chunk in self._hit_chunks(hit, stream_mode):
+                yield chunk
+            return
+        final = {}
+        async for chunk in self.app.astream(inputs, config, stream_mode=stream_mode, **kwargs):
+            self._track(final, chunk, stream_mode)
+            yield chunk
+        await asyncio.to_thread(self._store, question, final)
+
+
+def with_answer_cache(app, graph_name, vectorstore=None, cache=None):
+    """
+    Put the answer cache in front of a compiled graph app.
+
+    Args:
+        app (Runnable): The compiled graph app
+        graph_name (str): Namespace of the graph's answers in the cache
+        vectorstore (VectorStore): Collection the graph retrieves from, used to invalidate stale answers
+        cache (AnswerCache): Defaults to the process-wide cache
+
+    Returns:
+        CachedGraph: The wrapped app, or the app itself unless ANSWER_CACHE=true
+    """
+    cache = cache if cache is not None else get_answer_cache()
+    if cache is None:
+        return app
+    validate = collection_validator(vectorstore) if vectorstore is not None else None
+    return CachedGraph(app, graph_name, cache, validate=validate)
@@ -0,0 +1,239 @@
+"""
+Retrieval grading shared by the adaptive, corrective and self-reflection graphs.
+
+grade_relevance grades the retrieved documents of a question with the variant's
+retrieval grader, either one call per document or, given a batch grader, all of
+them in a single call. Documents the batched response does not cover (or all of
+them, when it cannot be parsed) fall back to the per-document grader. Verdicts
+are read from and written to the grader verdict cache under the same keys the
+per-document grader uses, so both paths share cached verdicts. Clearly
+relevant or irrelevant documents are decided by the relevance prefilter first
+when it is enabled.
+
+agrade_relevance is the async twin used by the served graphs: per-document
+calls run concurrently, at most max_concurrency at a time, and the cache I/O
+runs in a worker thread.
+"""
+
+import asyncio
+from typing import List
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field, ValidationError
+
+from rag_common.relevance_prefilter import aprefiltered_grades, prefiltered_grades
+from rag_common.verdict_cache import get_verdict_cache, grader_cache_key
+
+
+# Data model
+class DocumentGrade(BaseModel):
+    """Binary score for relevance check on one retrieved document."""
+
+    index: int = Field(description="Index of the document as shown in brackets")
+    binary_score: str = Field(description="Document is relevant to the question, 'yes' or 'no'")
+
+
+class GradeDocumentsBatch(BaseModel):
+    """Binary scores for relevance check on a list of retrieved documents."""
+
+    grades: List[DocumentGrade] = Field(description="One grade for every retrieved document")
+
+
+# Prompt
+batch_system = """You are a grader assessing relevance of a list of retrieved documents to a user question. \n 
+    Each document is prefixed with its index in brackets, e.g. [0]. \n
+    If a document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n
+    Return exactly one grade for every document, with its index and a binary score 'yes' or 'no'."""
+batch_grade_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", batch_system),
+        ("human", "Retrieved documents: \n\n {documents} \n\n User question: {question}"),
+    ]
+)
+
+
+def build_batch_grader_chain(llm):
+    """Batched retrieval grader on a chat model that supports structured output."""
+    return batch_grade_prompt | llm.with_structured_output(GradeDocumentsBatch)
+
+
+def format_numbered_docs(documents):
+    return "\n\n".join(f"[{i}] {doc.page_content}" for i, doc in enumerate(documents))
+
+
+def _cached_grades(question, documents, grader_name):
+    """Verdict cache, cache keys and the cached grades (by index) of the documents."""
+    verdict_cache = get_verdict_cache()
+    cache_keys = [
+        grader_cache_key(grader_name, {"question": question, "document": d.page_content})
+        for d in documents
+    ]
+    grades_by_index = {}
+    if verdict_cache is not None:
+        for i, key in enumerate(cache_keys):
+            cached = verdict_cache.get(key)
+            if cached is not None:
+                grades_by_index[i] = cached["binary_score"]
+    return verdict_cache, cache_keys, grades_by_index
+
+
+def _batch_grades(score, uncached):
+    """Grades of a batched response by document index, skipping out-of-range or invalid entries."""
+    return {
+        uncached[grade.index]: grade.binary_score
+        for grade in score.grades
+        if 0 <= grade.index < len(uncached) and grade.binary_score in ("yes", "no")
+    }
+
+
+def _store_grades(verdict_cache, cache_keys, new_grades):
+    if verdict_cache is not None:
+        for i, grade in new_grades.items():
+            verdict_cache.set(cache_keys[i], {"binary_score": grade})
+
+
+def grade_documents_in_batch(question, documents, grader, batch_grader, grader_name="retrieval_grader"):
+    """
+    Grade all retrieved documents for a question with a single LLM call.
+
+    Args:
+        question (str): The user question
+        documents (list): Retrieved documents
+        grader (Runnable): Per-document retrieval grader, used for documents the batch does not cover
+        batch_grader (Runnable): Chain returning GradeDocumentsBatch, e.g. build_batch_grader_chain(llm)
+        grader_name (str): Verdict cache name of the per-document grader
+
+    Returns:
+        list: 'yes' / 'no' grade for each document, in input order
+    """
+    if not documents:
+        return []
+
+    # Reuse cached verdicts and only send the remaining documents to the LLM
+    verdict_cache, cache_keys, grades_by_index = _cached_grades(question, documents, grader_name)
+
+    uncached = [i for i in range(len(documents)) if i not in grades_by_index]
+    if uncached:
+        try:
+            score = batch_grader.invoke(
+                {"question": question, "documents": format_numbered_docs([documents[i] for i in uncached])}
+            )
+            new_grades = _batch_grades(score, uncached)
+            grades_by_index.update(new_grades)
+            _store_grades(verdict_cache, cache_keys, new_grades)
+        except (OutputParserException, ValidationError, AttributeError):
+            print("---BATCH GRADING FAILED, FALLING BACK TO PER-DOCUMENT GRADING---")
+
+    grades = []
+    for i, d in enumerate(documents):
+        grade = grades_by_index.get(i)
+        if grade is None:
+            grade = grader.invoke({"question": question, "document": d.page_content}).binary_score
+        grades.append(grade)
+    return grades
+
+
+async def agrade_documents_in_batch(
+    question, documents, grader, batch_grader, max_concurrency=4, grader_name="retrieval_grader"
+):
+    """
+    Async twin of grade_documents_in_batch; the verdict cache is read and written in a worker thread.
+
+    Args:
+        question (str): The user question
+        documents (list): Retrieved documents
+        grader (Runnable): Per-document retrieval grader, used for documents the batch does not cover
+        batch_grader (Runnable): Chain returning GradeDocumentsBatch
+        max_concurrency (int): Per-document fallback calls in flight at once
+        grader_name (str): Verdict cache name of the per-document grader
+
+    Returns:
+        list: 'yes' / 'no' grade for each document, in input order
+    """
+    if not documents:
+        return []
+
+    verdict_cache, cache_keys, grades_by_index = await asyncio.to_thread(
+        _cached_grades, question, documents, grader_name
+    )
+
+    uncached = [i for i in range(len(documents)) if i not in grades_by_index]
+    if uncached:
+        try:
+            score = await batch_grader.ainvoke(
+                {"question": question, "documents": format_numbered_docs([documents[i] for i in uncached])}
+            )
+            new_grades = _batch_grades(score, uncached)
+            grades_by_index.update(new_grades)
+            await asyncio.to_thread(_store_grades, verdict_cache, cache_keys, new_grades)
+        except (OutputParserException, ValidationError, AttributeError):
+            print("---BATCH GRADING FAILED, FALLING BACK TO PER-DOCUMENT GRADING---")
+
+    pending = [(i, d) for i, d in enumerate(documents) if i not in grades_by_index]
+    fallback = await agrade_each(question, [d for _, d in pending], grader, max_concurrency)
+    grades_by_index.update(zip([i for i, _ in pending], fallback))
+    return [grades_by_index[i] for i in range(len(documents))]
+
+
+async def agrade_each(question, documents, grader, max_concurrency=4):
+    """
+    Grade documents one call each, concurrently, at most max_concurrency calls in flight.
+
+    Returns:
+        list: 'yes' / 'no' grade for each document, in input order
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def score_document(d):
+        async with semaphore:
+            score = await grader.ainvoke({"question": question, "document": d.page_content})
+        return score.binary_score
+
+    return list(await asyncio.gather(*(score_document(d) for d in documents)))
+
+
+def grade_relevance(question, documents, grader, batch_grader=None):
+    """
+    Grade retrieved documents: prefilter first, then the LLM grader for the rest.
+
+    Args:
+        question (str): The user question
+        documents (list): Retrieved documents
+        grader (Runnable): Per-document retrieval grader
+        batch_grader (Runnable): Batched grader; None grades one document per call
+
+    Returns:
+        list: 'yes' / 'no' grade for each document, in input order
+    """
+
+    def grade_with_llm(docs):
+        if batch_grader is not None:
+            return grade_documents_in_batch(question, docs, grader, batch_grader)
+        return [grader.invoke({"question": question, "document": d.page_content}).binary_score for d in docs]
+
+    # Decide the obvious docs locally, score the rest with the LLM grader
+    return prefiltered_grades(question, documents, grade_with_llm)
+
+
+async def agrade_relevance(question, documents, grader, batch_grader=None, max_concurrency=4):
+    """Async twin of grade_relevance; per-document calls run concurrently, at most max_concurrency at once."""
+
+    async def grade_with_llm(docs):
+        if batch_grader is not None:
+            return await agrade_documents_in_batch(question, docs, grader, batch_grader, max_concurrency)
+        return await agrade_each(question, docs, grader, max_concurrency)
+
+    return await aprefiltered_grades(question, documents, grade_with_llm)
+
+
+def keep_relevant(documents, grades):
+    """The documents graded 'yes', printing the grade of each."""
+    filtered_docs = []
+    for d, grade in zip(documents, grades):
+        if grade == "yes":
+            print("---GRADE: DOCUMENT RELEVANT---")
+            filtered_docs.append(d)
+        else:
+            print("---GRADE: DOCUMENT NOT RELEVANT---")
+    return filtered_docs
@@ -0,0 +1,330 @@
+"""
+Persistent BM25 keyword index kept next to a Chroma collection.
+
+Chunks are stored by ID with their term counts in a SQLite file, which the
+IncrementalIngestor updates together with the vector store (same IDs, same
+adds and deletes). build() compiles the index into a CSC sparse matrix of BM25
+weights (rows = chunks, columns = terms) saved as an .npz file. The ingestor
+compiles it at the end of every run, so queries normally just load it. A query
+only touches the postings of its own terms:
+
+    scores = sum of the query-term columns, top-k by argpartition
+
+Cost grows with the postings of the query terms, not with the corpus: well
+under a millisecond for selective terms on a million chunks, and tens of
+milliseconds when the query terms occur in most chunks.
+
+HybridRetriever runs the dense and the keyword search and merges the two ranked
+lists with reciprocal-rank fusion (RRF): score(d) = sum over lists of
+weight / (rrf_k + rank of d).
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag_common.ingestion import chunk_id
+from rag_common.sqlite_cache import content_hash
+
+_WORD_RE = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or that the this to "
+    "was what when where which who why will with you your".split()
+)
+
+
+def keyword_tokens(text):
+    """Lower-cased word tokens without stopwords."""
+    return [t for t in _WORD_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _term_counts(text):
+    counts = {}
+    for token in keyword_tokens(text):
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+class BM25Index:
+    """
+    BM25 index over chunks, persisted in a directory.
+
+    Args:
+        directory (str): Directory for index.sqlite (chunks) and matrix.npz (compiled index)
+        k1 (float): BM25 term frequency saturation
+        b (float): BM25 length normalization
+    """
+
+    def __init__(self, directory, k1=1.5, b=0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        os.makedirs(directory, exist_ok=True)
+        self.matrix_path = os.path.join(directory, "matrix.npz")
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, length INTEGER NOT NULL, terms TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self._loaded = None  # compiled index arrays, vocabulary and matrix.npz mtime
+
+    # ---- updates (SQLite) ----
+
+    def _bump_generation(self):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    def generation(self):
+        """Counter incremented by every add / delete."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def add(self, ids, texts):
+        """Insert or replace chunks."""
+        rows = []
+        for i, text in zip(ids, texts):
+            counts = _term_counts(text)
+            rows.append((i, sum(counts.values()), json.dumps(counts)))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, length, terms) VALUES (?, ?, ?)", rows)
+            self._bump_generation()
+            self._conn.commit()
+
+    def delete(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+            self._bump_generation()
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    # ---- compiled index (sparse matrix) ----
+
+    def build(self):
+        """Compile the chunks into the BM25 weight matrix and save it."""
+        generation = self.generation()
+        with self._lock:
+            rows = self._conn.execute("SELECT id, length, terms FROM chunks ORDER BY id").fetchall()
+
+        ids = [row[0] for row in rows]
+        vocabulary = {}
+        doc_index, term_index, tf = [], [], []
+        for d, (_, _, terms) in enumerate(rows):
+            for term, count in json.loads(terms).items():
+                doc_index.append(d)
+                term_index.append(vocabulary.setdefault(term, len(vocabulary)))
+                tf.append(count)
+
+        doc_index = np.asarray(doc_index, dtype=np.int32)
+        term_index = np.asarray(term_index, dtype=np.int32)
+        tf = np.asarray(tf, dtype=np.float32)
+        lengths = np.asarray([row[1] for row in rows], dtype=np.float32)
+        n = len(ids)
+        df = np.bincount(term_index, minlength=len(vocabulary)).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        avg_length = float(lengths.mean()) if n and lengths.mean() > 0 else 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        weights = idf[term_index] * tf * (self.k1 + 1) / (tf + norm[doc_index])
+
+        # CSC layout: the postings of each term are contiguous, in chunk order
+        order = np.argsort(term_index, kind="stable")
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df.astype(np.int64), out=indptr[1:])
+        terms = np.array(sorted(vocabulary, key=vocabulary.get), dtype=str)
+
+        tmp_path = self.matrix_path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            data=weights[order], indices=doc_index[order], indptr=indptr,
+            ids=np.array(ids, dtype=str), terms=terms, generation=np.array(generation),
+        )
+        os.replace(tmp_path, self.matrix_path)
+        return n
+
+    def _read(self, accept_stale=False):
+        """The compiled index from matrix.npz, reloaded when the file changed; None when missing or stale."""
+        if not os.path.exists(self.matrix_path):
+            return None
+        mtime = os.stat(self.matrix_path).st_mtime_ns
+        loaded = self._loaded
+        if loaded is not None and loaded["mtime"] == mtime:
+            return loaded
+        with self._lock:
+            with np.load(self.matrix_path, allow_pickle=False) as f:
+                loaded = {name: f[name] for name in ("data", "indices", "indptr", "ids")}
+                stale = int(f["generation"]) != self._generation_unlocked()
+                loaded["vocabulary"] = {term: column for column, term in enumerate(f["terms"].tolist())}
+        if stale and not accept_stale:
+            return None
+        loaded["mtime"] = mtime
+        self._loaded = loaded
+        return loaded
+
+    def _load(self):
+        """
+        The compiled index. The ingestor compiles it after every run; when it is
+        still missing or stale, one caller rebuilds it while concurrent callers
+        wait for that build instead of starting their own.
+        """
+        loaded = self._read()
+        if loaded is not None:
+            return loaded
+        with self._build_lock:
+            # Built by another caller while this one waited
+            loaded = self._read()
+            if loaded is None:
+                if not len(self):
+                    return None
+                self.build()
+                # A write racing with the build leaves it stale; serve it until the next build
+                loaded = self._read(accept_stale=True)
+        return loaded
+
+    def _generation_unlocked(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def search(self, query, k=4):
+        """
+        Top-k chunks for a query.
+
+        Returns:
+            list: (chunk id, BM25 score) pairs, best first; empty when nothing matches
+        """
+        loaded = self._load()
+        if loaded is None:
+            return []
+        vocabulary, indptr, ids = loaded["vocabulary"], loaded["indptr"], loaded["ids"]
+        columns = {vocabulary[t] for t in keyword_tokens(query) if t in vocabulary}
+        if not columns:
+            return []
+
+        # Postings of the query terms only: (chunk row, weight) pairs, summed per chunk
+        rows = np.concatenate([loaded["indices"][indptr[c]:indptr[c + 1]] for c in columns])
+        weights = np.concatenate([loaded["data"][indptr[c]:indptr[c + 1]] for c in columns])
+        if len(rows) > len(ids) // 32:
+            # Common terms: a dense accumulator is cheaper than sorting the postings
+            scores = np.bincount(rows, weights=weights, minlength=len(ids))
+            rows = np.flatnonzero(scores)
+            scores = scores[rows]
+        elif len(columns) > 1:
+            rows, inverse = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights)
+        else:
+            scores = weights
+
+        top = np.argpartition(-scores, k)[:k] if len(rows) > k else np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        return [(str(ids[rows[i]]), float(scores[i])) for i in top]
+
+
+def document_id(doc):
+    """
+    ID of a retrieved chunk: the vector store ID, or the deterministic ingestion chunk ID.
+
+    Without the store ID a repeated text cannot be told apart from its first
+    occurrence in the same source, so it takes that occurrence's ID.
+    """
+    if getattr(doc, "id", None):
+        return doc.id
+    metadata = doc.metadata or {}
+    if "source" in metadata and "ordinal" in metadata:
+        return chunk_id(metadata["source"], doc.page_content)
+    return content_hash(doc.page_content)
+
+
+def reciprocal_rank_fusion(rankings, weights=None, rrf_k=60):
+    """
+    Fuse ranked ID lists.
+
+    Args:
+        rankings (list): Lists of IDs, best first
+        weights (list): Weight of each list (default 1.0 each)
+        rrf_k (int): Rank offset; larger values flatten the contribution of top ranks
+
+    Returns:
+        list: (id, fused score) pairs, best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, i in enumerate(ranking, start=1):
+            scores[i] = scores.get(i, 0.0) + weight / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense (vector store) + keyword (BM25) retrieval fused with reciprocal-rank fusion.
+
+    Args:
+        vectorstore (VectorStore): Chroma collection holding the chunks
+        keyword_index (BM25Index): Keyword index over the same chunk IDs
+        k (int): Number of documents returned
+        fetch_k (int): Candidates taken from each list before fusion
+        dense_weight (float): RRF weight of the dense ranking
+        keyword_weight (float): RRF weight of the keyword ranking
+        rrf_k (int): RRF rank offset
+    """
+
+    vectorstore: object
+    keyword_index: object
+    k: int = 4
+    fetch_k: int = 20
+    dense_weight: float = 1.0
+    keyword_weight: float = 1.0
+    rrf_k: int = 60
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _fetch(self, ids):
+        """Load keyword-only hits from the vector store."""
+        if not ids:
+            return {}
+        found = self.vectorstore.get(ids=list(ids), include=["documents", "metadatas"])
+        return {
+            # Keep the store ID: repeated text in a source cannot be told apart by its content
+            i: Document(id=i, page_content=text, metadata=metadata or {})
+            for i, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+
+    def _fuse(self, dense_docs, keyword_hits):
+        dense = {}
+        for doc in dense_docs:
+            dense.setdefault(document_id(doc), doc)
+        fused = reciprocal_rank_fusion(
+            [list(dense), [i for i, _ in keyword_hits]],
+            weights=[self.dense_weight, self.keyword_weight],
+            rrf_k=self.rrf_k,
+        )[:self.k]
+        missing = self._fetch([i for i, _ in fused if i not in dense])
+        return [dense.get(i) or missing[i] for i, _ in fused if i in dense or i in missing]
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        dense_docs = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        return self._fuse(dense_docs, self.keyword_index.search(query, k=self.fetch_k))
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        dense_docs = await self.vectorstore.asimilarity_search(query, k=self.fetch_k)
+        # The keyword search (which may have to load or rebuild the index) and the fetch of
+        # keyword-only hits block, so run them in a worker thread
+        return await asyncio.to_thread(
+            lambda: self._fuse(dense_docs, self.keyword_index.search(query, k=self.fetch_k))
+        )
@@ -0,0 +1,127 @@
+"""
+Loop budget for the self-correcting graphs.
+
+The adaptive and self-reflection graphs loop back to generate ("not supported")
+and to transform_query ("not useful" / no relevant documents). LoopBudget caps
+those loops and the total work of one run, so a bad question ends with the best
+answer found so far instead of running into LangGraph's recursion limit.
+
+The counters live in the graph state (generation_count, rewrite_count,
+tokens_used, started_at); limits can be set per run in the state (max_regenerations,
+max_rewrites, max_tokens, max_seconds), otherwise they come from the environment.
+
+Configuration (environment variables):
+    RAG_MAX_REGENERATIONS   re-generations after an ungrounded answer (default 2)
+    RAG_MAX_REWRITES        question rewrites (default 2)
+    RAG_MAX_TOKENS          estimated LLM tokens per run, 0 for no limit (default 20000)
+    RAG_MAX_SECONDS         wall time per run, 0 for no limit (default 60)
+"""
+
+import math
+import os
+import time
+
+from langchain_core.documents import Document
+
+# Returned when the budget runs out before any answer was generated
+NO_ANSWER = "I don't know."
+
+
+def _text_length(value):
+    """Characters of model-visible text: page_content for documents, not their repr with metadata."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, Document):
+        return len(value.page_content)
+    if isinstance(value, (list, tuple)):
+        return sum(_text_length(v) for v in value)
+    return len(str(value))
+
+
+def estimate_tokens(*texts):
+    """Rough token count (4 characters per token) of the text sent to or returned by a model."""
+    return sum(math.ceil(_text_length(text) / 4) for text in texts)
+
+
+def charge(state, *texts):
+    """
+    Budget fields to merge into a node's update after it called a model.
+
+    Args:
+        state (dict): The current graph state
+        texts (str | Document | list): Prompt inputs and outputs of the model calls made by the node
+
+    Returns:
+        dict: Updated tokens_used, and started_at on the first node of a run
+    """
+    return {
+        "tokens_used": state.get("tokens_used", 0) + estimate_tokens(*texts),
+        "started_at": state.get("started_at") or time.time(),
+    }
+
+
+class LoopBudget:
+    """
+    Limits on the loops and total cost of one graph run.
+
+    Args:
+        max_regenerations (int): Re-generations allowed after an ungrounded answer
+        max_rewrites (int): Question rewrites allowed
+        max_tokens (int): Estimated tokens allowed per run; 0 or None for no limit
+        max_seconds (float): Wall time allowed per run; 0 or None for no limit
+    """
+
+    def __init__(self, max_regenerations=2, max_rewrites=2, max_tokens=None, max_seconds=None):
+        self.max_regenerations = max_regenerations
+        self.max_rewrites = max_rewrites
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_regenerations=int(os.getenv("RAG_MAX_REGENERATIONS", "2")),
+            max_rewrites=int(os.getenv("RAG_MAX_REWRITES", "2")),
+            max_tokens=int(os.getenv("RAG_MAX_TOKENS", "20000")),
+            max_seconds=float(os.getenv("RAG_MAX_SECONDS", "60")),
+        )
+
+    def for_state(self, state):
+        """This budget with any max_* overrides carried in the graph state applied."""
+        return LoopBudget(
+            max_regenerations=state.get("max_regenerations", self.max_regenerations),
+            max_rewrites=state.get("max_rewrites", self.max_rewrites),
+            max_tokens=state.get("max_tokens", self.max_tokens),
+            max_seconds=state.get("max_seconds", self.max_seconds),
+        )
+
+    def spent(self, state):
+        """Name of the exhausted token or time budget ("tokens" / "time"), or None."""
+        if self.max_tokens and state.get("tokens_used", 0) >= self.max_tokens:
+            return "tokens"
+        started_at = state.get("started_at")
+        if self.max_seconds and started_at and time.time() - started_at >= self.max_seconds:
+            return "time"
+        return None
+
+    def can_regenerate(self, state):
+        # generation_count includes the first generation
+        return state.get("generation_count", 0) <= self.max_regenerations
+
+    def can_rewrite(self, state):
+        return state.get("rewrite_count", 0) < self.max_rewrites
+
+    def reason(self, state):
+        """Why the budget is exhausted: "tokens", "time", "regenerations", "rewrites" or None."""
+        spent = self.spent(state)
+        if spent:
+            return spent
+        if not self.can_regenerate(state):
+            return "regenerations"
+        if not self.can_rewrite(state):
+            return "rewrites"
+        return None
+
+
+# Budget used by the graphs unless the state overrides it
+default_budget = LoopBudget.from_env()
@@ -0,0 +1,209 @@
+"""
+Lazily built, process-wide graph components.
+
+Importing a variant's graph used to build everything at module level: a chat
+model per grader, the Chroma client, the BM25 index, the router's example
+embeddings and the web search client. A process that only imports the graph,
+or only runs part of it, paid for all of them. Each of these is now
+registered here with a factory and built on first use. Components are shared
+by every module that asks for them, so the graders of a variant use one chat
+model instead of constructing three.
+
+Modules keep their module-level names, bound to a LazyComponent proxy that
+forwards method calls to the built instance:
+
+    retriever = lazy("retriever", build_retriever)
+    retriever.invoke(question)   # builds vectorstore and retriever on the first call
+
+Code that needs the real object (e.g. to pass it to a constructor that
+validates its type, or to read an attribute that is not a method) unwraps the
+proxy with resolve(retriever).
+
+Builders can also be registered with a decorator; calling the decorated
+function returns the shared instance:
+
+    @component()
+    def rag_chain():
+        return get_rag_prompt() | shared_chat_model() | StrOutputParser()
+
+    rag_chain().invoke(...)   # built on the first call, shared afterwards
+
+warm_up() builds all registered components ahead of the first request; the
+serving entry point calls it at startup unless RAG_WARM_UP=false.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+
+from rag_common.providers import get_chat_model, provider_name
+
+
+class Components:
+    """Registry of named component factories, each built once per provider on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._factories = {}
+        self._instances = {}
+        self._build_locks = {}
+
+    def register(self, name, factory):
+        """Register factory under name; the first registration of a name wins."""
+        with self._lock:
+            self._factories.setdefault(name, factory)
+
+    def get(self, name):
+        """
+        The component registered under name, built with its factory on first use.
+
+        Args:
+            name (str): Component name
+
+        Returns:
+            object: The shared instance
+        """
+        key = (name, provider_name())
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"No component registered under {name!r}")
+            # One lock per component, so a factory may get other components while it builds
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                instance = self._instances[key] = self._factories[name]()
+        return instance
+
+    def built(self, name):
+        """Whether name has been built for the current provider."""
+        return (name, provider_name()) in self._instances
+
+    def names(self):
+        with self._lock:
+            return list(self._factories)
+
+    def warm_up(self, names=None):
+        """
+        Build components ahead of the first request.
+
+        Args:
+            names (list): Components to build; defaults to all registered ones
+
+        Returns:
+            dict: {name: seconds spent building it}; 0 for components built earlier
+        """
+        seconds = {}
+        for name in names or self.names():
+            started = time.perf_counter()
+            self.get(name)
+            seconds[name] = time.perf_counter() - started
+        return seconds
+
+    async def awarm_up(self, names=None):
+        """Async twin of warm_up; builds in a worker thread."""
+        return await asyncio.to_thread(self.warm_up, names)
+
+    def reset(self):
+        """Drop the built instances; the next use rebuilds them."""
+        with self._lock:
+            self._instances.clear()
+            self._build_locks.clear()
+
+
+_components = Components()
+
+
+def get_components():
+    """Process-wide component container."""
+    return _components
+
+
+class LazyComponent:
+    """
+    Stand-in for a registered component.
+
+    Once the component is built, attribute access is forwarded to it. Before
+    that, a public attribute is returned as a method that builds the component
+    when it is called: compiling a graph inspects the attributes its node
+    functions use (retriever.invoke, chain.ainvoke), and that must not build
+    anything. Read other attributes from resolve(component).
+    """
+
+    __slots__ = ("_name", "_components")
+
+    def __init__(self, name, components):
+        self._name = name
+        self._components = components
+
+    def __getattr__(self, attr):
+        if attr in LazyComponent.__slots__:
+            raise AttributeError(attr)
+        built = self._components.built(self._name)
+        if not built and attr.startswith("__"):
+            # Introspection (__self__, __wrapped__, ...) of a component that is not built yet
+            raise AttributeError(attr)
+        if built or attr.startswith("_"):
+            return getattr(self._components.get(self._name), attr)
+
+        def deferred(*args, **kwargs):
+            return getattr(self._components.get(self._name), attr)(*args, **kwargs)
+
+        deferred.__name__ = attr
+        return deferred
+
+    def __repr__(self):
+        state = "built" if self._components.built(self._name) else "not built"
+        return f"<LazyComponent {self._name!r} ({state})>"
+
+
+def lazy(name, factory, components=None):
+    """
+    Register factory as a component and return a proxy for it.
+
+    Args:
+        name (str): Component name, unique per process
+        factory (callable): No-argument builder of the component
+        components (Components): Defaults to the process-wide container
+
+    Returns:
+        LazyComponent: Proxy forwarding attribute access to the built component
+    """
+    components = components or _components
+    components.register(name, factory)
+    return LazyComponent(name, components)
+
+
+def resolve(component):
+    """The built object behind a LazyComponent; other objects are returned unchanged."""
+    if isinstance(component, LazyComponent):
+        return component._components.get(component._name)
+    return component
+
+
+def component(name=None, components=None):
+    """Decorator: registers a no-argument builder; calling it returns the shared instance."""
+
+    def decorate(build):
+        proxy = lazy(name or build.__name__, build, components)
+
+        @functools.wraps(build)
+        def get():
+            return resolve(proxy)
+
+        return get
+
+    return decorate
+
+
+# One chat model shared by the graders, generators and routers of a graph
+chat_model = lazy("chat_model", get_chat_model)
+
+
+def shared_chat_model():
+    """The process-wide chat model (built on first use)."""
+    return resolve(chat_model)
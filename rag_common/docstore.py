@@ -0,0 +1,181 @@
+"""
+Disk-backed key/value store for the parent documents of multi-vector retrievers.
+
+SQLiteByteStore implements LangChain's ByteStore interface (mget / mset /
+mdelete / yield_keys), so it can replace InMemoryByteStore wherever a retriever
+takes byte_store=. Compared to the in-memory store:
+
+    * documents survive restarts and are shared by every process opening the file
+    * mget / mset run one SQL statement per batch of keys, not one per key
+    * values larger than a few hundred bytes are zlib-compressed on disk
+    * a read-through LRU (bounded in bytes) serves hot parents without touching SQLite
+
+Configuration (environment variables):
+    DOCSTORE_DIR              Directory of the store files (default ./.rag_cache/docstore)
+    DOCSTORE_CACHE_MB         Size of the in-process LRU per store (default 64)
+"""
+
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+
+from langchain_core.stores import ByteStore
+
+# SQLite limits the number of bound parameters per statement
+_BATCH_SIZE = 500
+
+# Values smaller than this are stored as they are; compressing them saves little
+_COMPRESS_MIN_BYTES = 256
+
+
+class SQLiteByteStore(ByteStore):
+    """
+    ByteStore persisted in a SQLite file.
+
+    Args:
+        path (str): SQLite file (created if missing)
+        cache_bytes (int): Budget of the read-through LRU in bytes; 0 disables it
+        compression_level (int): zlib level for stored values; 0 stores them uncompressed
+    """
+
+    def __init__(self, path, cache_bytes=64 * 2**20, compression_level=6):
+        self.path = path
+        self.cache_bytes = cache_bytes
+        self.compression_level = compression_level
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docstore (key TEXT PRIMARY KEY, value BLOB NOT NULL, compressed INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    # ---- LRU (callers hold the lock) ----
+
+    def _remember(self, key, value):
+        if len(value) > self.cache_bytes:
+            return
+        self._forget(key)
+        self._cache[key] = value
+        self._cached_bytes += len(value)
+        while self._cached_bytes > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def _forget(self, key):
+        value = self._cache.pop(key, None)
+        if value is not None:
+            self._cached_bytes -= len(value)
+
+    # ---- encoding ----
+
+    def _encode(self, value):
+        if self.compression_level and len(value) >= _COMPRESS_MIN_BYTES:
+            packed = zlib.compress(value, self.compression_level)
+            if len(packed) < len(value):
+                return packed, 1
+        return value, 0
+
+    @staticmethod
+    def _decode(value, compressed):
+        return zlib.decompress(value) if compressed else bytes(value)
+
+    # ---- ByteStore ----
+
+    def mget(self, keys):
+        """Values for keys (None where missing), in the order of keys."""
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                value = self._cache.get(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    self._cache.move_to_end(key)
+                    found[key] = value
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            for start in range(0, len(missing), _BATCH_SIZE):
+                batch = missing[start:start + _BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT key, value, compressed FROM docstore WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, value, compressed in rows:
+                    found[key] = self._decode(value, compressed)
+                    if self.cache_bytes:
+                        self._remember(key, found[key])
+        return [found.get(key) for key in keys]
+
+    def mset(self, key_value_pairs):
+        """Insert or replace values, in one transaction."""
+        rows = [(key, *self._encode(value)) for key, value in key_value_pairs]
+        with self._lock:
+            for start in range(0, len(rows), _BATCH_SIZE):
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO docstore (key, value, compressed) VALUES (?, ?, ?)",
+                    rows[start:start + _BATCH_SIZE],
+                )
+            self._conn.commit()
+            for key, _, _ in rows:
+                # Other processes may write the same keys; re-read them from disk on the next mget
+                self._forget(key)
+
+    def mdelete(self, keys):
+        keys = list(keys)
+        with self._lock:
+            self._conn.executemany("DELETE FROM docstore WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+            for key in keys:
+                self._forget(key)
+
+    def yield_keys(self, prefix=None):
+        with self._lock:
+            if prefix is None:
+                keys = [row[0] for row in self._conn.execute("SELECT key FROM docstore ORDER BY key")]
+            else:
+                # Range scan on the primary key instead of LIKE, which would need escaping
+                keys = [
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT key FROM docstore WHERE key >= ? AND key < ? ORDER BY key", (prefix, prefix + "\U0010ffff")
+                    )
+                ]
+        yield from keys
+
+    def clear(self):
+        """Delete every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM docstore")
+            self._conn.commit()
+            self._cache.clear()
+            self._cached_bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docstore").fetchone()[0]
+
+
+def get_docstore(name):
+    """
+    The persistent byte store named name, configured from the environment.
+
+    Args:
+        name (str): Store name, typically the name of the vector store collection it backs
+
+    Returns:
+        SQLiteByteStore: Store in DOCSTORE_DIR/<name>.sqlite
+    """
+    directory = os.getenv("DOCSTORE_DIR", "./.rag_cache/docstore")
+    cache_mb = float(os.getenv("DOCSTORE_CACHE_MB", "64"))
+    return SQLiteByteStore(os.path.join(directory, f"{name}.sqlite"), cache_bytes=int(cache_mb * 2**20))
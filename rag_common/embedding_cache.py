@@ -0,0 +1,170 @@
+"""
+Content-addressed embedding cache.
+
+CachedEmbeddings wraps any LangChain Embeddings model and stores every vector in
+a local SQLite file as a float32 blob, keyed by a hash of (model, kind, text).
+Batch lookups only send the texts that are not cached yet to the provider, so
+re-ingesting unchanged documents and repeating queries costs no API calls.
+
+Configuration (environment variables):
+    EMBEDDING_CACHE           "false" disables the cache
+    EMBEDDING_CACHE_PATH      SQLite file (default ./.rag_cache/embeddings.sqlite)
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from rag_common.sqlite_cache import content_hash
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK_SIZE = 500
+
+
+def _to_blob(vector):
+    return array("f", vector).tobytes()
+
+
+def _from_blob(blob):
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from a SQLite cache.
+
+    Args:
+        underlying (Embeddings): The embedding model to call on cache misses
+        path (str): SQLite file to store vectors in (created if missing)
+        namespace (str): Separates vectors of different models; defaults to the model name
+    """
+
+    def __init__(self, underlying, path, namespace=None):
+        self.underlying = underlying
+        self.path = path
+        self.namespace = namespace or getattr(underlying, "model", None) or type(underlying).__name__
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, kind, text):
+        return content_hash(f"{self.namespace}\x1f{kind}\x1f{text}")
+
+    def _lookup(self, keys):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK_SIZE):
+                chunk = keys[start:start + _LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                )
+                for key, blob in rows:
+                    found[key] = _from_blob(blob)
+        return found
+
+    def _store(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", items
+            )
+            self._conn.commit()
+
+    def _split(self, kind, texts):
+        """Return keys, cached vectors and the unique texts that still need embedding."""
+        keys = [self._key(kind, text) for text in texts]
+        found = self._lookup(list(set(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing.setdefault(key, text)
+        return keys, found, missing
+
+    def _merge(self, keys, found, missing, vectors):
+        new_items = [(key, _to_blob(vector)) for key, vector in zip(missing.keys(), vectors)]
+        if new_items:
+            self._store(new_items)
+            # Return the stored float32 values so hits and misses are identical
+            found.update((key, _from_blob(blob)) for key, blob in new_items)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts):
+        keys, found, missing = self._split("document", texts)
+        vectors = self.underlying.embed_documents(list(missing.values())) if missing else []
+        return self._merge(keys, found, missing, vectors)
+
+    def embed_query(self, text):
+        keys, found, missing = self._split("query", [text])
+        vectors = [self.underlying.embed_query(text)] if missing else []
+        return self._merge(keys, found, missing, vectors)[0]
+
+    # The SQLite lookups and writes block, so the async twins run them in a worker thread
+
+    async def aembed_documents(self, texts):
+        keys, found, missing = await asyncio.to_thread(self._split, "document", texts)
+        if not missing:
+            return [found[key] for key in keys]
+        vectors = await self.underlying.aembed_documents(list(missing.values()))
+        return await asyncio.to_thread(self._merge, keys, found, missing, vectors)
+
+    async def aembed_query(self, text):
+        keys, found, missing = await asyncio.to_thread(self._split, "query", [text])
+        if not missing:
+            return found[keys[0]]
+        vectors = [await self.underlying.aembed_query(text)]
+        return (await asyncio.to_thread(self._merge, keys, found, missing, vectors))[0]
+
+    def stats(self):
+        """Hit/miss counters for this process plus the number of vectors and bytes stored."""
+        with self._lock:
+            entries, bytes_stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes_stored": bytes_stored,
+        }
+
+
+_embeddings = None
+
+
+def get_embeddings():
+    """
+    Process-wide embedding model used by every ingestion and query path.
+
+    Returns the provider's embeddings (see rag_common.providers) wrapped in
+    CachedEmbeddings unless EMBEDDING_CACHE=false.
+    """
+    global _embeddings
+    if _embeddings is None:
+        from rag_common.providers import get_base_embeddings
+
+        embeddings = get_base_embeddings()
+        if os.getenv("EMBEDDING_CACHE", "true").lower() == "true":
+            embeddings = CachedEmbeddings(
+                embeddings, os.getenv("EMBEDDING_CACHE_PATH", "./.rag_cache/embeddings.sqlite")
+            )
+        _embeddings = embeddings
+    return _embeddings
@@ -0,0 +1,102 @@
+"""
+Nearest-centroid question router over embeddings.
+
+Each route is described by a handful of labelled example questions and topic
+descriptions. Their embeddings are averaged into one centroid per route; a
+question goes to the route whose centroid is most similar. The confidence is the
+margin between the best and second best cosine similarity, so callers can fall
+back to an LLM router for the ambiguous cases only.
+
+Routing costs one embed_query call (served by the embedding cache for repeated
+questions, and shared with the retriever, which embeds the same text) plus a
+dot product per route.
+"""
+
+import math
+import threading
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+class NearestCentroidRouter:
+    """
+    Routes questions to the label whose example centroid is closest.
+
+    Args:
+        embeddings (Embeddings): Model used for the examples and the questions
+        examples (dict): Label -> list of example questions / topic descriptions
+        min_confidence (float): Margin between the top two similarities below which
+            classify() returns None as the label
+    """
+
+    def __init__(self, embeddings, examples, min_confidence=0.05):
+        self.embeddings = embeddings
+        self.examples = {label: list(texts) for label, texts in examples.items()}
+        self.min_confidence = min_confidence
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def _fit(self, vectors_by_label):
+        centroids = {}
+        for label, vectors in vectors_by_label.items():
+            normalized = [_normalize(v) for v in vectors]
+            mean = [sum(column) / len(normalized) for column in zip(*normalized)]
+            centroids[label] = _normalize(mean)
+        return centroids
+
+    def _split_vectors(self, vectors):
+        by_label, start = {}, 0
+        for label, texts in self.examples.items():
+            by_label[label] = vectors[start:start + len(texts)]
+            start += len(texts)
+        return by_label
+
+    def centroids(self):
+        """Route centroids, computed from the examples on first use."""
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    texts = [text for texts in self.examples.values() for text in texts]
+                    self._centroids = self._fit(self._split_vectors(self.embeddings.embed_documents(texts)))
+        return self._centroids
+
+    async def acentroids(self):
+        if self._centroids is None:
+            texts = [text for texts in self.examples.values() for text in texts]
+            vectors = await self.embeddings.aembed_documents(texts)
+            with self._lock:
+                if self._centroids is None:
+                    self._centroids = self._fit(self._split_vectors(vectors))
+        return self._centroids
+
+    def _decide(self, centroids, vector):
+        vector = _normalize(vector)
+        ranked = sorted(((_dot(vector, c), label) for label, c in centroids.items()), reverse=True)
+        best_score, best_label = ranked[0]
+        confidence = best_score - ranked[1][0] if len(ranked) > 1 else 1.0
+        label = best_label if confidence >= self.min_confidence else None
+        return label, confidence
+
+    def classify(self, question):
+        """
+        Route a question.
+
+        Args:
+            question (str): The user question
+
+        Returns:
+            tuple: (label or None when the confidence is below min_confidence, confidence)
+        """
+        centroids = self.centroids()
+        return self._decide(centroids, self.embeddings.embed_query(question))
+
+    async def aclassify(self, question):
+        centroids = await self.acentroids()
+        return self._decide(centroids, await self.embeddings.aembed_query(question))
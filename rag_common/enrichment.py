@@ -0,0 +1,130 @@
+"""
+Batched, resumable LLM enrichment of chunks at ingestion time.
+
+Multi-vector indexing generates something per chunk (hypothetical questions, a
+summary) with one LLM call each. enrich_chunks runs those calls through the
+chain's .batch with bounded concurrency instead of a serial loop, and stores
+every result in a persistent cache keyed by the task name and a hash of the
+chunk text as soon as its batch finishes. The cache doubles as the checkpoint:
+after a crash or a failed call, re-running the ingestion only generates the
+chunks that are missing, and unchanged chunks of a re-ingested site cost no
+LLM calls at all.
+
+Results must be JSON-serializable (strings, lists of strings, dicts).
+
+Configuration (environment variables):
+    ENRICHMENT_CACHE                "false" disables the cache
+    ENRICHMENT_CACHE_PATH           SQLite file (default ./.rag_cache/enrichment.sqlite)
+    ENRICHMENT_MAX_CONCURRENCY      LLM calls in flight (default 8)
+    ENRICHMENT_BATCH_SIZE           chunks per checkpoint (default 32)
+"""
+
+import os
+
+from rag_common.sqlite_cache import PersistentCache, content_hash
+
+_enrichment_cache = None
+
+
+def get_enrichment_cache():
+    """Process-wide enrichment cache, or None when ENRICHMENT_CACHE=false."""
+    global _enrichment_cache
+    if os.getenv("ENRICHMENT_CACHE", "true").lower() != "true":
+        return None
+    if _enrichment_cache is None:
+        _enrichment_cache = PersistentCache(os.getenv("ENRICHMENT_CACHE_PATH", "./.rag_cache/enrichment.sqlite"))
+    return _enrichment_cache
+
+
+def enrichment_key(task, text):
+    """Cache key of one chunk for one task; change the task name when the prompt or model changes."""
+    return f"{task}:{content_hash(text)}"
+
+
+def _settings(max_concurrency, batch_size, cache):
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("ENRICHMENT_MAX_CONCURRENCY", "8"))
+    if batch_size is None:
+        batch_size = int(os.getenv("ENRICHMENT_BATCH_SIZE", "32"))
+    if cache is None:
+        cache = get_enrichment_cache()
+    return max_concurrency, batch_size, cache
+
+
+def _lookup(task, chunks, cache):
+    """Cached results by chunk position, and the positions still to generate."""
+    results, pending = {}, []
+    for i, chunk in enumerate(chunks):
+        cached = cache.get(enrichment_key(task, chunk.page_content)) if cache is not None else None
+        if cached is None:
+            pending.append(i)
+        else:
+            results[i] = cached
+    print(f"---ENRICH {task.upper()}: {len(results)} CACHED, {len(pending)} TO GENERATE---")
+    return results, pending
+
+
+def _store(task, chunks, batch, outputs, results, cache, failures):
+    for i, output in zip(batch, outputs):
+        if isinstance(output, Exception):
+            failures.append((i, output))
+            continue
+        results[i] = output
+        if cache is not None:
+            cache.set(enrichment_key(task, chunks[i].page_content), output)
+
+
+def _finish(task, chunks, results, failures):
+    if failures:
+        i, error = failures[0]
+        raise RuntimeError(
+            f"{task}: {len(failures)} of {len(chunks)} chunks failed (first: chunk {i}: {error!r}); "
+            "finished chunks are cached, re-run to resume"
+        ) from error
+    return [results[i] for i in range(len(chunks))]
+
+
+def enrich_chunks(chain, chunks, task, max_concurrency=None, batch_size=None, cache=None):
+    """
+    Run chain on every chunk, reusing cached results.
+
+    Args:
+        chain (Runnable): Chain taking a Document and returning a JSON-serializable result
+        chunks (list): Documents to enrich
+        task (str): Name of the enrichment, part of the cache key (e.g. "hypothetical_questions_v1")
+        max_concurrency (int): LLM calls in flight (default ENRICHMENT_MAX_CONCURRENCY)
+        batch_size (int): Chunks generated between checkpoints (default ENRICHMENT_BATCH_SIZE)
+        cache (PersistentCache): Result cache (default: the process-wide enrichment cache)
+
+    Returns:
+        list: One result per chunk, in order
+
+    Raises:
+        RuntimeError: When some chunks failed; the others are cached before raising
+    """
+    max_concurrency, batch_size, cache = _settings(max_concurrency, batch_size, cache)
+    results, pending = _lookup(task, chunks, cache)
+    failures = []
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        outputs = chain.batch(
+            [chunks[i] for i in batch], config={"max_concurrency": max_concurrency}, return_exceptions=True
+        )
+        _store(task, chunks, batch, outputs, results, cache, failures)
+        print(f"---ENRICH {task.upper()}: {min(start + batch_size, len(pending))}/{len(pending)} GENERATED---")
+    return _finish(task, chunks, results, failures)
+
+
+async def aenrich_chunks(chain, chunks, task, max_concurrency=None, batch_size=None, cache=None):
+    """Async version of enrich_chunks, using chain.abatch."""
+    max_concurrency, batch_size, cache = _settings(max_concurrency, batch_size, cache)
+    results, pending = _lookup(task, chunks, cache)
+    failures = []
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        outputs = await chain.abatch(
+            [chunks[i] for i in batch], config={"max_concurrency": max_concurrency}, return_exceptions=True
+        )
+        _store(task, chunks, batch, outputs, results, cache, failures)
+        print(f"---ENRICH {task.upper()}: {min(start + batch_size, len(pending))}/{len(pending)} GENERATED---")
+    return _finish(task, chunks, results, failures)
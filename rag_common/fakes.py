@@ -0,0 +1,309 @@
+"""
+Deterministic offline stand-ins for the chat model, embeddings and web search.
+
+They let every graph run without OpenAI, LangChain Hub or Tavily, with a
+configurable injected latency, so performance work can be measured reproducibly.
+Every output is derived from a hash of the input, so the same question always
+takes the same path through a graph.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import uuid
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, Field
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+_WORD_RE = re.compile(r"\w+")
+# Document reprs embed store metadata, whose key order is not stable across runs
+_METADATA_RE = re.compile(r"metadata=\{[^{}]*\}, ")
+
+
+def _stable_int(*parts):
+    """Process-independent integer hash of the given strings."""
+    digest = hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _tokens(text):
+    return _WORD_RE.findall(text.lower())
+
+
+def _message_text(message):
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers deterministically from its input.
+
+    Plain calls return a short answer built from words of the prompt. When tools
+    are bound (bind_tools, with_structured_output, bind(tools=...)) it returns a
+    tool call whose arguments are filled from the tool's JSON schema:
+    'binary_score' fields are 'yes' except for a hash-selected no_rate share of
+    inputs, enums pick a hash-selected value, and lists of objects get one item
+    per "[i]" marker in the prompt.
+    """
+
+    latency_ms: float = 0.0
+    token_latency_ms: float = 0.0
+    no_rate: float = 0.2
+    answer_words: int = 40
+    max_tool_rounds: int = 2
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    # ---- response construction ----
+
+    def _prompt(self, messages):
+        return _METADATA_RE.sub("", "\n".join(_message_text(m) for m in messages))
+
+    def _answer_text(self, prompt):
+        words = _tokens(prompt) or ["ok"]
+        start = _stable_int(prompt) % len(words)
+        picked = [words[(start + i) % len(words)] for i in range(self.answer_words)]
+        return " ".join(picked).capitalize() + "."
+
+    def _select_tool(self, messages, tools, tool_choice):
+        if isinstance(tool_choice, dict):
+            name = tool_choice.get("function", {}).get("name")
+            return next((t for t in tools if t["function"]["name"] == name), tools[0])
+        if isinstance(tool_choice, str) and tool_choice not in ("auto", "none"):
+            if tool_choice in ("any", "required"):
+                return tools[0]
+            return next((t for t in tools if t["function"]["name"] == tool_choice), tools[0])
+        if tool_choice == "none":
+            return None
+        # "auto": call a tool until enough tool results are in the conversation
+        tool_rounds = sum(isinstance(m, ToolMessage) for m in messages)
+        if isinstance(messages[-1], ToolMessage) or tool_rounds >= self.max_tool_rounds:
+            return None
+        return tools[0]
+
+    def _fill(self, schema, name, prompt, question, path):
+        if "enum" in schema:
+            return schema["enum"][_stable_int(prompt, path) % len(schema["enum"])]
+        kind = schema.get("type")
+        if kind == "object":
+            return {
+                key: self._fill(sub, key, prompt, question, f"{path}.{key}")
+                for key, sub in schema.get("properties", {}).items()
+            }
+        if kind == "array":
+            items = schema.get("items", {})
+            if items.get("type") == "object":
+                indices = [int(i) for i in re.findall(r"^\s*\[(\d+)\]", prompt, re.M)] or [0]
+                values = []
+                for index in indices:
+                    value = self._fill(items, name, prompt, question, f"{path}[{index}]")
+                    for key, sub in items.get("properties", {}).items():
+                        if sub.get("type") == "integer":
+                            value[key] = index
+                    values.append(value)
+                return values
+            return [f"{question} ({i + 1})" for i in range(4)]
+        if kind == "integer":
+            return 0
+        if kind == "number":
+            return 0.0
+        if kind == "boolean":
+            return True
+        if name == "binary_score":
+            return "no" if _stable_int(prompt, path) % 100 < self.no_rate * 100 else "yes"
+        if name in ("query", "question"):
+            return question
+        return self._answer_text(prompt)
+
+    def _respond(self, messages, tools=None, tool_choice=None):
+        prompt = self._prompt(messages)
+        humans = [m for m in messages if isinstance(m, HumanMessage)]
+        question = _message_text(humans[-1] if humans else messages[-1])
+        prompt_tokens = len(_tokens(prompt))
+
+        tool = self._select_tool(messages, tools, tool_choice) if tools else None
+        if tool is None:
+            content = self._answer_text(prompt)
+            message = AIMessage(content=content)
+        else:
+            function = tool["function"]
+            args = self._fill(function.get("parameters", {}), function["name"], prompt, question, function["name"])
+            call_id = f"call_{uuid.UUID(int=_stable_int(prompt, function['name']) << 64).hex[:24]}"
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": function["name"], "args": args, "id": call_id}],
+                additional_kwargs={
+                    "tool_calls": [
+                        {
+                            "id": call_id,
+                            "type": "function",
+                            "function": {"name": function["name"], "arguments": json.dumps(args)},
+                        }
+                    ]
+                },
+            )
+            content = json.dumps(args)
+
+        completion_tokens = len(_tokens(content))
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return message
+
+    # ---- BaseChatModel interface ----
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": dict(message.usage_metadata), "model_name": self._llm_type},
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": dict(message.usage_metadata), "model_name": self._llm_type},
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="", additional_kwargs=message.additional_kwargs,
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": 0}
+                    for c in message.tool_calls
+                ],
+            ))
+            return
+        for i, word in enumerate(message.content.split(" ")):
+            if i:
+                time.sleep(self.token_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="", additional_kwargs=message.additional_kwargs,
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": 0}
+                    for c in message.tool_calls
+                ],
+            ))
+            return
+        for i, word in enumerate(message.content.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Bag-of-words feature-hashing embeddings.
+
+    Deterministic across processes and, unlike random fake vectors, texts that
+    share words get similar vectors, so retrieval and similarity thresholds
+    behave sensibly offline.
+    """
+
+    def __init__(self, size=256, latency_ms=0.0):
+        self.size = size
+        self.latency_ms = latency_ms
+        self.model = f"hashing-embeddings-{size}"
+
+    def _embed(self, text):
+        vector = [0.0] * self.size
+        for token in _tokens(text):
+            h = _stable_int(token)
+            vector[h % self.size] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+
+
+class _SearchInput(BaseModel):
+    query: str = Field(description="search query to look up")
+
+
+class FakeWebSearchTool(BaseTool):
+    """
+    Fixture-backed replacement for TavilySearchResults.
+
+    Returns the k fixture results sharing the most words with the query, in the
+    same [{"url": ..., "content": ...}] shape Tavily returns.
+    """
+
+    name: str = "tavily_search_results_json"
+    description: str = "A search engine. Input should be a search query."
+    args_schema: type = _SearchInput
+    k: int = 3
+    latency_ms: float = 0.0
+    fixtures_path: str = os.path.join(FIXTURES_DIR, "web_search.json")
+    _results: Optional[List[dict]] = None
+
+    def _search(self, query):
+        if self._results is None:
+            with open(self.fixtures_path, encoding="utf-8") as f:
+                self._results = json.load(f)
+        query_tokens = set(_tokens(query))
+        ranked = sorted(
+            self._results,
+            key=lambda r: (-len(query_tokens & set(_tokens(r["content"]))), r["url"]),
+        )
+        return [dict(r) for r in ranked[: self.k]]
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> Any:
+        time.sleep(self.latency_ms / 1000)
+        return self._search(query)
+
+    async def _arun(self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> Any:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._search(query)
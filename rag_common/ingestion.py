@@ -0,0 +1,378 @@
+"""
+Incremental, idempotent ingestion into a vector store.
+
+A small SQLite manifest records, for every source (URL or file), the content
+hash of what was last ingested and the IDs of the chunks it produced. Chunk IDs
+are deterministic (source, content hash, occurrence of that text within the
+source), so an edit near the top of a page does not change the IDs of the
+chunks below it, and re-running ingestion:
+
+    * skips sources whose content hash is unchanged,
+    * upserts only the chunks of a changed source that did not exist before,
+      or that moved (so their "ordinal" metadata stays correct; their vectors
+      come from the embedding cache),
+    * deletes chunks that disappeared from a changed source,
+    * deletes every chunk of a source that is no longer in the source list.
+
+Sources are fetched concurrently and processed as they arrive; new chunks are
+embedded and upserted in fixed-size batches, so memory stays flat regardless of
+how large the corpus is. An optional keyword index (BM25Index) receives the same
+adds and deletes. A source that fails to load is reported and skipped; its
+chunks from earlier runs are kept.
+"""
+
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from rag_common.sqlite_cache import content_hash
+
+HTML_EXTENSIONS = (".html", ".htm")
+
+
+def chunk_id(source, text, occurrence=0):
+    """Deterministic ID of a chunk: its source, the hash of its text and which repeat of that text it is."""
+    return content_hash(f"{source}\x1f{content_hash(text)}\x1f{occurrence}")
+
+
+def chunk_ids(chunks):
+    """
+    IDs for a sequence of chunks, numbering repeats of the same text within a source.
+
+    Args:
+        chunks (iterable): (source, text) pairs, in source order
+
+    Returns:
+        list: One chunk_id per pair
+    """
+    occurrences = {}
+    ids = []
+    for source, text in chunks:
+        occurrence = occurrences.get((source, text), 0)
+        occurrences[(source, text)] = occurrence + 1
+        ids.append(chunk_id(source, text, occurrence))
+    return ids
+
+
+def source_hash(docs):
+    """Content hash of all documents loaded from one source."""
+    return content_hash("\x1e".join(doc.page_content for doc in docs))
+
+
+def expand_sources(sources):
+    """Replace every local directory in sources with the HTML files it contains."""
+    expanded = []
+    for source in sources:
+        if os.path.isdir(source):
+            for path in sorted(glob.glob(os.path.join(source, "**", "*"), recursive=True)):
+                if path.lower().endswith(HTML_EXTENSIONS):
+                    expanded.append(path)
+        else:
+            expanded.append(source)
+    return expanded
+
+
+def load_source(source):
+    """Load one source: a local HTML file, or a URL fetched with WebBaseLoader."""
+    if os.path.isfile(source):
+        from langchain_community.document_loaders import BSHTMLLoader
+
+        return BSHTMLLoader(source, bs_kwargs={"features": "html.parser"}).load()
+
+    from langchain_community.document_loaders import WebBaseLoader
+
+    return WebBaseLoader(source).load()
+
+
+def iter_loaded_sources(sources, max_workers=8, loader=load_source):
+    """
+    Fetch sources concurrently and yield (source, documents) as each one completes.
+
+    At most max_workers sources are in flight at any time, so only a bounded
+    number of loaded pages are held in memory. A source whose fetch fails is
+    reported on stderr and yielded with documents None, so the ingestor can
+    tell it apart from a source that was dropped from the list.
+
+    Args:
+        sources (list): URLs, HTML files or directories of HTML files
+        max_workers (int): Maximum number of concurrent fetches
+        loader (callable): Function loading a single source into documents
+    """
+    pending_sources = iter(expand_sources(sources))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+
+        def submit_next():
+            source = next(pending_sources, None)
+            if source is not None:
+                in_flight[executor.submit(loader, source)] = source
+
+        for _ in range(max_workers):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = in_flight.pop(future)
+                submit_next()
+                try:
+                    docs = future.result()
+                except Exception as e:
+                    print(f"Skipping {source}, failed to load: {type(e).__name__}: {e}", file=sys.stderr)
+                    docs = None
+                yield source, docs
+
+
+class IngestionManifest:
+    """Per-source content hash and chunk IDs, stored in a SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sources (
+                source TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, source):
+        """Return (content_hash, chunk_ids) for a source, or None if it was never ingested."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, chunk_ids FROM sources WHERE source = ?", (source,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, source, content_hash, chunk_ids):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (source, content_hash, chunk_ids, updated_at) VALUES (?, ?, ?, ?)",
+                (source, content_hash, json.dumps(chunk_ids), time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, source):
+        with self._lock:
+            self._conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+            self._conn.commit()
+
+    def sources(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT source FROM sources")]
+
+
+class IncrementalIngestor:
+    """
+    Keeps a vector store in sync with a list of sources.
+
+    Args:
+        vectorstore (VectorStore): Store supporting add_documents(ids=...) and delete(ids=...)
+        splitter (TextSplitter): Splitter used to chunk each source
+        manifest_path (str): SQLite file for the ingestion manifest
+        source_key (str): Metadata key that holds the source of a chunk
+        keyword_index (BM25Index): Optional keyword index kept in step with the vector store
+    """
+
+    def __init__(self, vectorstore, splitter, manifest_path, source_key="source", keyword_index=None):
+        self.vectorstore = vectorstore
+        self.splitter = splitter
+        self.manifest = IngestionManifest(manifest_path)
+        self.source_key = source_key
+        self.keyword_index = keyword_index
+
+    def _untracked_ids(self, source):
+        """IDs of chunks ingested for a source before it was tracked by the manifest."""
+        get = getattr(self.vectorstore, "get", None)
+        if get is None:
+            return []
+        return get(where={self.source_key: source}).get("ids", [])
+
+    def _add(self, ids, chunks):
+        self.vectorstore.add_documents(chunks, ids=ids)
+        if self.keyword_index is not None:
+            self.keyword_index.add(ids, [c.page_content for c in chunks])
+
+    def _delete(self, ids):
+        if ids:
+            self.vectorstore.delete(ids=list(ids))
+            if self.keyword_index is not None:
+                self.keyword_index.delete(list(ids))
+
+    def _backfill_keyword_index(self, batch_size):
+        """Index the chunks of a collection ingested before it had a keyword index."""
+        if self.keyword_index is None or len(self.keyword_index) or not self.manifest.sources():
+            return
+        offset = 0
+        while True:
+            page = self.vectorstore.get(include=["documents"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.keyword_index.add(page["ids"], page["documents"])
+            offset += len(page["ids"])
+
+    def _plan(self, source, docs):
+        """
+        Split a source and diff it against the manifest.
+
+        Returns:
+            tuple: (content hash, all chunk IDs, new or moved (id, chunk) pairs, stale IDs),
+            or None when the source is unchanged
+        """
+        new_hash = source_hash(docs)
+        previous = self.manifest.get(source)
+        if previous is not None and previous[0] == new_hash:
+            return None
+
+        old_ids = set(previous[1]) if previous is not None else set(self._untracked_ids(source))
+        old_positions = {i: ordinal for ordinal, i in enumerate(previous[1])} if previous is not None else {}
+
+        chunks = self.splitter.split_documents(docs)
+        for ordinal, chunk in enumerate(chunks):
+            chunk.metadata[self.source_key] = source
+            # Position within the source, used to expand hits into windows; not part of the ID
+            chunk.metadata["ordinal"] = ordinal
+        ids = chunk_ids((source, chunk.page_content) for chunk in chunks)
+
+        new_chunks = [
+            (i, c) for ordinal, (i, c) in enumerate(zip(ids, chunks))
+            if i not in old_ids or old_positions.get(i, ordinal) != ordinal
+        ]
+        stale_ids = old_ids - set(ids)
+        return new_hash, ids, new_chunks, stale_ids
+
+    def ingest_source(self, source, docs):
+        """
+        Bring one source up to date.
+
+        Args:
+            source (str): Source identifier (URL or file path)
+            docs (list): Documents loaded from the source
+
+        Returns:
+            dict: Number of chunks added and deleted, and whether the source was unchanged
+        """
+        plan = self._plan(source, docs)
+        if plan is None:
+            return {"added": 0, "deleted": 0, "unchanged": True}
+
+        new_hash, ids, new_chunks, stale_ids = plan
+        if new_chunks:
+            self._add([i for i, _ in new_chunks], [c for _, c in new_chunks])
+        self._delete(stale_ids)
+        self.manifest.set(source, new_hash, ids)
+        return {"added": len(new_chunks), "deleted": len(stale_ids), "unchanged": False}
+
+    def remove_source(self, source):
+        """Delete every chunk of a source and forget it."""
+        previous = self.manifest.get(source)
+        ids = previous[1] if previous is not None else []
+        self._delete(ids)
+        self.manifest.delete(source)
+        return len(ids)
+
+    def ingest_stream(self, loaded_sources, batch_size=64, remove_missing=True):
+        """
+        Bring the vector store in sync with a stream of loaded sources.
+
+        New chunks are buffered and upserted batch_size at a time. A source is
+        only recorded in the manifest once all of its chunks have been written,
+        so an interrupted run simply redoes the unfinished sources.
+
+        Args:
+            loaded_sources (iterable): (source, documents) pairs, e.g. from iter_loaded_sources;
+                documents None marks a source that failed to load and is left as it was
+            batch_size (int): Number of chunks embedded and upserted per call
+            remove_missing (bool): Delete chunks of sources that were not seen in the stream
+
+        Returns:
+            dict: Totals of added/deleted chunks and unchanged/updated/removed/failed sources
+        """
+        stats = {
+            "added": 0,
+            "deleted": 0,
+            "unchanged_sources": 0,
+            "updated_sources": 0,
+            "removed_sources": 0,
+            "failed_sources": 0,
+        }
+        seen_sources = set()
+        buffer = []  # (source, chunk id, chunk)
+        remaining = {}  # source -> (content hash, chunk IDs, chunks not yet written)
+        self._backfill_keyword_index(batch_size)
+
+        def flush():
+            if not buffer:
+                return
+            self._add([i for _, i, _ in buffer], [c for _, _, c in buffer])
+            stats["added"] += len(buffer)
+            for source, _, _ in buffer:
+                new_hash, ids, count = remaining[source]
+                remaining[source] = (new_hash, ids, count - 1)
+            buffer.clear()
+            for source, (new_hash, ids, count) in list(remaining.items()):
+                if count == 0:
+                    self.manifest.set(source, new_hash, ids)
+                    del remaining[source]
+
+        for source, docs in loaded_sources:
+            # A failed source still counts as seen, so remove_missing keeps its chunks
+            seen_sources.add(source)
+            if docs is None:
+                stats["failed_sources"] += 1
+                continue
+            plan = self._plan(source, docs)
+            if plan is None:
+                stats["unchanged_sources"] += 1
+                continue
+
+            new_hash, ids, new_chunks, stale_ids = plan
+            stats["updated_sources"] += 1
+            self._delete(stale_ids)
+            stats["deleted"] += len(stale_ids)
+
+            if not new_chunks:
+                self.manifest.set(source, new_hash, ids)
+                continue
+            remaining[source] = (new_hash, ids, len(new_chunks))
+            for i, chunk in new_chunks:
+                buffer.append((source, i, chunk))
+                if len(buffer) >= batch_size:
+                    flush()
+        flush()
+
+        if remove_missing:
+            for source in set(self.manifest.sources()) - seen_sources:
+                stats["deleted"] += self.remove_source(source)
+                stats["removed_sources"] += 1
+
+        if self.keyword_index is not None:
+            # Compile once per run, so retrievers load a ready index
+            self.keyword_index.build()
+        return stats
+
+    def ingest(self, source_docs, remove_missing=True, batch_size=64):
+        """
+        Bring the vector store in sync with a set of already loaded sources.
+
+        Args:
+            source_docs (dict): Source identifier -> documents loaded from it
+            remove_missing (bool): Delete chunks of sources that are not in source_docs
+            batch_size (int): Number of chunks embedded and upserted per call
+
+        Returns:
+            dict: Totals of added/deleted chunks and unchanged/updated/removed/failed sources
+        """
+        return self.ingest_stream(source_docs.items(), batch_size=batch_size, remove_missing=remove_missing)
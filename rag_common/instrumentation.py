@@ -0,0 +1,299 @@
+"""
+Per-node and per-edge instrumentation for compiled LangGraph apps.
+
+instrument(app) attaches a GraphInstrumentation callback handler to a compiled
+graph. Every node and conditional edge execution becomes one "step" event with:
+
+    wall_s         wall time of the step
+    self_s         wall time minus nested steps (a node's outgoing edges run inside it)
+    llm_calls      chat model / LLM calls made by the step
+    input_tokens, output_tokens
+    retries        retry attempts and failed model calls
+    state_bytes    approximate size of the state the step received
+    update_bytes   approximate size of the update the step returned
+    status         "ok" or "error"
+
+One "graph" event is emitted per invocation with the totals. Events go to the
+metrics registry (histograms of step time and state size, counters of calls,
+tokens and retries) and to any sinks, e.g. a JSON lines file.
+
+Configuration (environment variables):
+    RAG_INSTRUMENTATION   "false" makes instrument() return the app unchanged
+    RAG_METRICS_PATH      JSON lines file for step and graph events (unset: registry only)
+"""
+
+import json
+import os
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from rag_common.metrics import JsonLinesSink, get_registry
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def approx_size(value):
+    """Approximate serialized size of a state or update in bytes."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+def edge_function_names(app):
+    """Names of the conditional edge functions of a compiled graph."""
+    names = set()
+    builder = getattr(app, "builder", None)
+    for branches in getattr(builder, "branches", {}).values():
+        for name, branch in branches.items():
+            names.add(name)
+            names.add(getattr(branch.path, "name", name))
+    return names
+
+
+def _usage(response):
+    """(input_tokens, output_tokens) reported in an LLMResult."""
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not (input_tokens or output_tokens):
+        token_usage = (response.llm_output or {}).get("token_usage", {})
+        input_tokens = token_usage.get("prompt_tokens", token_usage.get("input_tokens", 0))
+        output_tokens = token_usage.get("completion_tokens", token_usage.get("output_tokens", 0))
+    return input_tokens, output_tokens
+
+
+class GraphInstrumentation(BaseCallbackHandler):
+    """
+    Callback handler turning LangGraph runs into step events.
+
+    Nodes are recognised by the "langgraph_node" metadata LangGraph attaches to
+    every run; conditional edges by the names of the graph's edge functions.
+    Model calls, tokens and retries are attributed to the closest enclosing step.
+
+    Args:
+        edge_names (set): Names of the conditional edge functions (see edge_function_names)
+        registry (MetricsRegistry): Registry receiving the metrics; None records events only
+        sinks (list): Callables receiving every event dict
+        graph_name (str): Label added to every metric and event
+        keep_events (bool): Also collect every event in self.events
+    """
+
+    # Keep callbacks in the caller's thread/event loop so timings stay accurate
+    run_inline = True
+
+    def __init__(self, edge_names=(), registry=None, sinks=(), graph_name="graph", keep_events=False):
+        self.edge_names = set(edge_names)
+        self.registry = registry
+        self.sinks = list(sinks)
+        self.graph_name = graph_name
+        self.events = [] if keep_events else None
+        self._lock = threading.Lock()
+        self._parents = {}  # run id -> parent run id
+        self._roots = {}  # run id -> root (graph invocation) run id
+        self._runs = {}  # root run id -> run ids of that invocation
+        self._steps = {}  # run id -> open step record
+        self._graphs = {}  # root run id -> open graph record
+
+    # ---- bookkeeping ----
+
+    def _step_for(self, run_id):
+        """Closest open step at or above a run."""
+        while run_id is not None:
+            if run_id in self._steps:
+                return self._steps[run_id]
+            run_id = self._parents.get(run_id)
+        return None
+
+    def _root_of(self, run_id):
+        return self._roots.get(run_id, run_id)
+
+    def _track(self, run_id, parent_run_id):
+        """Remember a run's parent and root; the root's run list makes forgetting an invocation O(its runs)."""
+        self._parents[run_id] = parent_run_id
+        root = self._roots.get(parent_run_id, run_id)
+        self._roots[run_id] = root
+        self._runs.setdefault(root, []).append(run_id)
+
+    def _emit(self, event):
+        if self.events is not None:
+            self.events.append(event)
+        for sink in self.sinks:
+            sink(event)
+
+    def _record_step(self, step):
+        labels = {"graph": self.graph_name, "step": step["name"], "kind": step["kind"]}
+        registry = self.registry
+        if registry is not None:
+            registry.observe("step_seconds", step["wall_s"], **labels)
+            registry.observe("step_self_seconds", step["self_s"], **labels)
+            registry.observe("state_bytes", step["state_bytes"], buckets=SIZE_BUCKETS, **labels)
+            registry.inc("step_runs", **labels)
+            registry.inc("llm_calls", step["llm_calls"], **labels)
+            registry.inc("input_tokens", step["input_tokens"], **labels)
+            registry.inc("output_tokens", step["output_tokens"], **labels)
+            registry.inc("retries", step["retries"], **labels)
+            if step["status"] != "ok":
+                registry.inc("step_errors", **labels)
+        self._emit(step)
+
+    # ---- chains: graph, nodes and edges ----
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        metadata = metadata or {}
+        with self._lock:
+            # The first run seen without a known parent is the graph invocation itself
+            is_graph = parent_run_id is None or parent_run_id not in self._parents
+            self._track(run_id, parent_run_id)
+            if is_graph:
+                self._graphs[run_id] = {
+                    "started": time.perf_counter(), "steps": 0, "llm_calls": 0,
+                    "input_tokens": 0, "output_tokens": 0, "retries": 0,
+                }
+                return
+
+            node = metadata.get("langgraph_node")
+            if node is None or node.startswith("__") and name == node:
+                # Not part of a step, or LangGraph's internal input/output nodes
+                return
+            if name == node:
+                kind = "node"
+            elif name in self.edge_names:
+                kind = "edge"
+            else:
+                return
+            enclosing = self._step_for(parent_run_id)
+            if enclosing is not None and enclosing["name"] == name:
+                # A node wrapping a runnable of the same name (e.g. RunnableLambda) is one step
+                return
+            self._steps[run_id] = {
+                "event": "step",
+                "graph": self.graph_name,
+                "kind": kind,
+                "name": name,
+                "node": node,
+                "step": metadata.get("langgraph_step"),
+                "started": time.perf_counter(),
+                "child_s": 0.0,
+                "llm_calls": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "retries": 0,
+                "state_bytes": approx_size(inputs),
+                "update_bytes": 0,
+            }
+
+    def _finish_chain(self, run_id, outputs, status):
+        with self._lock:
+            step = self._steps.pop(run_id, None)
+            graph = self._graphs.pop(run_id, None)
+            root = self._root_of(run_id)
+            parent_step = self._step_for(self._parents.get(run_id))
+            if step is None and graph is None:
+                return
+
+        now = time.perf_counter()
+        if step is not None:
+            step["wall_s"] = now - step.pop("started")
+            step["self_s"] = max(0.0, step["wall_s"] - step.pop("child_s"))
+            step["update_bytes"] = approx_size(outputs) if outputs is not None else 0
+            step["status"] = status
+            with self._lock:
+                if parent_step is not None:
+                    parent_step["child_s"] += step["wall_s"]
+                totals = self._graphs.get(root)
+                if totals is not None:
+                    totals["steps"] += 1
+                    for key in ("llm_calls", "input_tokens", "output_tokens", "retries"):
+                        totals[key] += step[key]
+            self._record_step(step)
+
+        if graph is not None:
+            with self._lock:
+                # Forget the runs of this invocation
+                for k in self._runs.pop(run_id, ()):
+                    self._parents.pop(k, None)
+                    self._roots.pop(k, None)
+            event = {"event": "graph", "graph": self.graph_name, "status": status,
+                     "wall_s": now - graph.pop("started"), **graph}
+            if self.registry is not None:
+                self.registry.observe("graph_seconds", event["wall_s"], graph=self.graph_name)
+                self.registry.inc("graph_runs", graph=self.graph_name, status=status)
+            self._emit(event)
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        self._finish_chain(run_id, outputs, "ok")
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._finish_chain(run_id, None, "error")
+
+    # ---- models ----
+
+    def _model_start(self, run_id, parent_run_id):
+        with self._lock:
+            self._track(run_id, parent_run_id)
+            step = self._step_for(parent_run_id)
+            if step is not None:
+                step["llm_calls"] += 1
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._model_start(run_id, parent_run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._model_start(run_id, parent_run_id)
+
+    def on_llm_end(self, response, *, run_id, parent_run_id=None, **kwargs):
+        input_tokens, output_tokens = _usage(response)
+        with self._lock:
+            step = self._step_for(run_id)
+            if step is not None:
+                step["input_tokens"] += input_tokens
+                step["output_tokens"] += output_tokens
+
+    def on_llm_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        # A failed model call is retried by the client or by with_retry
+        with self._lock:
+            step = self._step_for(run_id)
+            if step is not None:
+                step["retries"] += 1
+
+    def on_retry(self, retry_state, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            step = self._step_for(run_id)
+            if step is not None:
+                step["retries"] += 1
+
+
+def instrument(app, graph_name="graph", registry=None, sinks=None):
+    """
+    Attach step instrumentation to a compiled graph.
+
+    Args:
+        app (CompiledGraph): The compiled LangGraph app
+        graph_name (str): Label for the graph in metrics and events
+        registry (MetricsRegistry): Defaults to the process-wide registry
+        sinks (list): Event sinks; defaults to a JsonLinesSink when RAG_METRICS_PATH is set
+
+    Returns:
+        Runnable: The app with the handler bound to every invocation, or the app
+        itself when RAG_INSTRUMENTATION=false
+    """
+    if os.getenv("RAG_INSTRUMENTATION", "true").lower() != "true":
+        return app
+    if sinks is None:
+        path = os.getenv("RAG_METRICS_PATH")
+        sinks = [JsonLinesSink(path)] if path else []
+    handler = GraphInstrumentation(
+        edge_function_names(app),
+        registry=registry if registry is not None else get_registry(),
+        sinks=sinks,
+        graph_name=graph_name,
+    )
+    return app.with_config(callbacks=[handler])
@@ -0,0 +1,154 @@
+"""
+In-process metrics registry and structured event sinks.
+
+MetricsRegistry keeps labelled counters and histograms (fixed buckets plus the
+raw observations needed for percentiles) that can be read back at any time with
+snapshot(). JsonLinesSink appends one JSON object per event to a file, so events
+can be tailed or loaded into any log pipeline.
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+# Upper bounds in seconds, roughly log-spaced from 1 ms to 2 minutes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Observations kept per histogram for percentiles; older ones are dropped
+_MAX_SAMPLES = 10000
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class Histogram:
+    """Bucketed histogram that also keeps the most recent observations for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._samples = []
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self._samples.append(value)
+        if len(self._samples) > _MAX_SAMPLES:
+            del self._samples[: len(self._samples) - _MAX_SAMPLES]
+
+    def percentile(self, q):
+        """Nearest-rank percentile (q in 0..100) of the retained observations."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(q / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                **{str(bound): n for bound, n in zip(self.buckets, self.bucket_counts)},
+                "+Inf": self.bucket_counts[-1],
+            },
+        }
+
+
+class MetricsRegistry:
+    """
+    Thread-safe collection of labelled counters and histograms.
+
+    Example:
+        registry.inc("llm_calls", node="generate")
+        registry.observe("step_seconds", 0.42, node="generate")
+        registry.snapshot()["histograms"]["step_seconds"]
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def histogram(self, name, **labels):
+        with self._lock:
+            return self._histograms.get((name, _label_key(labels)))
+
+    def snapshot(self):
+        """
+        Current values of every metric.
+
+        Returns:
+            dict: {"counters": {name: [{"labels": ..., "value": ...}]},
+                   "histograms": {name: [{"labels": ..., **summary}]}}
+        """
+        with self._lock:
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            histograms = {}
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                histograms.setdefault(name, []).append({"labels": dict(labels), **histogram.summary()})
+        return {"counters": counters, "histograms": histograms}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class JsonLinesSink:
+    """Appends events as JSON lines to a file (created along with its directory)."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps({"ts": time.time(), **event}, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    """Process-wide metrics registry."""
+    return _registry
@@ -0,0 +1,196 @@
+"""
+Micro-batching of chain calls across concurrent graph runs.
+
+MicroBatcher collects the calls to one chain that arrive within a short window
+(MICRO_BATCH_WINDOW_MS after the first one) and runs them as a single
+.batch / .abatch call. Each caller gets its own result or exception back. A
+batch is sent early once it holds MICRO_BATCH_MAX_SIZE calls. Every caller's
+config is passed through, so callbacks, tracing and the graph instrumentation
+still see each call under its own run.
+
+Sync callers (threads) and async callers (an event loop) are batched
+separately: threads with a timer thread, coroutines with the loop's call_later.
+
+Batching helps when the chain can serve a batch cheaply: a self-hosted or
+batch-capable endpoint, or a provider limit on concurrent requests
+(MICRO_BATCH_MAX_CONCURRENCY caps the calls each batch sends at once). For
+chat APIs that take one prompt per request, the window only adds latency. For
+that reason batching is off unless MICRO_BATCHING=true.
+
+Metrics (rag_common.metrics registry, label batcher=<name>):
+    microbatch_wait_seconds   time a call waited before its batch was sent
+    microbatch_size           calls per batch
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+from langchain_core.runnables import RunnableLambda
+
+from rag_common.metrics import get_registry
+
+# Calls per batch: 1, 2, 4, ... 256
+BATCH_SIZE_BUCKETS = tuple(2 ** i for i in range(9))
+
+
+def micro_batching_enabled():
+    return os.getenv("MICRO_BATCHING", "false").lower() == "true"
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent calls of one runnable into .batch / .abatch calls.
+
+    Args:
+        runnable (Runnable): The chain to batch
+        name (str): Label of the metrics
+        window_ms (float): How long the first call of a batch waits for others (MICRO_BATCH_WINDOW_MS)
+        max_batch_size (int): Calls that trigger sending a batch before the window ends (MICRO_BATCH_MAX_SIZE)
+        max_concurrency (int): Calls of one batch running at once (MICRO_BATCH_MAX_CONCURRENCY)
+        registry (MetricsRegistry): Defaults to the process-wide registry
+    """
+
+    def __init__(self, runnable, name, window_ms=None, max_batch_size=None, max_concurrency=None, registry=None):
+        self.runnable = runnable
+        self.name = name
+        self.window_s = (window_ms if window_ms is not None else float(os.getenv("MICRO_BATCH_WINDOW_MS", "5"))) / 1000
+        self.max_batch_size = max_batch_size or int(os.getenv("MICRO_BATCH_MAX_SIZE", "16"))
+        self.max_concurrency = max_concurrency or int(os.getenv("MICRO_BATCH_MAX_CONCURRENCY", "16"))
+        self.registry = registry if registry is not None else get_registry()
+        self._lock = threading.Lock()
+        self._pending = []  # (inputs, config, Future, enqueued) of the open sync batch
+        self._timer = None
+        # Keyed weakly by event loop, so the batches of a finished asyncio.run are dropped with it
+        self._apending = weakref.WeakKeyDictionary()  # event loop -> calls of its open async batch
+        self._atimers = weakref.WeakKeyDictionary()  # event loop -> TimerHandle of its open async batch
+        self._tasks = set()  # running async batches (kept referenced until done)
+
+    # ---- shared ----
+
+    def _batch_args(self, calls):
+        now = time.perf_counter()
+        for _, _, _, enqueued in calls:
+            self.registry.observe("microbatch_wait_seconds", now - enqueued, batcher=self.name)
+        self.registry.observe("microbatch_size", len(calls), buckets=BATCH_SIZE_BUCKETS, batcher=self.name)
+        inputs = [call[0] for call in calls]
+        configs = [{**(call[1] or {}), "max_concurrency": self.max_concurrency} for call in calls]
+        return inputs, configs
+
+    @staticmethod
+    def _resolve(calls, results):
+        for (_, _, future, _), result in zip(calls, results):
+            if future.done():
+                # The caller gave up (e.g. cancelled by a request timeout)
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    # ---- threads ----
+
+    def _take(self):
+        with self._lock:
+            calls, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return calls
+
+    def _flush(self):
+        calls = self._take()
+        if not calls:
+            return
+        inputs, configs = self._batch_args(calls)
+        try:
+            results = self.runnable.batch(inputs, config=configs, return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(calls)
+        self._resolve(calls, results)
+
+    def submit(self, inputs, config=None):
+        """Queue one call; returns a concurrent.futures.Future with its result."""
+        future = Future()
+        with self._lock:
+            self._pending.append((inputs, config, future, time.perf_counter()))
+            full = len(self._pending) >= self.max_batch_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.window_s, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            # The call that fills the batch sends it, in its own thread
+            self._flush()
+        return future
+
+    def invoke(self, inputs, config=None):
+        return self.submit(inputs, config).result()
+
+    # ---- event loop ----
+
+    def _atake(self, loop):
+        with self._lock:
+            timer = self._atimers.pop(loop, None)
+            calls = self._apending.pop(loop, [])
+        if timer is not None:
+            timer.cancel()
+        return calls
+
+    def _aflush(self, loop):
+        calls = self._atake(loop)
+        if not calls:
+            return
+        task = loop.create_task(self._arun(calls))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _arun(self, calls):
+        inputs, configs = self._batch_args(calls)
+        try:
+            results = await self.runnable.abatch(inputs, config=configs, return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(calls)
+        self._resolve(calls, results)
+
+    async def ainvoke(self, inputs, config=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            calls = self._apending.setdefault(loop, [])
+            calls.append((inputs, config, future, time.perf_counter()))
+            full = len(calls) >= self.max_batch_size
+            if not full and loop not in self._atimers:
+                self._atimers[loop] = loop.call_later(self.window_s, self._aflush, loop)
+        if full:
+            self._aflush(loop)
+        return await future
+
+
+def with_micro_batching(chain, name, **kwargs):
+    """
+    Wrap a chain so concurrent calls are sent to it in micro-batches.
+
+    Args:
+        chain (Runnable): The chain to batch
+        name (str): Label of the batcher's metrics, e.g. "retrieval_grader"
+        **kwargs: MicroBatcher options (window_ms, max_batch_size, max_concurrency)
+
+    Returns:
+        Runnable: Drop-in replacement for chain (invoke and ainvoke), or chain
+        itself when MICRO_BATCHING is not "true"
+    """
+    if not micro_batching_enabled():
+        return chain
+    batcher = MicroBatcher(chain, name, **kwargs)
+
+    def invoke(inputs, config):
+        return batcher.invoke(inputs, config)
+
+    async def ainvoke(inputs, config):
+        return await batcher.ainvoke(inputs, config)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"batched_{name}")
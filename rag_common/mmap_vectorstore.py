@@ -0,0 +1,310 @@
+"""
+Memory-mapped, quantized local vector store.
+
+Everything lives in one directory of flat files:
+
+    header.json     dimension, code type, number of committed rows and size of ids.jsonl
+    vectors.bin     (rows, dim) float16 codes, or int8 codes with ...
+    scales.bin      ... one float32 scale per row (int8 only)
+    records.bin     JSON records (id, text, metadata) back to back
+    offsets.bin     int64 end offset of every record in records.bin
+    deleted.bin     one byte per row, 1 when the row was deleted
+    ids.jsonl       row IDs, one per line
+
+Vectors are unit-normalized before they are encoded, so the score is cosine
+similarity. A search maps the committed rows read-only and scores them block by
+block with NumPy matrix products; worker processes opening the same directory
+share one copy of the files in the OS page cache instead of each holding float32
+vectors and pickled documents in RAM.
+
+Files are only appended to, and header.json is replaced last, so readers never
+see a partially written row and an interrupted add is discarded on the next
+write. One process should write at a time.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from rag_common.sqlite_cache import content_hash
+
+DTYPES = {"float16": np.float16, "int8": np.int8}
+
+# Rows widened to float32 per matrix product
+CONVERT_ROWS = 512
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def encode(vectors, dtype):
+    """Quantize unit vectors: (codes, per-row scales or None)."""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Vector store backed by memory-mapped files in a directory.
+
+    Args:
+        directory (str): Directory holding the store (created if missing)
+        embedding (Embeddings): Embedding model
+        dtype (str): "int8" (with a float32 scale per vector) or "float16"; fixed when the store is created.
+            int8 is half the size and, since NumPy widens float16 slowly, several times faster to scan
+        block_rows (int): Rows scored between top-k merges during a search
+    """
+
+    def __init__(self, directory, embedding, dtype="int8", block_rows=16384):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+        self.directory = directory
+        self._embedding = embedding
+        self.block_rows = block_rows
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._view = None  # mapped arrays and ID -> row map of the committed rows
+        header = self._header()
+        self.dtype = header.get("dtype", dtype)
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    # ---- files ----
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _header(self):
+        try:
+            with open(self._path("header.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"count": 0}
+
+    def _write_header(self, header):
+        tmp = self._path("header.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp, self._path("header.json"))
+
+    def _load(self):
+        """Read-only views of the committed rows, re-mapped when header.json changed."""
+        try:
+            mtime = os.stat(self._path("header.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        view = self._view
+        if view is not None and view["mtime"] == mtime:
+            return view
+        with self._lock:
+            header = self._header()
+            count, dim = header["count"], header.get("dim")
+            if not count:
+                return None
+            view = {
+                "mtime": mtime,
+                "count": count,
+                "vectors": np.memmap(self._path("vectors.bin"), dtype=DTYPES[header["dtype"]], mode="r", shape=(count, dim)),
+                "scales": np.memmap(self._path("scales.bin"), dtype=np.float32, mode="r", shape=(count,))
+                if header["dtype"] == "int8" else None,
+                "offsets": np.memmap(self._path("offsets.bin"), dtype=np.int64, mode="r", shape=(count,)),
+                "deleted": np.memmap(self._path("deleted.bin"), dtype=np.uint8, mode="r", shape=(count,)),
+            }
+            view["records"] = np.memmap(self._path("records.bin"), dtype=np.uint8, mode="r", shape=(int(view["offsets"][-1]),))
+            with open(self._path("ids.jsonl"), encoding="utf-8") as f:
+                view["rows"] = {json.loads(line): row for row, line in zip(range(count), f)}
+            self._view = view
+        return view
+
+    def _truncate(self, header):
+        """Drop anything an interrupted add wrote past the committed rows."""
+        count, dim = header.get("count", 0), header.get("dim", 0)
+        itemsize = np.dtype(DTYPES[self.dtype]).itemsize
+        sizes = {
+            "vectors.bin": count * dim * itemsize,
+            "scales.bin": count * 4 if self.dtype == "int8" else 0,
+            "offsets.bin": count * 8,
+            "deleted.bin": count,
+        }
+        sizes["records.bin"] = 0
+        if count:
+            last = np.fromfile(self._path("offsets.bin"), dtype=np.int64, count=1, offset=(count - 1) * 8)
+            sizes["records.bin"] = int(last[0])
+        sizes["ids.jsonl"] = header.get("ids_bytes", 0)
+        for name, size in sizes.items():
+            with open(self._path(name), "ab") as f:
+                f.truncate(size)
+
+    def _read_record(self, view, row):
+        start = int(view["offsets"][row - 1]) if row else 0
+        record = json.loads(view["records"][start:int(view["offsets"][row])].tobytes())
+        return Document(page_content=record["text"], metadata=record["metadata"], id=record["id"])
+
+    # ---- writes ----
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """
+        Embed and append texts; IDs already in the store (and not deleted) are skipped.
+
+        Args:
+            texts (list): Texts to add
+            metadatas (list): Metadata dict per text
+            ids (list): IDs per text (default: content hash of the text)
+
+        Returns:
+            list: The IDs of all given texts
+        """
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [content_hash(t) for t in texts]
+        view = self._load()
+        rows = view["rows"] if view is not None else {}
+        seen, new = set(), []
+        for i, id_ in enumerate(ids):
+            row = rows.get(id_)
+            if (row is None or view["deleted"][row]) and id_ not in seen:
+                seen.add(id_)
+                new.append(i)
+        if not new:
+            return ids
+
+        vectors = _normalize(self._embedding.embed_documents([texts[i] for i in new]))
+        codes, scales = encode(vectors, self.dtype)
+        header = self._header()
+        with self._lock:
+            self._truncate(header)
+            count = header.get("count", 0)
+            end = int(np.fromfile(self._path("offsets.bin"), dtype=np.int64, count=1, offset=(count - 1) * 8)[0]) if count else 0
+            offsets = []
+            with open(self._path("records.bin"), "ab") as f:
+                for i in new:
+                    record = json.dumps({"id": ids[i], "text": texts[i], "metadata": metadatas[i]}).encode("utf-8")
+                    f.write(record)
+                    end += len(record)
+                    offsets.append(end)
+            with open(self._path("vectors.bin"), "ab") as f:
+                f.write(codes.tobytes())
+            if scales is not None:
+                with open(self._path("scales.bin"), "ab") as f:
+                    f.write(scales.tobytes())
+            with open(self._path("offsets.bin"), "ab") as f:
+                f.write(np.asarray(offsets, dtype=np.int64).tobytes())
+            with open(self._path("deleted.bin"), "ab") as f:
+                f.write(bytes(len(new)))
+            with open(self._path("ids.jsonl"), "ab") as f:
+                f.write("".join(json.dumps(ids[i]) + "\n" for i in new).encode("utf-8"))
+                ids_bytes = f.tell()
+            # Commit point
+            self._write_header({
+                "count": count + len(new), "dim": vectors.shape[1], "dtype": self.dtype, "ids_bytes": ids_bytes,
+            })
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        """Mark rows as deleted (their space is not reclaimed)."""
+        view = self._load()
+        if view is None or not ids:
+            return True
+        rows = [view["rows"][i] for i in ids if i in view["rows"]]
+        if rows:
+            deleted = np.memmap(self._path("deleted.bin"), dtype=np.uint8, mode="r+", shape=(view["count"],))
+            deleted[rows] = 1
+            deleted.flush()
+        return True
+
+    # ---- search ----
+
+    def search_vectors(self, queries, k=4):
+        """
+        Top-k rows for a batch of query vectors.
+
+        Args:
+            queries (ndarray): (m, dim) query vectors
+            k (int): Results per query
+
+        Returns:
+            tuple: (scores, rows), each (m, k'), best first; k' <= k
+        """
+        view = self._load()
+        queries = _normalize(np.atleast_2d(queries))
+        if view is None:
+            return np.empty((len(queries), 0)), np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        # Codes are widened to float32 a few rows at a time, in a buffer that stays in cache
+        buffer = np.empty((CONVERT_ROWS, queries.shape[1]), dtype=np.float32)
+        for start in range(0, view["count"], self.block_rows):
+            end = min(start + self.block_rows, view["count"])
+            scores = np.empty((len(queries), end - start), dtype=np.float32)
+            for sub in range(start, end, CONVERT_ROWS):
+                rows = min(CONVERT_ROWS, end - sub)
+                np.copyto(buffer[:rows], view["vectors"][sub:sub + rows])
+                scores[:, sub - start:sub - start + rows] = queries @ buffer[:rows].T
+            if view["scales"] is not None:
+                scores *= view["scales"][start:end]
+            scores[:, view["deleted"][start:end].astype(bool)] = -np.inf
+            # Keep the k best of the previous blocks and this one
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        view = self._load()
+        scores, rows = self.search_vectors(np.asarray([embedding]), k)
+        return [
+            (self._read_record(view, int(row)), float(score))
+            for score, row in zip(scores[0], rows[0])
+            if score > -np.inf
+        ]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] -> [0, 1]
+        return lambda score: (score + 1) / 2
+
+    def get_by_ids(self, ids):
+        view = self._load()
+        if view is None:
+            return []
+        return [
+            self._read_record(view, view["rows"][i])
+            for i in ids
+            if i in view["rows"] and not view["deleted"][view["rows"][i]]
+        ]
+
+    def __len__(self):
+        view = self._load()
+        return 0 if view is None else int(view["count"] - view["deleted"].sum())
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, directory="./mmap_store", dtype="int8", **kwargs):
+        store = cls(directory, embedding, dtype=dtype, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,209 @@
+"""
+Versioned local prompt store.
+
+Prompts ship with the repository as serialized LangChain prompt templates
+under rag_common/prompts/<owner>/<name>/v<N>.json, so loading one needs no
+network access. A file is never edited once committed; a changed prompt is
+a new version. load_prompt() returns the highest version, or the version
+pinned with PROMPT_VERSIONS, e.g. "rlm/rag-prompt=1". Each loaded prompt is
+cached in-process and every later call returns the same object.
+
+Refreshing from LangChain Hub is an explicit, optional step. It writes a new
+version only when the hub copy differs from the latest stored one:
+
+    python -m rag_common.prompt_store sync rlm/rag-prompt
+    python -m rag_common.prompt_store sync rlm/rag-prompt:50442af1   # a specific hub commit
+    python -m rag_common.prompt_store list
+
+Configuration (environment variables):
+    PROMPT_STORE_DIR   store directory (default: rag_common/prompts)
+    PROMPT_VERSIONS    comma-separated name=version pins
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import warnings
+
+from rag_common.sqlite_cache import content_hash
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+_VERSION_FILE = re.compile(r"^v(\d+)\.json$")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def store_dir():
+    return os.getenv("PROMPT_STORE_DIR", DEFAULT_STORE_DIR)
+
+
+def _prompt_dir(name, directory=None):
+    if not re.fullmatch(r"[\w.-]+/[\w.-]+", name):
+        raise ValueError(f"Prompt names have the form owner/name, got {name!r}")
+    return os.path.join(directory or store_dir(), *name.split("/"))
+
+
+def versions(name, directory=None):
+    """Stored versions of a prompt, in ascending order."""
+    path = _prompt_dir(name, directory)
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(m.group(1)) for m in map(_VERSION_FILE.match, os.listdir(path)) if m)
+
+
+def pinned_version(name):
+    """Version of name pinned in PROMPT_VERSIONS, or None."""
+    for pin in os.getenv("PROMPT_VERSIONS", "").split(","):
+        pinned_name, _, version = pin.strip().partition("=")
+        if pinned_name == name and version:
+            return int(version)
+    return None
+
+
+def read_record(name, version=None, directory=None):
+    """
+    The stored record of a prompt version.
+
+    Args:
+        name (str): Prompt name, e.g. "rlm/rag-prompt"
+        version (int): Version to read; defaults to the pinned or latest one
+        directory (str): Store directory; defaults to PROMPT_STORE_DIR
+
+    Returns:
+        dict: {"name", "version", "source", "created_at", "sha256", "prompt" (serialized template)}
+    """
+    available = versions(name, directory)
+    if version is None:
+        version = pinned_version(name) or (available[-1] if available else None)
+    if version is None or version not in available:
+        raise FileNotFoundError(
+            f"Prompt {name!r} version {version} is not in the prompt store {directory or store_dir()}; "
+            f"stored versions: {available or 'none'}. Add it with: python -m rag_common.prompt_store sync {name}"
+        )
+    with open(os.path.join(_prompt_dir(name, directory), f"v{version}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _deserialize(serialized):
+    from langchain_core.load import load
+
+    with warnings.catch_warnings():
+        # load() is marked beta; the stored files are written by this module
+        warnings.simplefilter("ignore")
+        return load(serialized)
+
+
+def load_prompt(name, version=None):
+    """
+    Prompt template from the local store, cached per process.
+
+    Args:
+        name (str): Prompt name, e.g. "rlm/rag-prompt"
+        version (int): Version to load; defaults to the pinned (PROMPT_VERSIONS) or latest one
+
+    Returns:
+        BasePromptTemplate: The prompt
+    """
+    if version is None:
+        version = pinned_version(name)
+    key = (store_dir(), name, version)
+    prompt = _cache.get(key)
+    if prompt is None:
+        with _cache_lock:
+            prompt = _cache.get(key)
+            if prompt is None:
+                prompt = _cache[key] = _deserialize(read_record(name, version)["prompt"])
+    return prompt
+
+
+def _fingerprint(serialized):
+    return content_hash(json.dumps(serialized, sort_keys=True))
+
+
+def save_prompt(name, prompt, source, directory=None):
+    """
+    Store prompt as a new version of name, unless it equals the latest stored version.
+
+    Args:
+        name (str): Prompt name, e.g. "rlm/rag-prompt"
+        prompt (BasePromptTemplate): The prompt to store
+        source (str): Where it came from, e.g. "hub:rlm/rag-prompt"
+        directory (str): Store directory; defaults to PROMPT_STORE_DIR
+
+    Returns:
+        tuple: (version, created) - the version holding the prompt, and whether it was written now
+    """
+    from langchain_core.load import dumpd
+
+    serialized = dumpd(prompt)
+    sha256 = _fingerprint(serialized)
+    available = versions(name, directory)
+    if available and read_record(name, available[-1], directory)["sha256"] == sha256:
+        return available[-1], False
+
+    version = (available[-1] if available else 0) + 1
+    path = _prompt_dir(name, directory)
+    os.makedirs(path, exist_ok=True)
+    record = {
+        "name": name,
+        "version": version,
+        "source": source,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sha256": sha256,
+        "prompt": serialized,
+    }
+    tmp_path = os.path.join(path, f".v{version}.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, os.path.join(path, f"v{version}.json"))
+    return version, True
+
+
+def sync(name, directory=None):
+    """
+    Pull a prompt from LangChain Hub into the store (needs network access and the langchain package).
+
+    Args:
+        name (str): Hub reference, "owner/name" or "owner/name:commit"
+
+    Returns:
+        tuple: (version, created) as returned by save_prompt
+    """
+    from langchain import hub
+
+    prompt = hub.pull(name)
+    return save_prompt(name.split(":")[0], prompt, source=f"hub:{name}", directory=directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Versioned local prompt store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sync_parser = commands.add_parser("sync", help="Refresh prompts from LangChain Hub")
+    sync_parser.add_argument("names", nargs="+", help="owner/name or owner/name:commit")
+    commands.add_parser("list", help="Show the stored prompts and versions")
+    args = parser.parse_args(argv)
+
+    if args.command == "sync":
+        for name in args.names:
+            version, created = sync(name)
+            print(f"{name}: {'stored as' if created else 'unchanged, latest is'} v{version}")
+        return
+
+    root = store_dir()
+    for owner in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        for prompt_name in sorted(os.listdir(os.path.join(root, owner))):
+            name = f"{owner}/{prompt_name}"
+            stored = versions(name)
+            if stored:
+                latest = read_record(name, stored[-1])
+                print(f"{name}: v{', v'.join(map(str, stored))} (latest from {latest['source']}, {latest['created_at']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Pluggable model providers for the graph variants.
+
+RAG_PROVIDER=openai (default) returns ChatOpenAI, OpenAIEmbeddings and Tavily.
+RAG_PROVIDER=fake returns the deterministic offline stand-ins from
+rag_common.fakes, so graphs run without network access. The RAG prompt comes
+from the local prompt store (rag_common.prompt_store) for every provider.
+
+Injected latency for the fakes (milliseconds):
+    FAKE_LLM_LATENCY_MS, FAKE_LLM_TOKEN_LATENCY_MS,
+    FAKE_EMBEDDING_LATENCY_MS, FAKE_SEARCH_LATENCY_MS
+FAKE_LLM_NO_RATE sets the share of 'no' verdicts returned by fake graders.
+
+OpenAI chat and embedding clients share pooled httpx clients (RAG_HTTP_POOL,
+RAG_HTTP_MAX_CONNECTIONS, RAG_HTTP_MAX_KEEPALIVE, RAG_HTTP_TIMEOUT), so
+connections are kept alive and reused across models and requests: one sync
+client per process and one async connection pool per event loop.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+
+_http_clients = None
+_http_clients_lock = threading.Lock()
+
+
+def provider_name():
+    return os.getenv("RAG_PROVIDER", "openai").lower()
+
+
+def _loop_local_async_client(**client_kwargs):
+    """
+    httpx.AsyncClient that sends every request through a pooled client of the running event loop.
+
+    httpx connections belong to the loop that opened them, so one AsyncClient
+    cannot serve two asyncio.run calls. The models are built once per process,
+    so they get this client and each loop gets its own pool on first use; a
+    pool is dropped together with its loop.
+    """
+    import httpx
+
+    class LoopLocalAsyncClient(httpx.AsyncClient):
+        def __init__(self):
+            super().__init__(**client_kwargs)
+            self._loop_clients = weakref.WeakKeyDictionary()
+            self._loop_clients_lock = threading.Lock()
+
+        def _loop_client(self):
+            loop = asyncio.get_running_loop()
+            with self._loop_clients_lock:
+                client = self._loop_clients.get(loop)
+                if client is None:
+                    client = self._loop_clients[loop] = httpx.AsyncClient(**client_kwargs)
+            return client
+
+        async def send(self, request, **kwargs):
+            return await self._loop_client().send(request, **kwargs)
+
+        async def aclose(self):
+            # Only the pool of the running loop can be closed from here
+            with self._loop_clients_lock:
+                client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+            if client is not None:
+                await client.aclose()
+
+    return LoopLocalAsyncClient()
+
+
+def get_http_clients():
+    """
+    Pooled httpx clients for the OpenAI models.
+
+    Returns:
+        dict: {"http_client": httpx.Client, "http_async_client": httpx.AsyncClient},
+        or {} when RAG_HTTP_POOL=false (each model then creates its own clients).
+        The sync client is process-wide; the async one keeps a pool per event loop.
+    """
+    global _http_clients
+    if os.getenv("RAG_HTTP_POOL", "true").lower() != "true":
+        return {}
+    with _http_clients_lock:
+        if _http_clients is None:
+            import httpx
+
+            client_kwargs = {
+                "limits": httpx.Limits(
+                    max_connections=int(os.getenv("RAG_HTTP_MAX_CONNECTIONS", "100")),
+                    max_keepalive_connections=int(os.getenv("RAG_HTTP_MAX_KEEPALIVE", "20")),
+                ),
+                # Default for requests that do not set their own; the OpenAI client sets one per request
+                "timeout": httpx.Timeout(float(os.getenv("RAG_HTTP_TIMEOUT", "60")), connect=5.0),
+            }
+            _http_clients = {
+                "http_client": httpx.Client(**client_kwargs),
+                "http_async_client": _loop_local_async_client(**client_kwargs),
+            }
+    return _http_clients
+
+
+def _latency(name):
+    return float(os.getenv(name, "0"))
+
+
+def get_chat_model(**kwargs):
+    """Chat model for the configured provider; kwargs are passed to ChatOpenAI."""
+    if provider_name() == "fake":
+        from rag_common.fakes import FakeChatModel
+
+        return FakeChatModel(
+            latency_ms=_latency("FAKE_LLM_LATENCY_MS"),
+            token_latency_ms=_latency("FAKE_LLM_TOKEN_LATENCY_MS"),
+            no_rate=float(os.getenv("FAKE_LLM_NO_RATE", "0.2")),
+        )
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(**{**get_http_clients(), **kwargs})
+
+
+def get_base_embeddings():
+    """Uncached embedding model for the configured provider (see embedding_cache.get_embeddings)."""
+    if provider_name() == "fake":
+        from rag_common.fakes import HashingEmbeddings
+
+        return HashingEmbeddings(latency_ms=_latency("FAKE_EMBEDDING_LATENCY_MS"))
+
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(**get_http_clients())
+
+
+def get_web_search_tool(k=3):
+    """Web search tool for the configured provider."""
+    if provider_name() == "fake":
+        from rag_common.fakes import FakeWebSearchTool
+
+        return FakeWebSearchTool(k=k, latency_ms=_latency("FAKE_SEARCH_LATENCY_MS"))
+
+    from langchain_community.tools.tavily_search import TavilySearchResults
+
+    return TavilySearchResults(k=k)
+
+
+def get_rag_prompt():
+    """The "rlm/rag-prompt" prompt from the local prompt store (refresh it with `python -m rag_common.prompt_store sync rlm/rag-prompt`)."""
+    from rag_common.prompt_store import load_prompt
+
+    return load_prompt("rlm/rag-prompt")
@@ -0,0 +1,337 @@
+"""
+Cheap local relevance scoring in front of the LLM retrieval grader.
+
+Every retrieved chunk gets a combined score in [0, 1] from:
+
+    * cosine similarity of the question and chunk embeddings (both normally
+      served by the embedding cache, since ingestion embedded the chunk and
+      retrieval embedded the question),
+    * BM25 keyword overlap between the question and the chunk, computed over
+      the retrieved candidates and normalized by the best achievable score,
+    * optionally a small cross-encoder (PREFILTER_CROSS_ENCODER).
+
+Chunks scoring at least the accept threshold are graded relevant, chunks at or
+below the reject threshold irrelevant, and only the band in between is sent to
+the LLM grader.
+
+Thresholds are calibrated from labelled (question, document, relevant, score)
+rows: set PREFILTER_LOG_PATH to record the LLM grader's verdicts on the
+ambiguous band (before calibration everything is sent to the LLM, so all rows
+are logged), then run
+
+    python -m rag_common.relevance_prefilter labelled.jsonl --target-precision 0.95
+
+which writes the thresholds to PREFILTER_THRESHOLDS_PATH. Calibration uses the
+score each row was logged with. That score was computed among the retrieved
+candidates of its question (BM25 IDF and length normalization depend on the
+candidate set), so it is on the same scale as the runtime scores the
+thresholds are applied to; re-scoring a row on its own would not be.
+
+The prefilter is off unless RELEVANCE_PREFILTER=true. Even then it decides
+nothing locally until thresholds exist: without a calibrated thresholds file or
+explicit PREFILTER_ACCEPT / PREFILTER_REJECT, every chunk still goes to the LLM
+grader (and is logged when PREFILTER_LOG_PATH is set). The combined score is
+not comparable across embedding models (unrelated texts have a cosine around
+0.7 with OpenAI embeddings), so fixed default thresholds would silently change
+the grading.
+
+Configuration (environment variables):
+    RELEVANCE_PREFILTER          "true" enables the prefilter (default "false")
+    PREFILTER_ACCEPT             accept threshold (default: calibrated, else none)
+    PREFILTER_REJECT             reject threshold (default: calibrated, else none)
+    PREFILTER_THRESHOLDS_PATH    calibrated thresholds JSON (default ./.rag_cache/prefilter_thresholds.json),
+                                 used unless PREFILTER_ACCEPT / PREFILTER_REJECT are set
+    PREFILTER_CROSS_ENCODER      HuggingFace cross-encoder model name (unset: not used)
+    PREFILTER_LOG_PATH           JSON lines file receiving LLM-graded rows for calibration
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+from collections import Counter
+
+from rag_common.bm25_index import keyword_tokens
+from rag_common.metrics import JsonLinesSink, get_registry
+
+DEFAULT_WEIGHTS = {"cosine": 0.6, "bm25": 0.4}
+CROSS_ENCODER_WEIGHTS = {"cosine": 0.35, "bm25": 0.25, "cross_encoder": 0.4}
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def bm25_scores(query, texts, k1=1.5, b=0.75):
+    """
+    BM25 score of each text for the query, normalized to [0, 1).
+
+    IDF is computed over the given texts, and each score is divided by the score
+    a document with unbounded term frequency for every query term would get.
+    """
+    query_terms = set(keyword_tokens(query))
+    docs = [Counter(keyword_tokens(text)) for text in texts]
+    if not query_terms or not docs:
+        return [0.0] * len(texts)
+    n = len(docs)
+    avg_len = sum(sum(d.values()) for d in docs) / n or 1.0
+    idf = {
+        term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for term in query_terms
+        for df in [sum(1 for d in docs if term in d)]
+    }
+    best = sum(idf[t] * (k1 + 1) for t in query_terms) or 1.0
+    scores = []
+    for d in docs:
+        length = sum(d.values())
+        score = 0.0
+        for term in query_terms:
+            tf = d.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        scores.append(score / best)
+    return scores
+
+
+def _sigmoid(x):
+    return 1 / (1 + math.exp(-x))
+
+
+class RelevancePrefilter:
+    """
+    Scores retrieved chunks locally and decides the obvious cases.
+
+    Args:
+        embeddings (Embeddings): Embedding model (normally the cached one from get_embeddings)
+        accept (float): Combined score at or above which a chunk is relevant
+        reject (float): Combined score at or below which a chunk is irrelevant
+        cross_encoder (object): Optional model with score([(question, text), ...]) returning logits
+        weights (dict): Weight of each signal in the combined score
+        log_path (str): JSON lines file for LLM-graded rows (calibration data)
+    """
+
+    def __init__(self, embeddings, accept, reject, cross_encoder=None, weights=None, log_path=None):
+        self.embeddings = embeddings
+        self.accept = accept
+        self.reject = reject
+        self.cross_encoder = cross_encoder
+        self.weights = weights or (CROSS_ENCODER_WEIGHTS if cross_encoder is not None else DEFAULT_WEIGHTS)
+        self._log = JsonLinesSink(log_path) if log_path else None
+
+    def _combine(self, question, texts, question_vector, text_vectors):
+        signals = {
+            "cosine": [max(0.0, _cosine(question_vector, v)) for v in text_vectors],
+            "bm25": bm25_scores(question, texts),
+        }
+        if self.cross_encoder is not None:
+            logits = self.cross_encoder.score([(question, text) for text in texts])
+            signals["cross_encoder"] = [_sigmoid(float(x)) for x in logits]
+        total_weight = sum(self.weights[name] for name in signals)
+        scores = []
+        for i in range(len(texts)):
+            row = {name: values[i] for name, values in signals.items()}
+            row["score"] = sum(self.weights[name] * row[name] for name in signals) / total_weight
+            scores.append(row)
+        return scores
+
+    def score(self, question, texts):
+        """
+        Score texts for a question.
+
+        Returns:
+            list: One dict per text with each signal and the combined "score"
+        """
+        if not texts:
+            return []
+        question_vector = self.embeddings.embed_query(question)
+        text_vectors = self.embeddings.embed_documents(list(texts))
+        return self._combine(question, texts, question_vector, text_vectors)
+
+    async def ascore(self, question, texts):
+        if not texts:
+            return []
+        question_vector = await self.embeddings.aembed_query(question)
+        text_vectors = await self.embeddings.aembed_documents(list(texts))
+        return self._combine(question, texts, question_vector, text_vectors)
+
+    def decide(self, score):
+        """'yes' / 'no' for confident scores, None for the ambiguous band."""
+        if score >= self.accept:
+            return "yes"
+        if score <= self.reject:
+            return "no"
+        return None
+
+    def log(self, question, text, relevant, score):
+        """Record an LLM verdict as a calibration row."""
+        if self._log is not None:
+            self._log({"question": question, "document": text, "relevant": relevant, "score": score})
+
+
+def _split(prefilter, question, documents, scores):
+    grades = [prefilter.decide(s["score"]) for s in scores]
+    registry = get_registry()
+    for grade in grades:
+        registry.inc("prefilter_decisions", outcome={"yes": "accept", "no": "reject", None: "ambiguous"}[grade])
+    ambiguous = [i for i, grade in enumerate(grades) if grade is None]
+    print(f"---PRE-FILTER: {len(documents) - len(ambiguous)} DECIDED LOCALLY, {len(ambiguous)} TO LLM GRADER---")
+    return grades, ambiguous
+
+
+def _merge(prefilter, question, documents, scores, grades, ambiguous, llm_grades):
+    for i, grade in zip(ambiguous, llm_grades):
+        grades[i] = grade
+        prefilter.log(question, _text(documents[i]), grade == "yes", scores[i]["score"])
+    return grades
+
+
+def _text(document):
+    return document if isinstance(document, str) else document.page_content
+
+
+def prefiltered_grades(question, documents, grade_with_llm):
+    """
+    Grade documents, sending only the ambiguous ones to the LLM.
+
+    Args:
+        question (str): The user question
+        documents (list): Documents (or plain strings) to grade
+        grade_with_llm (callable): Takes a list of documents, returns their 'yes' / 'no' grades
+
+    Returns:
+        list: 'yes' / 'no' grade for each document, in input order
+    """
+    prefilter = get_prefilter()
+    if prefilter is None or not documents:
+        return grade_with_llm(documents)
+    scores = prefilter.score(question, [_text(d) for d in documents])
+    grades, ambiguous = _split(prefilter, question, documents, scores)
+    llm_grades = grade_with_llm([documents[i] for i in ambiguous]) if ambiguous else []
+    return _merge(prefilter, question, documents, scores, grades, ambiguous, llm_grades)
+
+
+async def aprefiltered_grades(question, documents, agrade_with_llm):
+    """Async twin of prefiltered_grades; agrade_with_llm is a coroutine function."""
+    prefilter = get_prefilter()
+    if prefilter is None or not documents:
+        return await agrade_with_llm(documents)
+    scores = await prefilter.ascore(question, [_text(d) for d in documents])
+    grades, ambiguous = _split(prefilter, question, documents, scores)
+    llm_grades = await agrade_with_llm([documents[i] for i in ambiguous]) if ambiguous else []
+    return _merge(prefilter, question, documents, scores, grades, ambiguous, llm_grades)
+
+
+def calibrate(scores, labels, target_precision=0.95, min_support=5):
+    """
+    Choose accept/reject thresholds from labelled scores.
+
+    accept is the lowest score such that at least target_precision of the rows
+    scoring at or above it are relevant; reject the highest score such that at
+    least target_precision of the rows at or below it are irrelevant. Each side
+    needs min_support rows, otherwise it is disabled (everything goes to the LLM).
+
+    Args:
+        scores (list): Combined prefilter scores
+        labels (list): True for relevant, False for irrelevant
+        target_precision (float): Required precision of the local decisions
+        min_support (int): Minimum number of rows decided by each threshold
+
+    Returns:
+        dict: {"accept": float, "reject": float, "accepted": int, "rejected": int}
+    """
+    rows = sorted(zip(scores, labels), key=lambda row: row[0])
+
+    accept, accepted, relevant = 2.0, 0, 0
+    for count, (score, label) in enumerate(reversed(rows), start=1):
+        relevant += bool(label)
+        if count >= min_support and relevant / count >= target_precision:
+            accept, accepted = score, count
+
+    reject, rejected, irrelevant = -1.0, 0, 0
+    for count, (score, label) in enumerate(rows, start=1):
+        irrelevant += not label
+        if count >= min_support and irrelevant / count >= target_precision:
+            reject, rejected = score, count
+
+    if reject >= accept:
+        reject = math.nextafter(accept, -math.inf)
+    return {"accept": accept, "reject": reject, "accepted": accepted, "rejected": rejected}
+
+
+def _thresholds():
+    path = os.getenv("PREFILTER_THRESHOLDS_PATH", "./.rag_cache/prefilter_thresholds.json")
+    # Uncalibrated: accept nothing and reject nothing locally
+    thresholds = {"accept": 2.0, "reject": -1.0}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            thresholds.update({k: v for k, v in json.load(f).items() if k in thresholds})
+    for key in thresholds:
+        value = os.getenv(f"PREFILTER_{key.upper()}")
+        if value is not None:
+            thresholds[key] = float(value)
+    return thresholds
+
+
+_prefilter = None
+_lock = threading.Lock()
+
+
+def get_prefilter():
+    """Process-wide prefilter configured from the environment, or None when disabled."""
+    global _prefilter
+    if os.getenv("RELEVANCE_PREFILTER", "false").lower() != "true":
+        return None
+    if _prefilter is None:
+        with _lock:
+            if _prefilter is None:
+                from rag_common.embedding_cache import get_embeddings
+
+                cross_encoder = None
+                model_name = os.getenv("PREFILTER_CROSS_ENCODER")
+                if model_name:
+                    from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+
+                    cross_encoder = HuggingFaceCrossEncoder(model_name=model_name)
+                _prefilter = RelevancePrefilter(
+                    get_embeddings(),
+                    cross_encoder=cross_encoder,
+                    log_path=os.getenv("PREFILTER_LOG_PATH"),
+                    **_thresholds(),
+                )
+    return _prefilter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the relevance prefilter thresholds.")
+    parser.add_argument("labelled", help="JSON lines with question, document, relevant (true/false) and score, as logged")
+    parser.add_argument("--target-precision", type=float, default=0.95)
+    parser.add_argument("--min-support", type=int, default=5)
+    parser.add_argument("--output", default=os.getenv("PREFILTER_THRESHOLDS_PATH", "./.rag_cache/prefilter_thresholds.json"))
+    args = parser.parse_args()
+
+    with open(args.labelled, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    unscored = sum(1 for row in rows if row.get("score") is None)
+    if unscored:
+        parser.error(f"{unscored} rows have no score; record rows with PREFILTER_LOG_PATH, which logs the runtime score")
+
+    result = calibrate(
+        [float(row["score"]) for row in rows],
+        [bool(row["relevant"]) for row in rows],
+        args.target_precision,
+        args.min_support,
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"accept": result["accept"], "reject": result["reject"]}, f, indent=2)
+    print(f"accept >= {result['accept']:.4f} ({result['accepted']} of {len(rows)} rows)")
+    print(f"reject <= {result['reject']:.4f} ({result['rejected']} of {len(rows)} rows)")
+    print(f"Thresholds written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
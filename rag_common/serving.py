@@ -0,0 +1,228 @@
+"""
+Concurrent question serving for the LangGraph RAG variants.
+
+GraphServer answers many questions with one compiled graph on a single event
+loop. Each question runs through app.ainvoke, so every node and conditional
+edge uses its async twin (retriever.ainvoke, chain.ainvoke, web search
+ainvoke). A question that is waiting on a model call does not hold a thread.
+Two limits apply:
+
+    * max_in_flight: the most graph runs executing at once in the process.
+      Other questions wait for a free slot.
+    * timeout_s: the deadline for each question. It includes the time spent
+      waiting for a slot. The graph run is cancelled when the deadline passes.
+
+Every graph directory has a serve.py that wraps serve_main:
+
+    python serve.py questions.txt                 # one question per line
+    cat questions.txt | python serve.py - --max-in-flight 200 --timeout 60
+
+Answers are written as JSON lines in the order they finish:
+{"index", "question", "status" (ok / timeout / error), "answer", "error",
+"latency_s", "queued_s"}. The nodes' progress prints and a final summary go to
+stderr.
+
+Before the first question, serve_main builds the graph's lazily created
+components (chat model, vector store, retriever, tools; see
+rag_common.components), so the first requests do not pay for them. Set
+RAG_WARM_UP=false to skip this.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from rag_common.components import get_components
+from rag_common.metrics import Histogram, get_registry
+
+# Graph runs executing at once in the process
+MAX_IN_FLIGHT = int(os.getenv("RAG_MAX_IN_FLIGHT", "64"))
+
+# Deadline per question in seconds, including time waiting for a slot (0 disables it)
+REQUEST_TIMEOUT_S = float(os.getenv("RAG_REQUEST_TIMEOUT_S", "120"))
+
+# Build the lazily created components before serving the first question
+WARM_UP = os.getenv("RAG_WARM_UP", "true").lower() == "true"
+
+
+def question_inputs(question):
+    """Input state of the adaptive, corrective and self-reflection graphs."""
+    return {"question": question}
+
+
+def message_inputs(question):
+    """Input state of the agentic graph."""
+    from langchain_core.messages import HumanMessage
+
+    return {"messages": [HumanMessage(content=question)]}
+
+
+def final_answer(state):
+    """The answer in a final graph state: generation, or the content of the last message."""
+    if state.get("generation") is not None:
+        return state["generation"]
+    messages = state.get("messages") or []
+    return getattr(messages[-1], "content", messages[-1]) if messages else None
+
+
+class GraphServer:
+    """
+    Runs questions through a compiled graph app concurrently, with a global in-flight limit and per-request timeouts.
+
+    Args:
+        app (Runnable): The compiled graph app (instrumented and/or answer-cached apps work too)
+        graph_name (str): Label of the serving metrics
+        max_in_flight (int): Graph runs executing at once (RAG_MAX_IN_FLIGHT)
+        timeout_s (float): Deadline per question in seconds, 0 or None for none (RAG_REQUEST_TIMEOUT_S)
+        make_inputs (callable): question -> input state
+        answer_of (callable): final state -> answer
+        config (dict): RunnableConfig passed to every run (e.g. recursion_limit)
+    """
+
+    def __init__(self, app, graph_name="graph", max_in_flight=None, timeout_s=None,
+                 make_inputs=question_inputs, answer_of=final_answer, config=None):
+        self.app = app
+        self.graph_name = graph_name
+        self.max_in_flight = max_in_flight if max_in_flight is not None else MAX_IN_FLIGHT
+        self.timeout_s = (timeout_s if timeout_s is not None else REQUEST_TIMEOUT_S) or None
+        self.make_inputs = make_inputs
+        self.answer_of = answer_of
+        self.config = config
+        self.in_flight = 0
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+
+    async def _run(self, question, timing):
+        async with self._slots:
+            timing["queued_s"] = time.perf_counter() - timing["started"]
+            self.in_flight += 1
+            try:
+                return await self.app.ainvoke(self.make_inputs(question), config=self.config)
+            finally:
+                self.in_flight -= 1
+
+    async def answer(self, question, index=None):
+        """
+        Answer one question within the server's limits. Never raises for graph failures.
+
+        Args:
+            question (str): The question
+            index (int): Position of the question in its batch, echoed in the result
+
+        Returns:
+            dict: index, question, status (ok / timeout / error), answer, error, latency_s, queued_s
+        """
+        timing = {"started": time.perf_counter(), "queued_s": None}
+        answer, error = None, None
+        try:
+            state = await asyncio.wait_for(self._run(question, timing), self.timeout_s)
+            status, answer = "ok", self.answer_of(state)
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"no answer within {self.timeout_s:g}s"
+        except Exception as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+        latency = time.perf_counter() - timing["started"]
+
+        registry = get_registry()
+        registry.inc("serving_requests", graph=self.graph_name, status=status)
+        registry.observe("serving_seconds", latency, graph=self.graph_name)
+        if timing["queued_s"] is not None:
+            registry.observe("serving_queued_seconds", timing["queued_s"], graph=self.graph_name)
+        return {
+            "index": index,
+            "question": question,
+            "status": status,
+            "answer": answer,
+            "error": error,
+            "latency_s": latency,
+            "queued_s": timing["queued_s"],
+        }
+
+    async def answer_iter(self, questions):
+        """Answer all questions concurrently, yielding each result as soon as it is ready."""
+        pending = [asyncio.ensure_future(self.answer(q, index=i)) for i, q in enumerate(questions)]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                yield await next_done
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def answer_all(self, questions):
+        """Answer all questions concurrently; results are in question order."""
+        return await asyncio.gather(*(self.answer(q, index=i) for i, q in enumerate(questions)))
+
+
+def read_questions(path):
+    """Non-empty lines of a file, or of stdin when path is "-"."""
+    with contextlib.ExitStack() as stack:
+        f = sys.stdin if path == "-" else stack.enter_context(open(path, encoding="utf-8"))
+        return [line.strip() for line in f if line.strip()]
+
+
+def summary(results, elapsed):
+    statuses = Counter(result["status"] for result in results)
+    latencies = Histogram()
+    for result in results:
+        latencies.observe(result["latency_s"])
+    return {
+        "questions": len(results),
+        **dict(statuses),
+        "elapsed_s": elapsed,
+        "questions_per_s": len(results) / elapsed if elapsed else None,
+        "latency_p50_s": latencies.percentile(50),
+        "latency_p95_s": latencies.percentile(95),
+        "latency_max_s": latencies.max if results else None,
+    }
+
+
+def serve_main(app, graph_name, make_inputs=question_inputs, argv=None):
+    """
+    Command line entry point: answer a file of questions concurrently and print JSON lines.
+
+    Args:
+        app (Runnable): The compiled graph app
+        graph_name (str): Name used in the metrics and the summary
+        make_inputs (callable): question -> input state
+        argv (list): Arguments (defaults to sys.argv[1:])
+    """
+    parser = argparse.ArgumentParser(description=f"Answer questions concurrently with {graph_name}")
+    parser.add_argument("questions", nargs="?", default="-", help="File with one question per line, '-' for stdin")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT, help="Graph runs executing at once")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_S, help="Seconds per question, 0 for no limit")
+    parser.add_argument("--recursion-limit", type=int, default=25)
+    parser.add_argument("--output", help="Write the JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    questions = read_questions(args.questions)
+    server = GraphServer(
+        app,
+        graph_name=graph_name,
+        max_in_flight=args.max_in_flight,
+        timeout_s=args.timeout,
+        make_inputs=make_inputs,
+        config={"recursion_limit": args.recursion_limit},
+    )
+
+    async def run(out):
+        results = []
+        async for result in server.answer_iter(questions):
+            results.append(result)
+            out.write(json.dumps(result, default=str) + "\n")
+            out.flush()
+        return results
+
+    with contextlib.ExitStack() as stack:
+        out = stack.enter_context(open(args.output, "w", encoding="utf-8")) if args.output else sys.stdout
+        # The nodes print their progress; keep it out of the JSON lines
+        with contextlib.redirect_stdout(sys.stderr):
+            if WARM_UP:
+                warm_up_seconds = get_components().warm_up()
+                print(json.dumps({"graph": graph_name, "warm_up_s": sum(warm_up_seconds.values())}))
+            started = time.perf_counter()
+            results = asyncio.run(run(out))
+        print(json.dumps({"graph": graph_name, **summary(results, time.perf_counter() - started)}), file=sys.stderr)
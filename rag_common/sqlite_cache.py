@@ -0,0 +1,122 @@
+"""
+SQLite-backed key/value cache with TTL and LRU eviction.
+
+Values are stored as JSON text, so anything json.dumps accepts can be cached.
+The file can be shared by several processes; SQLite handles the locking.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def content_hash(text):
+    """Stable SHA-256 hex digest of a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_question(question):
+    """Lower-case a question and collapse whitespace so trivial variants share a key."""
+    return " ".join(question.lower().split())
+
+
+class PersistentCache:
+    """
+    A small persistent cache.
+
+    Args:
+        path (str): SQLite file to store entries in (created if missing)
+        ttl_seconds (float): Entries older than this are treated as misses; None keeps them forever
+        max_entries (int): Least recently used entries beyond this count are evicted; None disables eviction
+    """
+
+    def __init__(self, path, ttl_seconds=None, max_entries=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        self._conn.commit()
+
+    def _is_expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._is_expired(row[1], now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store value under key, evicting least recently used entries if needed."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            if self.max_entries is not None:
+                self._conn.execute(
+                    """DELETE FROM cache WHERE key IN (
+                        SELECT key FROM cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self):
+        """Hit/miss counters for this process plus the number of stored entries."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
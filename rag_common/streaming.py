@@ -0,0 +1,67 @@
+"""
+Token streaming from generation nodes.
+
+stream_generation runs a chain with .stream, forwards every text chunk to the
+graph's custom stream as it arrives, and returns the assembled text, so the
+node still writes the complete generation to the state and the grading edges
+after it see exactly what was streamed.
+
+Each event has the form:
+
+    {"type": "token", "node": "generate", "token": "..."}
+
+Clients read them with stream_mode="custom" (usually together with "updates"):
+
+    for mode, chunk in app.stream(inputs, stream_mode=["updates", "custom"]):
+        if mode == "custom" and chunk.get("type") == "token":
+            print(chunk["token"], end="", flush=True)
+
+When the graph is not streamed in custom mode the events are dropped and the
+node behaves like a plain invoke.
+"""
+
+from langgraph.config import get_stream_writer
+
+
+def _writer():
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        # Called outside a graph run (e.g. a chain used on its own)
+        return lambda chunk: None
+
+
+def token_event(token, node="generate"):
+    return {"type": "token", "node": node, "token": token}
+
+
+def stream_generation(chain, inputs, node="generate"):
+    """
+    Run chain token by token, publishing each chunk to the custom stream.
+
+    Args:
+        chain (Runnable): Chain producing text (e.g. prompt | llm | StrOutputParser())
+        inputs (dict): Chain inputs
+        node (str): Node name reported with each token
+
+    Returns:
+        str: The complete generation
+    """
+    write = _writer()
+    parts = []
+    for chunk in chain.stream(inputs):
+        if chunk:
+            parts.append(chunk)
+            write(token_event(chunk, node))
+    return "".join(parts)
+
+
+async def astream_generation(chain, inputs, node="generate"):
+    """Async version of stream_generation, using chain.astream."""
+    write = _writer()
+    parts = []
+    async for chunk in chain.astream(inputs):
+        if chunk:
+            parts.append(chunk)
+            write(token_event(chunk, node))
+    return "".join(parts)
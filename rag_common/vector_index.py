@@ -0,0 +1,203 @@
+"""
+FAISS index backends for local vector stores.
+
+An index is described by a spec string "<backend>:<param>=<value>,...":
+
+    flat                                    exact search (baseline)
+    ivf:nlist=1024,nprobe=16                inverted lists over k-means cells
+    hnsw:M=32,ef_construction=200,ef_search=64
+                                            graph search
+    pq:m=16,nbits=8                         product quantization, exhaustive scan
+    ivfpq:nlist=1024,m=16,nbits=8,nprobe=16 inverted lists with PQ-compressed vectors
+
+nprobe / ef_search only affect searching and can be changed on a built index
+(set_search_params); the other parameters are fixed at build time. Parameters
+that do not fit a small corpus (more cells or centroids than training vectors,
+PQ sub-quantizers that do not divide the dimension) are scaled down by fit_params.
+
+Which backend and parameters to use depends on corpus size, dimension and the
+recall needed; measure them with benchmarks/ann_benchmark.py.
+"""
+
+import math
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_PARAMS = {
+    "flat": {},
+    "ivf": {"nlist": 1024, "nprobe": 16},
+    "hnsw": {"M": 32, "ef_construction": 200, "ef_search": 64},
+    "pq": {"m": 16, "nbits": 8},
+    "ivfpq": {"nlist": 1024, "m": 16, "nbits": 8, "nprobe": 16},
+}
+
+# Parameters that can be changed after the index is built
+SEARCH_PARAMS = ("nprobe", "ef_search")
+
+# k-means in FAISS wants at least this many training vectors per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def _value(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_spec(spec):
+    """
+    Parse an index spec such as "hnsw:M=32,ef_search=64".
+
+    Returns:
+        tuple: (backend, params) with the backend's defaults filled in
+    """
+    backend, _, rest = spec.partition(":")
+    backend = backend.strip().lower()
+    if backend not in DEFAULT_PARAMS:
+        raise ValueError(f"Unknown index backend {backend!r}; expected one of {', '.join(DEFAULT_PARAMS)}")
+    params = dict(DEFAULT_PARAMS[backend])
+    for item in filter(None, rest.split(",")):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key not in params:
+            raise ValueError(f"Unknown parameter {key!r} for {backend}; expected one of {', '.join(params)}")
+        params[key] = _value(value.strip())
+    return backend, params
+
+
+def format_spec(backend, params):
+    return backend + (":" + ",".join(f"{k}={v}" for k, v in params.items()) if params else "")
+
+
+def fit_params(backend, params, n, dim):
+    """Scale build parameters down to what n training vectors of dimension dim support."""
+    params = dict(params)
+    if "nlist" in params:
+        params["nlist"] = max(1, min(params["nlist"], n // MIN_POINTS_PER_CENTROID))
+        if "nprobe" in params:
+            params["nprobe"] = min(params["nprobe"], params["nlist"])
+    if "m" in params:
+        # Sub-quantizers must divide the dimension
+        params["m"] = max(d for d in range(1, min(params["m"], dim) + 1) if dim % d == 0)
+    if "nbits" in params:
+        params["nbits"] = max(1, min(params["nbits"], int(math.log2(max(2, n // MIN_POINTS_PER_CENTROID)))))
+    return params
+
+
+def create_index(backend, dim, **params):
+    """An empty (possibly untrained) FAISS index using L2 distance."""
+    import faiss
+
+    if backend == "flat":
+        return faiss.IndexFlatL2(dim)
+    if backend == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, params["nlist"])
+    elif backend == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"])
+        index.hnsw.efConstruction = params["ef_construction"]
+    elif backend == "pq":
+        index = faiss.IndexPQ(dim, params["m"], params["nbits"])
+    elif backend == "ivfpq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, params["nlist"], params["m"], params["nbits"])
+    else:
+        raise ValueError(f"Unknown index backend {backend!r}")
+    set_search_params(index, **{k: v for k, v in params.items() if k in SEARCH_PARAMS})
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Change the query-time parameters of a built index."""
+    import faiss
+
+    space = faiss.ParameterSpace()
+    if nprobe is not None and hasattr(index, "nprobe"):
+        space.set_index_parameter(index, "nprobe", nprobe)
+    if ef_search is not None and hasattr(index, "hnsw"):
+        space.set_index_parameter(index, "efSearch", ef_search)
+
+
+def trained_index(spec, sample):
+    """
+    An empty index for the spec, trained on sample when the backend needs it.
+
+    Args:
+        spec (str): Index spec, e.g. "ivf:nlist=1024,nprobe=16"
+        sample (ndarray): float32 training vectors of shape (n, dim)
+    """
+    backend, params = parse_spec(spec)
+    sample = np.ascontiguousarray(sample, dtype=np.float32)
+    params = fit_params(backend, params, len(sample), sample.shape[1])
+    index = create_index(backend, sample.shape[1], **params)
+    if not index.is_trained:
+        index.train(sample)
+    return index
+
+
+def build_index(spec, batches, train_size=100_000):
+    """
+    Build an index from vectors.
+
+    Args:
+        spec (str): Index spec, e.g. "ivf:nlist=1024,nprobe=16"
+        batches (iterable): float32 arrays of shape (n, dim), or a single such array
+        train_size (int): Vectors (taken from the first batches) used to train IVF / PQ
+
+    Returns:
+        faiss.Index: The trained index containing every vector, in input order
+    """
+    if isinstance(batches, np.ndarray):
+        batches = [batches]
+    batches = iter(batches)
+
+    # Hold back the first batches until there is enough data to train on
+    pending, held = [], 0
+    for batch in batches:
+        pending.append(np.ascontiguousarray(batch, dtype=np.float32))
+        held += len(batch)
+        if held >= train_size:
+            break
+    if not pending:
+        raise ValueError("No vectors to index")
+    index = trained_index(spec, np.concatenate(pending)[:train_size])
+    for batch in pending:
+        index.add(batch)
+    for batch in batches:
+        index.add(np.ascontiguousarray(batch, dtype=np.float32))
+    return index
+
+
+def index_bytes(index):
+    """Size of the serialized index, a close proxy for its memory footprint."""
+    import faiss
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.faiss")
+        faiss.write_index(index, path)
+        return os.path.getsize(path)
+
+
+def faiss_vectorstore(documents, embeddings, spec="flat"):
+    """
+    LangChain FAISS vector store over documents using the given index spec.
+
+    Args:
+        documents (list): Documents to index
+        embeddings (Embeddings): Embedding model
+        spec (str): Index spec (see module docstring)
+
+    Returns:
+        FAISS: Vector store ready for as_retriever()
+    """
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    texts = [d.page_content for d in documents]
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    vectorstore = FAISS(embeddings, trained_index(spec, vectors), InMemoryDocstore(), {})
+    vectorstore.add_embeddings(list(zip(texts, vectors.tolist())), metadatas=[d.metadata for d in documents])
+    return vectorstore
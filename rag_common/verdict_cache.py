@@ -0,0 +1,108 @@
+"""
+Persistent cache for grader verdicts.
+
+Graders are keyed by the grader name, the normalized question and a content hash
+of every other input (the retrieved chunk, the set of facts, the generation), so
+the same (question, chunk) pair is only ever sent to the LLM once per TTL.
+
+Configuration (environment variables):
+    GRADER_CACHE                  "false" disables the cache
+    GRADER_CACHE_PATH             SQLite file (default ./.rag_cache/grader_verdicts.sqlite)
+    GRADER_CACHE_TTL_SECONDS      verdict lifetime (default 7 days)
+    GRADER_CACHE_MAX_ENTRIES      LRU capacity (default 100000)
+"""
+
+import asyncio
+import os
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from rag_common.sqlite_cache import PersistentCache, content_hash, normalize_question
+
+_verdict_cache = None
+
+
+def get_verdict_cache():
+    """Process-wide verdict cache, or None when GRADER_CACHE=false."""
+    global _verdict_cache
+    if os.getenv("GRADER_CACHE", "true").lower() != "true":
+        return None
+    if _verdict_cache is None:
+        _verdict_cache = PersistentCache(
+            os.getenv("GRADER_CACHE_PATH", "./.rag_cache/grader_verdicts.sqlite"),
+            ttl_seconds=float(os.getenv("GRADER_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("GRADER_CACHE_MAX_ENTRIES", "100000")),
+        )
+    return _verdict_cache
+
+
+def _as_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, Document):
+        return value.page_content
+    if isinstance(value, (list, tuple)):
+        return "\n\n".join(_as_text(v) for v in value)
+    return str(value)
+
+
+def grader_cache_key(grader_name, inputs):
+    """
+    Cache key for one grader call.
+
+    Args:
+        grader_name (str): Name of the grader, e.g. "retrieval_grader"
+        inputs (dict): The prompt inputs passed to the grader chain
+
+    Returns:
+        str: Hex digest identifying the (grader, inputs) pair
+    """
+    parts = [grader_name]
+    for field in sorted(inputs):
+        value = inputs[field]
+        if field == "question":
+            parts.append(f"question={normalize_question(value)}")
+        else:
+            parts.append(f"{field}={content_hash(_as_text(value))}")
+    return content_hash("\x1f".join(parts))
+
+
+def with_verdict_cache(chain, grader_name, output_model, cache=None):
+    """
+    Wrap a structured-output grader chain with the persistent verdict cache.
+
+    Args:
+        chain (Runnable): Grader chain returning an output_model instance
+        grader_name (str): Name used as part of the cache key
+        output_model (BaseModel): Pydantic model the chain returns
+        cache (PersistentCache): Cache to use, defaults to get_verdict_cache()
+
+    Returns:
+        Runnable: Drop-in replacement for chain (invoke and ainvoke)
+    """
+    if cache is None:
+        cache = get_verdict_cache()
+    if cache is None:
+        return chain
+
+    def invoke(inputs):
+        key = grader_cache_key(grader_name, inputs)
+        cached = cache.get(key)
+        if cached is not None:
+            return output_model.model_validate(cached)
+        verdict = chain.invoke(inputs)
+        cache.set(key, verdict.model_dump())
+        return verdict
+
+    async def ainvoke(inputs):
+        key = grader_cache_key(grader_name, inputs)
+        # SQLite reads and writes block, so keep them off the event loop
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return output_model.model_validate(cached)
+        verdict = await chain.ainvoke(inputs)
+        await asyncio.to_thread(cache.set, key, verdict.model_dump())
+        return verdict
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"cached_{grader_name}")
@@ -0,0 +1,147 @@
+"""
+Neighbour-window expansion at query time.
+
+Instead of storing an expanded copy (previous + current + next chunk) of every
+chunk, each chunk is stored once in the vector store with its position in the
+source ("source" and "ordinal" metadata, as written by IncrementalIngestor).
+WindowedContextRetriever searches the chunks, then reads the +/- window
+neighbours of every hit through the store's metadata index and returns one
+document per contiguous run of chunks:
+
+    hits 4 and 6 of a page, window=1  ->  chunks 3..7 of that page, one document
+
+Overlapping or adjacent windows of the same source are merged, so a passage is
+never returned twice, and the text the splitter repeated between neighbouring
+chunks (chunk_overlap) is only kept once. The window size is a field and can
+also be given per call: retriever.invoke(question, window=2).
+"""
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+def merge_windows(hits, window):
+    """
+    Group hits into merged position ranges.
+
+    Args:
+        hits (list): (source, ordinal) pairs, best first
+        window (int): Neighbours taken on each side of a hit
+
+    Returns:
+        list: (source, first ordinal, last ordinal, hit ordinals) per range, in the order of their best hit
+    """
+    by_source = {}
+    for rank, (source, ordinal) in enumerate(hits):
+        by_source.setdefault(source, []).append((ordinal, rank))
+
+    ranges = []
+    for source, positions in by_source.items():
+        positions.sort()
+        current = None
+        for ordinal, rank in positions:
+            start, end = max(0, ordinal - window), ordinal + window
+            if current is not None and start <= current["end"] + 1:
+                current["end"] = max(current["end"], end)
+                current["hits"].append(ordinal)
+                current["rank"] = min(current["rank"], rank)
+            else:
+                current = {"source": source, "start": start, "end": end, "hits": [ordinal], "rank": rank}
+                ranges.append(current)
+    ranges.sort(key=lambda r: r["rank"])
+    return [(r["source"], r["start"], r["end"], r["hits"]) for r in ranges]
+
+
+def join_chunks(texts, min_overlap=20, max_overlap=1000):
+    """
+    Concatenate consecutive chunks, dropping text a chunk repeats from the end of the previous one.
+
+    Shorter repeats than min_overlap characters are kept; they are more likely a coincidence than splitter overlap.
+    """
+    joined = ""
+    for text in texts:
+        overlap = 0
+        for size in range(min(len(joined), len(text), max_overlap), min_overlap - 1, -1):
+            if joined.endswith(text[:size]):
+                overlap = size
+                break
+        if overlap:
+            joined += text[overlap:]
+        else:
+            joined += ("\n" if joined else "") + text
+    return joined
+
+
+class WindowedContextRetriever(BaseRetriever):
+    """
+    Retrieve chunks and expand each hit with its neighbours from the same source.
+
+    Args:
+        vectorstore (VectorStore): Chroma collection holding every chunk once, with position metadata
+        k (int): Chunks retrieved by the similarity search before expansion
+        window (int): Neighbours added on each side of a hit (0 returns the hits alone)
+        source_key (str): Metadata key of the chunk source
+        ordinal_key (str): Metadata key of the chunk position within its source
+    """
+
+    vectorstore: object
+    k: int = 4
+    window: int = 1
+    source_key: str = "source"
+    ordinal_key: str = "ordinal"
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _neighbours(self, ranges):
+        """Texts of every chunk in ranges, by (source, ordinal), in one metadata query."""
+        clauses = [
+            {"$and": [
+                {self.source_key: source},
+                {self.ordinal_key: {"$gte": start}},
+                {self.ordinal_key: {"$lte": end}},
+            ]}
+            for source, start, end, _ in ranges
+        ]
+        where = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+        found = self.vectorstore.get(where=where, include=["documents", "metadatas"])
+        return {
+            (metadata[self.source_key], metadata[self.ordinal_key]): text
+            for text, metadata in zip(found["documents"], found["metadatas"])
+        }
+
+    def _expand(self, hits, window):
+        positioned = [
+            (doc.metadata[self.source_key], doc.metadata[self.ordinal_key])
+            for doc in hits
+            if self.source_key in doc.metadata and self.ordinal_key in doc.metadata
+        ]
+        if not positioned or window <= 0:
+            return hits
+        ranges = merge_windows(positioned, window)
+        texts = self._neighbours(ranges)
+        expanded = []
+        for source, start, end, hit_ordinals in ranges:
+            ordinals = [o for o in range(start, end + 1) if (source, o) in texts]
+            expanded.append(Document(
+                page_content=join_chunks([texts[(source, o)] for o in ordinals]),
+                metadata={
+                    self.source_key: source,
+                    "ordinals": ordinals,
+                    "hit_ordinals": sorted(hit_ordinals),
+                },
+            ))
+        # Hits without position metadata are passed through unchanged
+        expanded.extend(
+            doc for doc in hits if self.source_key not in doc.metadata or self.ordinal_key not in doc.metadata
+        )
+        return expanded
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun, window=None):
+        hits = self.vectorstore.similarity_search(query, k=self.k)
+        return self._expand(hits, self.window if window is None else window)
+
+    async def _aget_relevant_documents(self, query, *, run_manager, window=None):
+        hits = await self.vectorstore.asimilarity_search(query, k=self.k)
+        # The neighbour lookup is a local metadata query; no need to leave the event loop
+        return self._expand(hits, self.window if window is None else window)
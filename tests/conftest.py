@@ -0,0 +1,29 @@
+import importlib
+import os
+import sys
+
+# Run everything against the offline fakes, without writing caches into the working directory
+os.environ["RAG_PROVIDER"] = "fake"
+for name in ("GRADER_CACHE", "EMBEDDING_CACHE", "ANSWER_CACHE", "RELEVANCE_PREFILTER", "LANGCHAIN_TRACING_V2"):
+    os.environ[name] = "false"
+
+# Make rag_common importable the same way the scripts do
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+VARIANTS_DIR = os.path.join(ROOT, "Types_of_RAG_implementation_using_LangGraph")
+
+
+def import_variant_module(variant, module):
+    """Import a module of a graph variant, which uses sibling imports (from grader import ...)."""
+    directory = os.path.join(VARIANTS_DIR, variant)
+    siblings = {name[:-3] for name in os.listdir(directory) if name.endswith(".py")}
+    # Variants share module names; drop another variant's siblings before importing
+    loaded = sys.modules.get(module)
+    if loaded is not None and os.path.dirname(os.path.abspath(loaded.__file__)) != directory:
+        for name in siblings:
+            sys.modules.pop(name, None)
+    if directory in sys.path:
+        sys.path.remove(directory)
+    sys.path.insert(0, directory)
+    return importlib.import_module(module)
@@ -0,0 +1,66 @@
+from langchain_core.documents import Document
+
+from rag_common.answer_cache import AnswerCache
+from rag_common.fakes import HashingEmbeddings
+from rag_common.sqlite_cache import content_hash
+
+QUESTION = "What are the types of agent memory?"
+DOCUMENTS = [
+    Document(id="c1", page_content="Short-term memory is in-context learning."),
+    Document(id="c2", page_content="Long-term memory uses an external vector store."),
+]
+
+
+def make_cache(tmp_path, **kwargs):
+    return AnswerCache(str(tmp_path / "answers.sqlite"), HashingEmbeddings(), threshold=0.8, **kwargs)
+
+
+def current(documents):
+    """Validator over a fake collection holding documents."""
+    hashes = {d.id: content_hash(d.page_content) for d in documents}
+    return lambda ids: {i: hashes[i] for i in ids if i in hashes}
+
+
+def test_exact_hit_reads_the_entry_once(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    cache.store("adaptive", QUESTION, "Short-term and long-term.", DOCUMENTS)
+
+    reads = []
+    row = cache._row
+    monkeypatch.setattr(cache, "_row", lambda *args: reads.append(args) or row(*args))
+    hit = cache.lookup("adaptive", "  what are the types of AGENT memory? ", validate=current(DOCUMENTS))
+    assert hit["generation"] == "Short-term and long-term."
+    assert (hit["match"], hit["similarity"]) == ("exact", 1.0)
+    assert len(reads) == 1
+
+
+def test_near_duplicate_questions_hit_and_others_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store("adaptive", QUESTION, "Short-term and long-term.", DOCUMENTS)
+
+    hit = cache.lookup("adaptive", "What are the types of memory of an agent?")
+    assert hit["match"] == "semantic" and 0.8 <= hit["similarity"] < 1.0
+    assert hit["question"] == QUESTION
+    assert cache.lookup("adaptive", "How do adversarial attacks on LLMs work?") is None
+    # Answers are kept per graph
+    assert cache.lookup("corrective", QUESTION) is None
+
+
+def test_changed_or_deleted_chunks_invalidate_the_answer(tmp_path):
+    for collection in (
+        [DOCUMENTS[0], Document(id="c2", page_content="Long-term memory was rewritten.")],
+        [DOCUMENTS[0]],
+    ):
+        cache = make_cache(tmp_path)
+        cache.clear()
+        cache.store("adaptive", QUESTION, "Short-term and long-term.", DOCUMENTS)
+        assert cache.lookup("adaptive", QUESTION, validate=current(collection)) is None
+        # The stale entry is dropped, not just skipped
+        assert len(cache) == 0
+
+
+def test_answers_using_web_results_are_not_stored_by_default(tmp_path):
+    cache = make_cache(tmp_path)
+    web = Document(page_content="Today's headline.", metadata={"url": "https://example.com"})
+    assert cache.store("adaptive", QUESTION, "From the web.", [web]) is False
+    assert cache.lookup("adaptive", QUESTION) is None
@@ -0,0 +1,70 @@
+import pytest
+from langchain_core.documents import Document
+
+from rag_common.bm25_index import HybridRetriever, reciprocal_rank_fusion
+from rag_common.ingestion import chunk_ids
+
+
+def test_rrf_rewards_ids_ranked_by_both_lists():
+    fused = reciprocal_rank_fusion([["a", "b"], ["c", "b", "d"]], rrf_k=60)
+    ids = [i for i, _ in fused]
+    assert ids[0] == "b"
+    assert set(ids) == {"a", "b", "c", "d"}
+    assert dict(fused)["b"] == pytest.approx(1 / 62 + 1 / 62)
+
+
+def test_rrf_weights_scale_each_list():
+    fused = dict(reciprocal_rank_fusion([["dense"], ["keyword"]], weights=[1.0, 2.0], rrf_k=0))
+    assert fused == {"dense": pytest.approx(1.0), "keyword": pytest.approx(2.0)}
+
+
+def test_rrf_k_flattens_the_top_ranks():
+    sharp = dict(reciprocal_rank_fusion([["a", "b"]], rrf_k=0))
+    flat = dict(reciprocal_rank_fusion([["a", "b"]], rrf_k=1000))
+    assert sharp["a"] / sharp["b"] > flat["a"] / flat["b"]
+
+
+def test_rrf_of_no_rankings():
+    assert reciprocal_rank_fusion([]) == []
+
+
+class DictStore:
+    """Vector store stub: fixed dense results, and get() by ID."""
+
+    def __init__(self, chunks, dense_ids):
+        self.chunks = chunks
+        self.dense_ids = dense_ids
+
+    def similarity_search(self, query, k=4):
+        return [Document(id=i, page_content=self.chunks[i][0], metadata=self.chunks[i][1]) for i in self.dense_ids][:k]
+
+    def get(self, ids, include=None):
+        return {
+            "ids": list(ids),
+            "documents": [self.chunks[i][0] for i in ids],
+            "metadatas": [self.chunks[i][1] for i in ids],
+        }
+
+
+class FixedKeywordIndex:
+    def __init__(self, hits):
+        self.hits = hits
+
+    def search(self, query, k=20):
+        return [(i, 1.0) for i in self.hits][:k]
+
+
+def test_keyword_only_hits_keep_their_store_id():
+    # The same boilerplate paragraph twice in one page: the IDs differ only by occurrence
+    first, second = chunk_ids([("page", "Subscribe to our newsletter."), ("page", "Subscribe to our newsletter.")])
+    chunks = {
+        first: ("Subscribe to our newsletter.", {"source": "page", "ordinal": 0}),
+        second: ("Subscribe to our newsletter.", {"source": "page", "ordinal": 5}),
+    }
+    retriever = HybridRetriever(
+        vectorstore=DictStore(chunks, dense_ids=[first]), keyword_index=FixedKeywordIndex([second]), k=4
+    )
+
+    docs = retriever.invoke("newsletter")
+    assert [d.id for d in docs] == [first, second]
+    assert [d.metadata["ordinal"] for d in docs] == [0, 5]
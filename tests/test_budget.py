@@ -0,0 +1,51 @@
+from langchain_core.documents import Document
+
+from rag_common.budget import LoopBudget, charge, estimate_tokens
+
+
+def test_estimate_tokens_counts_page_content_not_metadata():
+    doc = Document(page_content="x" * 40, metadata={"source": "y" * 400})
+    assert estimate_tokens([doc]) == 10
+    assert estimate_tokens(doc, "abcd") == 11
+
+
+def test_charge_accumulates_and_keeps_the_start_time():
+    update = charge({"tokens_used": 5, "started_at": 123.0}, "abcdefgh")
+    assert update == {"tokens_used": 7, "started_at": 123.0}
+
+
+def test_loop_limits():
+    budget = LoopBudget(max_regenerations=1, max_rewrites=2)
+    # generation_count includes the first generation
+    assert budget.can_regenerate({"generation_count": 1})
+    assert not budget.can_regenerate({"generation_count": 2})
+    assert budget.can_rewrite({"rewrite_count": 1})
+    assert not budget.can_rewrite({"rewrite_count": 2})
+    assert budget.reason({"generation_count": 2}) == "regenerations"
+    assert budget.reason({"rewrite_count": 2}) == "rewrites"
+    assert budget.reason({}) is None
+
+
+def test_token_and_time_budgets(monkeypatch):
+    budget = LoopBudget(max_tokens=100, max_seconds=10)
+    assert budget.spent({"tokens_used": 99}) is None
+    assert budget.spent({"tokens_used": 100}) == "tokens"
+
+    monkeypatch.setattr("rag_common.budget.time.time", lambda: 1000.0)
+    assert budget.spent({"started_at": 995.0}) is None
+    assert budget.spent({"started_at": 990.0}) == "time"
+    # Token and time budgets are reported before the loop limits
+    assert budget.reason({"tokens_used": 100, "rewrite_count": 5}) == "tokens"
+
+
+def test_zero_or_none_disables_token_and_time_budgets():
+    for limit in (0, None):
+        budget = LoopBudget(max_tokens=limit, max_seconds=limit)
+        assert budget.spent({"tokens_used": 10 ** 9, "started_at": 1.0}) is None
+
+
+def test_for_state_applies_overrides():
+    budget = LoopBudget(max_regenerations=2, max_rewrites=2, max_tokens=100, max_seconds=10).for_state(
+        {"max_rewrites": 0, "max_tokens": 5}
+    )
+    assert (budget.max_regenerations, budget.max_rewrites, budget.max_tokens, budget.max_seconds) == (2, 0, 5, 10)
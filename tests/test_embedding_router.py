@@ -0,0 +1,84 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from conftest import import_variant_module
+from rag_common.embedding_router import NearestCentroidRouter
+
+VECTORS = {
+    "agent memory": [1.0, 0.0, 0.0],
+    "tool use": [0.9, 0.1, 0.0],
+    "football scores": [0.0, 1.0, 0.0],
+    "weather today": [0.1, 0.9, 0.0],
+    "how do agents remember": [0.95, 0.05, 0.1],
+    "something in between": [0.5, 0.5, 0.7],
+}
+EXAMPLES = {"vectorstore": ["agent memory", "tool use"], "web_search": ["football scores", "weather today"]}
+
+
+class LookupEmbeddings(Embeddings):
+    def __init__(self):
+        self.document_calls = 0
+
+    def embed_documents(self, texts):
+        self.document_calls += 1
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return VECTORS[text]
+
+
+def test_routes_to_the_nearest_centroid():
+    router = NearestCentroidRouter(LookupEmbeddings(), EXAMPLES, min_confidence=0.1)
+    label, confidence = router.classify("how do agents remember")
+    assert label == "vectorstore" and confidence > 0.5
+
+
+def test_low_confidence_returns_no_label():
+    router = NearestCentroidRouter(LookupEmbeddings(), EXAMPLES, min_confidence=0.1)
+    label, confidence = router.classify("something in between")
+    assert label is None and confidence < 0.1
+
+
+def test_examples_are_embedded_once_and_async_agrees():
+    embeddings = LookupEmbeddings()
+    router = NearestCentroidRouter(embeddings, EXAMPLES, min_confidence=0.1)
+    sync_result = router.classify("how do agents remember")
+    router.classify("something in between")
+    async_result = asyncio.run(router.aclassify("how do agents remember"))
+    assert embeddings.document_calls == 1
+    assert async_result == sync_result
+
+
+def test_route_falls_back_to_the_llm_router_when_not_confident(monkeypatch):
+    router = import_variant_module("adaptive-RAG", "router")
+    asked = []
+
+    class LLMRouter:
+        def invoke(self, inputs):
+            asked.append(inputs["question"])
+            return router.RouteQuery(datasource="web_search")
+
+    monkeypatch.setattr(router, "embedding_router", NearestCentroidRouter(LookupEmbeddings(), EXAMPLES, 0.1))
+    monkeypatch.setattr(router, "question_router_chain", LLMRouter())
+
+    assert router.route({"question": "how do agents remember"}).datasource == "vectorstore"
+    assert asked == []
+    assert router.route({"question": "something in between"}).datasource == "web_search"
+    assert asked == ["something in between"]
+
+
+def test_route_examples_do_not_contain_the_evaluation_questions():
+    import json
+    import os
+
+    from conftest import ROOT, VARIANTS_DIR
+
+    router = import_variant_module("adaptive-RAG", "router")
+    examples = {text.lower() for texts in router.ROUTE_EXAMPLES.values() for text in texts}
+    with open(os.path.join(ROOT, "rag_common", "fixtures", "questions.json"), encoding="utf-8") as f:
+        questions = [q if isinstance(q, str) else q["question"] for q in json.load(f)]
+    with open(os.path.join(VARIANTS_DIR, "adaptive-RAG", "run.py"), encoding="utf-8") as f:
+        run_script = f.read().lower()
+    assert not examples & {q.lower() for q in questions}
+    assert not [text for text in examples if text.rstrip("?") in run_script]
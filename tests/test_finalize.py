@@ -0,0 +1,54 @@
+import asyncio
+
+from conftest import import_variant_module
+
+nodes = import_variant_module("adaptive-RAG", "nodes")
+edges = import_variant_module("adaptive-RAG", "edges")
+
+
+class Grade:
+    def __init__(self, binary_score):
+        self.binary_score = binary_score
+
+
+class FixedGrader:
+    def __init__(self, binary_score):
+        self.binary_score = binary_score
+
+    def invoke(self, inputs):
+        return Grade(self.binary_score)
+
+    async def ainvoke(self, inputs):
+        return Grade(self.binary_score)
+
+
+STATE = {
+    "question": "What are the types of agent memory?",
+    "documents": [],
+    "generation": "Short-term and long-term memory.",
+    "best_generation": "An older answer saved before the last rewrite.",
+    "rewrite_count": 2,
+    "generation_count": 1,
+    "max_rewrites": 2,
+}
+
+
+def test_grounded_but_not_useful_with_no_rewrites_left_keeps_the_current_answer(monkeypatch):
+    monkeypatch.setattr(edges, "hallucination_grader_chain", FixedGrader("yes"))
+    monkeypatch.setattr(edges, "answer_grader_chain", FixedGrader("no"))
+    assert edges.grade_generation_v_documents_and_question(STATE) == "budget_exhausted_grounded"
+    assert asyncio.run(edges.agrade_generation_v_documents_and_question(STATE)) == "budget_exhausted_grounded"
+
+    assert nodes.finalize_grounded(STATE)["generation"] == STATE["generation"]
+
+
+def test_ungrounded_or_ungraded_exits_fall_back_to_the_best_answer(monkeypatch):
+    monkeypatch.setattr(edges, "hallucination_grader_chain", FixedGrader("no"))
+    state = dict(STATE, max_regenerations=0)
+    assert edges.grade_generation_v_documents_and_question(state) == "budget_exhausted"
+
+    update = nodes.finalize(state)
+    assert update["generation"] == STATE["best_generation"]
+    assert update["budget_exhausted"] is True
+    # Without a saved answer the current one is still better than nothing
+    assert nodes.finalize(dict(state, best_generation=None))["generation"] == STATE["generation"]
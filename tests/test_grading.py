@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.exceptions import OutputParserException
+
+from conftest import import_variant_module
+from rag_common.batch_grading import agrade_documents_in_batch
+
+nodes = import_variant_module("adaptive-RAG", "nodes")
+
+DOCUMENTS = [
+    Document(page_content=text)
+    for text in [
+        "Agent memory stores past observations in a memory stream.",
+        "The Bears traded their first-round pick last season.",
+        "Chain of thought prompting asks the model to think step by step.",
+        "Short-term memory is in-context learning; long-term memory uses a vector store.",
+        "Adversarial attacks on LLMs include jailbreak prompts and token manipulation.",
+        "Reflexion lets an agent learn from feedback on its previous trials.",
+        "The weather tomorrow will be sunny with light winds.",
+        "Task decomposition splits a hard task into smaller steps.",
+    ]
+]
+QUESTION = "What are the types of agent memory?"
+
+
+class Grade:
+    def __init__(self, binary_score):
+        self.binary_score = binary_score
+
+
+class CountingGrader:
+    """Per-document grader that records how many calls are in flight at once."""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return Grade("yes" if "memory" in inputs["document"] else "no")
+
+
+class FailingBatchGrader:
+    async def ainvoke(self, inputs):
+        raise OutputParserException("unparseable batch")
+
+
+def run_sync_and_async(monkeypatch, batch_grading):
+    monkeypatch.setattr(nodes, "BATCH_GRADING", batch_grading)
+    state = {"question": QUESTION, "documents": DOCUMENTS}
+    return nodes.grade_documents(state), asyncio.run(nodes.agrade_documents(state))
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2, 3])
+def test_agrade_documents_keeps_grader_calls_within_the_limit(monkeypatch, max_concurrency):
+    grader = CountingGrader()
+    monkeypatch.setattr(nodes, "BATCH_GRADING", False)
+    monkeypatch.setattr(nodes, "GRADER_MAX_CONCURRENCY", max_concurrency)
+    monkeypatch.setattr(nodes, "retrieval_grader_chain", grader)
+
+    result = asyncio.run(nodes.agrade_documents({"question": QUESTION, "documents": DOCUMENTS}))
+
+    assert grader.calls == len(DOCUMENTS)
+    assert grader.max_in_flight == max_concurrency
+    assert [d.page_content for d in result["documents"]] == [
+        d.page_content for d in DOCUMENTS if "memory" in d.page_content
+    ]
+
+
+def test_batch_fallback_keeps_grader_calls_within_the_limit():
+    grader = CountingGrader()
+    grades = asyncio.run(
+        agrade_documents_in_batch(QUESTION, DOCUMENTS, grader, FailingBatchGrader(), max_concurrency=2)
+    )
+    assert grader.calls == len(DOCUMENTS)
+    assert grader.max_in_flight == 2
+    assert grades == ["yes" if "memory" in d.page_content else "no" for d in DOCUMENTS]
+
+
+@pytest.mark.parametrize("batch_grading", [False, True])
+def test_agrade_documents_matches_grade_documents(monkeypatch, batch_grading):
+    sync_result, async_result = run_sync_and_async(monkeypatch, batch_grading)
+
+    assert [d.page_content for d in async_result["documents"]] == [d.page_content for d in sync_result["documents"]]
+    assert async_result["tokens_used"] == sync_result["tokens_used"]
+    if not batch_grading:
+        # The fake grader says 'no' to a hash-selected share of inputs, so the filter is exercised
+        assert 0 < len(sync_result["documents"]) < len(DOCUMENTS)
@@ -0,0 +1,80 @@
+from langchain_core.documents import Document
+from langchain_text_splitters import CharacterTextSplitter
+
+from rag_common.ingestion import IncrementalIngestor, chunk_id, chunk_ids, iter_loaded_sources
+
+
+class DictVectorStore:
+    """Just enough of a vector store for IncrementalIngestor."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def add_documents(self, documents, ids):
+        self.docs.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for i in ids:
+            del self.docs[i]
+
+
+def make_ingestor(tmp_path):
+    splitter = CharacterTextSplitter(separator="\n", chunk_size=1, chunk_overlap=0)
+    return IncrementalIngestor(DictVectorStore(), splitter, str(tmp_path / "manifest.sqlite"))
+
+
+def test_chunk_id_depends_on_source_text_and_occurrence():
+    assert chunk_id("a", "text") == chunk_id("a", "text", 0)
+    assert len({chunk_id("a", "text"), chunk_id("b", "text"), chunk_id("a", "other"), chunk_id("a", "text", 1)}) == 4
+
+
+def test_chunk_ids_number_repeated_text_per_source():
+    ids = chunk_ids([("a", "x"), ("a", "y"), ("a", "x"), ("b", "x")])
+    assert ids == [chunk_id("a", "x", 0), chunk_id("a", "y", 0), chunk_id("a", "x", 1), chunk_id("b", "x", 0)]
+
+
+def test_inserted_chunk_does_not_rekey_the_rest(tmp_path):
+    ingestor = make_ingestor(tmp_path)
+    ingestor.ingest({"page": [Document(page_content="one\ntwo\nthree")]})
+    before = set(ingestor.vectorstore.docs)
+
+    stats = ingestor.ingest({"page": [Document(page_content="zero\none\ntwo\nthree")]})
+    assert stats["deleted"] == 0
+    assert before < set(ingestor.vectorstore.docs)
+    # Moved chunks are rewritten under their old IDs so their window position stays correct
+    ordinals = sorted((d.metadata["ordinal"], d.page_content) for d in ingestor.vectorstore.docs.values())
+    assert ordinals == [(0, "zero"), (1, "one"), (2, "two"), (3, "three")]
+
+
+def test_appended_chunk_is_the_only_write(tmp_path):
+    ingestor = make_ingestor(tmp_path)
+    ingestor.ingest({"page": [Document(page_content="one\ntwo")]})
+    stats = ingestor.ingest({"page": [Document(page_content="one\ntwo\nthree")]})
+    assert (stats["added"], stats["deleted"]) == (1, 0)
+
+
+def test_unchanged_and_removed_sources(tmp_path):
+    ingestor = make_ingestor(tmp_path)
+    ingestor.ingest({"a": [Document(page_content="x\ny")], "b": [Document(page_content="z")]})
+
+    stats = ingestor.ingest({"a": [Document(page_content="x\ny")]})
+    assert stats["unchanged_sources"] == 1 and stats["removed_sources"] == 1
+    assert sorted(d.page_content for d in ingestor.vectorstore.docs.values()) == ["x", "y"]
+
+
+def test_failed_source_is_skipped_and_keeps_its_chunks(tmp_path, capsys):
+    pages = {"a": "x\ny", "b": "z"}
+
+    def loader(source):
+        if source not in pages:
+            raise OSError("unreachable")
+        return [Document(page_content=pages[source])]
+
+    ingestor = make_ingestor(tmp_path)
+    ingestor.ingest_stream(iter_loaded_sources(["a", "b"], loader=loader))
+
+    del pages["b"]
+    stats = ingestor.ingest_stream(iter_loaded_sources(["a", "b"], loader=loader))
+    assert stats["failed_sources"] == 1 and stats["removed_sources"] == 0
+    assert "z" in {d.page_content for d in ingestor.vectorstore.docs.values()}
+    assert "Skipping b" in capsys.readouterr().err
@@ -0,0 +1,98 @@
+import asyncio
+from typing import TypedDict
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, StateGraph
+
+from rag_common.fakes import FakeChatModel
+from rag_common.instrumentation import GraphInstrumentation, edge_function_names, instrument
+from rag_common.metrics import MetricsRegistry
+
+llm = FakeChatModel()
+
+
+class State(TypedDict, total=False):
+    question: str
+    generation: str
+    fail: bool
+
+
+def retrieve(state):
+    return {"generation": ""}
+
+
+def generate(state):
+    if state.get("fail"):
+        raise ValueError("boom")
+    return {"generation": llm.invoke(state["question"]).content}
+
+
+async def agenerate(state):
+    return {"generation": (await llm.ainvoke(state["question"])).content}
+
+
+def decide(state):
+    return "done" if state["generation"] else "retry"
+
+
+def build_app():
+    workflow = StateGraph(State)
+    workflow.add_node("retrieve", retrieve)
+    workflow.add_node("generate", RunnableLambda(generate, afunc=agenerate))
+    workflow.set_entry_point("retrieve")
+    workflow.add_edge("retrieve", "generate")
+    workflow.add_conditional_edges("generate", decide, {"done": END, "retry": "generate"})
+    return workflow.compile()
+
+
+def run(invoke, inputs):
+    app = build_app()
+    registry, events = MetricsRegistry(), []
+    handler = GraphInstrumentation(edge_function_names(app), registry=registry, sinks=[events.append], graph_name="test")
+    invoke(app.with_config(callbacks=[handler]), inputs)
+    return registry, events
+
+
+@pytest.mark.parametrize(
+    "invoke",
+    [lambda app, inputs: app.invoke(inputs), lambda app, inputs: asyncio.run(app.ainvoke(inputs))],
+    ids=["sync", "async"],
+)
+def test_nodes_and_edges_become_one_step_each(invoke):
+    registry, events = run(invoke, {"question": "What is agent memory?"})
+    steps = [e for e in events if e["event"] == "step"]
+    # The RunnableLambda inside the generate node is not a second step
+    assert sorted((s["kind"], s["name"]) for s in steps) == [
+        ("edge", "decide"), ("node", "generate"), ("node", "retrieve"),
+    ]
+    generate_step = next(s for s in steps if s["name"] == "generate")
+    assert generate_step["llm_calls"] == 1
+    assert generate_step["input_tokens"] > 0 and generate_step["output_tokens"] > 0
+    assert generate_step["status"] == "ok" and generate_step["wall_s"] >= generate_step["self_s"] >= 0
+
+    (graph,) = [e for e in events if e["event"] == "graph"]
+    assert graph["status"] == "ok" and graph["steps"] == 3 and graph["llm_calls"] == 1
+    assert registry.counter("llm_calls", graph="test", step="generate", kind="node") == 1
+    assert registry.counter("graph_runs", graph="test", status="ok") == 1
+    assert registry.histogram("step_seconds", graph="test", step="decide", kind="edge").count == 1
+
+
+def test_error_events_and_counters():
+    app = build_app()
+    registry, events = MetricsRegistry(), []
+    handler = GraphInstrumentation(edge_function_names(app), registry=registry, sinks=[events.append], graph_name="test")
+    with pytest.raises(ValueError):
+        app.invoke({"question": "q", "fail": True}, {"callbacks": [handler]})
+    generate_step = next(e for e in events if e.get("name") == "generate")
+    assert generate_step["status"] == "error"
+    assert registry.counter("step_errors", graph="test", step="generate", kind="node") == 1
+    assert registry.counter("graph_runs", graph="test", status="error") == 1
+    # The invocation's run bookkeeping is released
+    assert not handler._parents and not handler._steps and not handler._graphs
+
+
+def test_instrument_can_be_disabled(monkeypatch):
+    app = build_app()
+    monkeypatch.setenv("RAG_INSTRUMENTATION", "false")
+    assert instrument(app) is app
@@ -0,0 +1,90 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.runnables import Runnable
+
+from rag_common.metrics import MetricsRegistry
+from rag_common.microbatch import MicroBatcher, with_micro_batching
+
+
+class Upper(Runnable):
+    """Upper-cases its input and records the size of every batch; "boom" fails."""
+
+    def __init__(self):
+        self.batches = []
+
+    def invoke(self, input, config=None, **kwargs):
+        if input == "boom":
+            raise ValueError(input)
+        return input.upper()
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        self.batches.append(len(inputs))
+        return super().batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        self.batches.append(len(inputs))
+        return await super().abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+
+def test_off_by_default():
+    chain = Upper()
+    assert with_micro_batching(chain, "upper") is chain
+
+
+def test_concurrent_async_calls_share_one_batch():
+    chain, registry = Upper(), MetricsRegistry()
+    batcher = MicroBatcher(chain, "upper", window_ms=20, max_batch_size=16, registry=registry)
+
+    async def main():
+        return await asyncio.gather(*(batcher.ainvoke(w) for w in ["a", "b", "c", "d", "e"]))
+
+    assert asyncio.run(main()) == ["A", "B", "C", "D", "E"]
+    assert chain.batches == [5]
+    assert registry.histogram("microbatch_size", batcher="upper").sum == 5
+    assert registry.histogram("microbatch_wait_seconds", batcher="upper").count == 5
+
+
+def test_a_full_batch_is_sent_without_waiting_for_the_window():
+    chain = Upper()
+    batcher = MicroBatcher(chain, "upper", window_ms=60000, max_batch_size=2, registry=MetricsRegistry())
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.ainvoke(w) for w in "abcd")), timeout=5)
+
+    assert asyncio.run(main()) == ["A", "B", "C", "D"]
+    assert chain.batches == [2, 2]
+
+
+def test_each_caller_gets_its_own_exception_and_batches_survive_event_loops():
+    chain = Upper()
+    batcher = MicroBatcher(chain, "upper", window_ms=5, registry=MetricsRegistry())
+
+    async def main():
+        return await asyncio.gather(batcher.ainvoke("ok"), batcher.ainvoke("boom"), return_exceptions=True)
+
+    for _ in range(2):
+        ok, error = asyncio.run(main())
+        assert ok == "OK" and isinstance(error, ValueError)
+    assert chain.batches == [2, 2]
+
+
+def test_threads_are_batched_too():
+    chain = Upper()
+    batcher = MicroBatcher(chain, "upper", window_ms=50, max_batch_size=16, registry=MetricsRegistry())
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(batcher.invoke, "wxyz")) == ["W", "X", "Y", "Z"]
+    assert chain.batches == [4]
+
+    with pytest.raises(ValueError):
+        batcher.invoke("boom")
+
+
+def test_wrapped_chain_when_enabled(monkeypatch):
+    monkeypatch.setenv("MICRO_BATCHING", "true")
+    chain = Upper()
+    wrapped = with_micro_batching(chain, "upper", window_ms=5)
+    assert wrapped.invoke("a") == "A"
+    assert asyncio.run(wrapped.ainvoke("b")) == "B"
+    assert chain.batches == [1, 1]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from rag_common.mmap_vectorstore import MmapVectorStore, encode
+
+VECTORS = {
+    "cats": [1.0, 0.0, 0.0, 0.0],
+    "dogs": [0.8, 0.6, 0.0, 0.0],
+    "cars": [0.0, 0.0, 1.0, 0.0],
+    "boats": [0.0, 0.0, 0.6, 0.8],
+}
+
+
+class LookupEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return VECTORS[text]
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_encode_round_trips_unit_vectors(dtype):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(8, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    codes, scales = encode(vectors, dtype)
+    decoded = codes.astype(np.float32)
+    if dtype == "int8":
+        assert codes.dtype == np.int8 and scales.shape == (8,)
+        decoded *= scales[:, None]
+    else:
+        assert codes.dtype == np.float16 and scales is None
+    assert np.abs(decoded - vectors).max() < 0.01
+
+
+def test_encode_zero_vector_gets_a_unit_scale():
+    codes, scales = encode(np.zeros((1, 4), dtype=np.float32), "int8")
+    assert scales[0] == 1 and not codes.any()
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_search_ranks_by_cosine_similarity(tmp_path, dtype):
+    # block_rows=1 makes the search merge the top-k across blocks
+    store = MmapVectorStore(str(tmp_path / "store"), LookupEmbeddings(), dtype=dtype, block_rows=1)
+    store.add_texts(list(VECTORS), metadatas=[{"name": t} for t in VECTORS], ids=list(VECTORS))
+
+    results = store.similarity_search_with_score("cats", k=2)
+    assert [doc.page_content for doc, _ in results] == ["cats", "dogs"]
+    assert results[0][0].metadata == {"name": "cats"}
+    assert results[0][1] == pytest.approx(1.0, abs=0.01)
+    assert results[1][1] == pytest.approx(0.8, abs=0.01)
+
+
+def test_deleted_rows_are_not_returned(tmp_path):
+    store = MmapVectorStore(str(tmp_path / "store"), LookupEmbeddings())
+    store.add_texts(list(VECTORS), ids=list(VECTORS))
+    store.delete(ids=["cats"])
+
+    assert len(store) == 3
+    assert [doc.page_content for doc in store.similarity_search("cats", k=1)] == ["dogs"]
+    assert store.get_by_ids(["cats", "cars"])[0].page_content == "cars"
+
+
+def test_k_larger_than_the_store(tmp_path):
+    store = MmapVectorStore(str(tmp_path / "store"), LookupEmbeddings())
+    store.add_texts(["cars", "boats"], ids=["cars", "boats"])
+    assert len(store.similarity_search("cars", k=10)) == 2
+
+
+def test_store_is_reopened_from_disk(tmp_path):
+    directory = str(tmp_path / "store")
+    MmapVectorStore(directory, LookupEmbeddings()).add_texts(list(VECTORS), ids=list(VECTORS))
+
+    reopened = MmapVectorStore(directory, LookupEmbeddings())
+    assert len(reopened) == 4
+    assert reopened.similarity_search("boats", k=1)[0].page_content == "boats"
+
+
+def test_empty_store_returns_nothing(tmp_path):
+    store = MmapVectorStore(str(tmp_path / "store"), LookupEmbeddings())
+    assert store.similarity_search("cats") == []
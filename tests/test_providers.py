@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from rag_common import providers
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def http_clients(monkeypatch):
+    monkeypatch.setenv("RAG_HTTP_POOL", "true")
+    monkeypatch.setattr(providers, "_http_clients", None)
+    clients = providers.get_http_clients()
+    yield clients
+    clients["http_client"].close()
+
+
+def test_async_client_works_across_event_loops(server, http_clients):
+    client = http_clients["http_async_client"]
+
+    async def fetch():
+        # Two requests on one loop reuse its keep-alive connection
+        first = await client.get(server)
+        second = await client.get(server)
+        return first.text, second.text, client._loop_client()
+
+    *texts, first_pool = asyncio.run(fetch())
+    *more_texts, second_pool = asyncio.run(fetch())
+    assert texts == more_texts == ["ok", "ok"]
+    assert first_pool is not second_pool
+
+
+def test_clients_are_shared_and_have_a_timeout(http_clients):
+    assert providers.get_http_clients() is http_clients
+    assert http_clients["http_client"].timeout.read == 60.0
+    assert http_clients["http_async_client"].timeout.read == 60.0
+
+
+def test_pooling_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("RAG_HTTP_POOL", "false")
+    assert providers.get_http_clients() == {}
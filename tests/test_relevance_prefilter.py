@@ -0,0 +1,72 @@
+import json
+import sys
+
+import pytest
+
+from rag_common import relevance_prefilter
+from rag_common.relevance_prefilter import RelevancePrefilter, bm25_scores, calibrate
+
+
+def test_calibrate_picks_the_loosest_thresholds_meeting_the_precision():
+    scores = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    labels = [False, False, False, True, False, True, True, True, True, True]
+
+    result = calibrate(scores, labels, target_precision=1.0, min_support=2)
+    assert (result["accept"], result["accepted"]) == (0.6, 5)
+    assert (result["reject"], result["rejected"]) == (0.3, 3)
+
+
+def test_calibrate_disables_a_side_without_enough_support():
+    scores = [0.1, 0.2, 0.8, 0.9]
+    labels = [False, False, True, True]
+
+    result = calibrate(scores, labels, target_precision=1.0, min_support=3)
+    # Nothing is decided locally: nothing scores >= 2 or <= -1
+    assert (result["accept"], result["reject"]) == (2.0, -1.0)
+    assert result["accepted"] == result["rejected"] == 0
+
+
+def test_calibrate_keeps_reject_below_accept():
+    result = calibrate([0.5] * 10, [True] * 5 + [False] * 5, target_precision=0.5, min_support=1)
+    assert result["reject"] < result["accept"]
+
+
+def test_decide_uses_the_given_thresholds():
+    prefilter = RelevancePrefilter(embeddings=None, accept=0.8, reject=0.2)
+    assert [prefilter.decide(s) for s in (0.9, 0.8, 0.5, 0.2, 0.1)] == ["yes", "yes", None, "no", "no"]
+
+
+def test_thresholds_are_required():
+    with pytest.raises(TypeError):
+        RelevancePrefilter(embeddings=None)
+
+
+def test_bm25_scores_depend_on_the_candidate_set():
+    question = "agent memory"
+    alone = bm25_scores(question, ["agent memory"])[0]
+    among = bm25_scores(question, ["agent memory", "task planning", "tool use", "reflection"])[0]
+    assert among != pytest.approx(alone)
+
+
+def test_main_calibrates_on_the_logged_scores(tmp_path, monkeypatch, capsys):
+    rows = [{"question": "q", "document": f"d{i}", "relevant": i >= 5, "score": i / 10} for i in range(10)]
+    labelled = tmp_path / "labelled.jsonl"
+    labelled.write_text("\n".join(json.dumps(row) for row in rows), encoding="utf-8")
+    output = tmp_path / "thresholds.json"
+    monkeypatch.setattr(
+        sys, "argv", ["prefilter", str(labelled), "--target-precision", "1.0", "--min-support", "2", "--output", str(output)]
+    )
+    # Rows must not be re-scored: that would need embeddings and change the scale
+    monkeypatch.setattr(relevance_prefilter, "get_prefilter", lambda: pytest.fail("rows were re-scored"))
+
+    relevance_prefilter.main()
+
+    assert json.loads(output.read_text(encoding="utf-8")) == {"accept": 0.5, "reject": 0.4}
+
+
+def test_main_rejects_rows_without_a_score(tmp_path, monkeypatch):
+    labelled = tmp_path / "labelled.jsonl"
+    labelled.write_text(json.dumps({"question": "q", "document": "d", "relevant": True}), encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["prefilter", str(labelled), "--output", str(tmp_path / "t.json")])
+    with pytest.raises(SystemExit):
+        relevance_prefilter.main()
@@ -0,0 +1,58 @@
+from rag_common import sqlite_cache
+from rag_common.sqlite_cache import PersistentCache, normalize_question
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def test_set_get_and_json_values(tmp_path):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite"))
+    cache.set("k", {"binary_score": "yes", "n": [1, 2]})
+    assert cache.get("k") == {"binary_score": "yes", "n": [1, 2]}
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_misses_and_removed(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sqlite_cache, "time", clock)
+    cache = PersistentCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    cache.set("k", 1)
+
+    clock.now += 60
+    assert cache.get("k") == 1
+    clock.now += 1
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction_keeps_recently_read_entries(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sqlite_cache, "time", clock)
+    cache = PersistentCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("a", 1)
+    clock.now += 1
+    cache.set("b", 2)
+    clock.now += 1
+    cache.get("a")
+    clock.now += 1
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_entries_persist_across_connections(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    PersistentCache(path).set("k", "v")
+    assert PersistentCache(path).get("k") == "v"
+
+
+def test_normalize_question():
+    assert normalize_question("  What is  Agent\nMemory? ") == "what is agent memory?"
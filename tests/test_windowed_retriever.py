@@ -0,0 +1,42 @@
+from rag_common.windowed_retriever import join_chunks, merge_windows
+
+
+def test_merge_windows_merges_overlapping_and_adjacent_hits():
+    hits = [("page", 4), ("page", 6)]
+    assert merge_windows(hits, window=1) == [("page", 3, 7, [4, 6])]
+
+    # Windows 0..2 and 3..5 touch, so they become one range
+    assert merge_windows([("page", 1), ("page", 4)], window=1) == [("page", 0, 5, [1, 4])]
+
+
+def test_merge_windows_keeps_distant_hits_and_sources_apart():
+    hits = [("a", 10), ("b", 0), ("a", 1)]
+    assert merge_windows(hits, window=1) == [
+        ("a", 9, 11, [10]),
+        ("b", 0, 1, [0]),
+        ("a", 0, 2, [1]),
+    ]
+
+
+def test_merge_windows_orders_ranges_by_their_best_hit():
+    hits = [("a", 20), ("a", 2), ("a", 3)]
+    ranges = merge_windows(hits, window=0)
+    assert ranges == [("a", 20, 20, [20]), ("a", 2, 3, [2, 3])]
+
+
+def test_join_chunks_drops_splitter_overlap():
+    first = "The agent stores past observations in a memory stream."
+    second = "observations in a memory stream. It retrieves them by recency."
+    assert join_chunks([first, second]) == (
+        "The agent stores past observations in a memory stream. It retrieves them by recency."
+    )
+
+
+def test_join_chunks_keeps_short_repeats():
+    assert join_chunks(["ends with the", "the start"]) == "ends with the\nthe start"
+    assert join_chunks(["ends with the", "the start"], min_overlap=3) == "ends with the start"
+
+
+def test_join_chunks_of_nothing_or_one_chunk():
+    assert join_chunks([]) == ""
+    assert join_chunks(["only"]) == "only"